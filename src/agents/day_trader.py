@@ -1,69 +1,139 @@
 import os
 import json
+import logging
+from datetime import datetime
 
-from openai import OpenAI
 from dotenv import load_dotenv
 
+from agents.decision import RESPONSE_FORMAT, Decision, DecisionError
 from agents.financial_analyst import FinancialAnalystAgent
-from agents.utils.helpers import retry_request
+from agents.utils import deadline
+from agents.utils.helpers import create_chat_completion, get_openai_client, run_task_graph
+from agents.utils.llm_cache import get_llm_cache
+from agents.utils.tracing import current_span
+from agents.utils.token_budget import TokenBudget
 from connector.user_information import get_user_data
-from connector.stock_data import get_stock_data
 
 load_dotenv()
 
+# maximum tokens per section of the decision context
+DECISION_CONTEXT_LIMITS = {
+    "bing_eval": 1500,
+    "general_news_eval": 1500,
+    "stock_news_eval": 1500,
+    "techindicator_analysis_eval": 1500,
+    "user_data": 500,
+    "three_days_stock_data": 500,
+    "current_stock_data": 2500,
+}
+
+# titles of the stages in the decision context
+SECTION_TITLES = {
+    "bing_eval": "General News About the Company",
+    "general_news_eval": "General Financial Market Condition",
+    "stock_news_eval": "Recent News About the Stock",
+    "techindicator_analysis_eval": "Technical Indicators",
+    "user_data": "User Data",
+    "stock_data": "Stock Data",
+}
+# stages whose last result is used if the current one does not finish in time
+FALLBACK_STAGES = {"bing_eval", "general_news_eval", "stock_news_eval", "techindicator_analysis_eval"}
+
 class DayTraderAgent:
-    def __init__(self):
+    def __init__(self, client=None):
         """Initializing OpenAI Client for the Day Trader Agent.
+
+        Args:
+            client (openai.OpenAI): The OpenAI client. Defaults to the shared client.
         """
-        api_key = os.getenv('OPENAI_KEY')
-        self.client = OpenAI(api_key=api_key)
+        self.client = client or get_openai_client()
         
         with open('ticker_db.json') as f:
             self.TICKER_OVERVIEW_DB = json.load(f)
-        self.fin_agent = FinancialAnalystAgent()
+        self.fin_agent = FinancialAnalystAgent(client=self.client)
 
-    def generate_day_trading_action(self, ticker, user_message):
+    def generate_day_trading_action(self, ticker, user_message, on_stage=None, on_stream=None):
         """ Generate a day trading action for a given stock ticker.
 
         Args:
             ticker (str): The stock ticker to evaluate.
+            user_message (str): The trading goal of the user.
+            on_stage (callable): Called with the name and result of every evaluation stage once it is done.
+            on_stream (callable): Called with the decision text so far while it is streamed.
 
         Returns:    
             str: The generated financial evaluation.
         """
+        # pandas and numpy are only loaded by the stages that work on bars
+        from connector.stock_data import get_stock_data
         company_name = self.TICKER_OVERVIEW_DB[ticker]
-        # all financial agent evaluations
-        bing_eval = self.fin_agent.generate_financial_evaluation_on_bing_search_engine(ticker=ticker)
-        general_news_eval = self.fin_agent.generate_financial_evaluation_on_general_news()
-        stock_news_eval = self.fin_agent.generate_financial_evaluation_on_stock_news(ticker=ticker)
-        ### NOTE this (Sentiment Analysis on public opinion) confused the model. It relied too much on it.
-        #sentiment_analysis_eval = self.fin_agent.generate_sentiment_analysis(ticker=ticker)
-        techindicator_analysis_eval = self.fin_agent.generate_technical_indicator_analysis(ticker=ticker)
-
-        # get relevant user data and stock data
-        user_data = get_user_data(desire=user_message)
-        three_days_stock_data, current_stock_data = get_stock_data(ticker)
+        # all financial agent evaluations and the user/stock data are independent of each other,
+        # so they run concurrently and are joined before the final decision call.
+        ### NOTE the sentiment analysis (Sentiment Analysis on public opinion) is not part of the graph. It confused the model. It relied too much on it.
+        #"sentiment_analysis_eval": (lambda: self.fin_agent.generate_sentiment_analysis(ticker=ticker), []),
+        # the stages have to leave part of the ticker's time budget for the decision call
+        ticker_budget = deadline.remaining(default=float(os.getenv('TICKER_DEADLINE', 180)))
+        stage_timeout = max(0.0, ticker_budget - float(os.getenv('DECISION_TIME_RESERVE', 45)))
+        degraded = []
+
+        def fallback(name, error):
+            degraded.append(name)
+            return self._stage_fallback(ticker, name, error)
+
+        def on_done(name, result):
+            if name in FALLBACK_STAGES and name not in degraded and result:
+                get_llm_cache().put_latest(f"{ticker}:{name}", result)
+            if on_stage is not None:
+                on_stage(name, result)
+
+        with deadline.within(stage_timeout):
+            stages = run_task_graph({
+                "bing_eval": (lambda: self.fin_agent.generate_financial_evaluation_on_bing_search_engine(ticker=ticker), []),
+                "general_news_eval": (self.fin_agent.generate_financial_evaluation_on_general_news, []),
+                "stock_news_eval": (lambda: self.fin_agent.generate_financial_evaluation_on_stock_news(ticker=ticker), []),
+                "techindicator_analysis_eval": (lambda: self.fin_agent.generate_technical_indicator_analysis(ticker=ticker), []),
+                "user_data": (lambda: get_user_data(desire=user_message), []),
+                "stock_data": (lambda: get_stock_data(ticker), []),
+            }, on_done=on_done, timeout=stage_timeout, fallback=fallback)
+        if degraded and current_span() is not None:
+            current_span().set(degraded_stages=degraded)
+        three_days_stock_data, current_stock_data = stages["stock_data"]
+        # keep the decision prompt within a predictable size. Bars are trimmed from the start, so the most recent ones stay.
+        sections = TokenBudget(
+            total=int(os.getenv('DECISION_CONTEXT_TOKEN_BUDGET', 12000)),
+            limits=DECISION_CONTEXT_LIMITS,
+            keep={"three_days_stock_data": "tail", "current_stock_data": "tail"},
+            name=f"Decision context ({ticker})",
+        ).fit({
+            "bing_eval": stages["bing_eval"],
+            "general_news_eval": stages["general_news_eval"],
+            "stock_news_eval": stages["stock_news_eval"],
+            "techindicator_analysis_eval": stages["techindicator_analysis_eval"],
+            "user_data": stages["user_data"],
+            "three_days_stock_data": three_days_stock_data,
+            "current_stock_data": current_stock_data,
+        })
 
         context = f"""
-General News About the Company: {bing_eval}
+General News About the Company: {sections["bing_eval"]}
 _____
 
-General Financial Market Condition: {general_news_eval}
+General Financial Market Condition: {sections["general_news_eval"]}
 _____
 
-Recent News About the Stock: {stock_news_eval}
+Recent News About the Stock: {sections["stock_news_eval"]}
 _____
 
-Technical Indicators: {techindicator_analysis_eval}
+Technical Indicators: {sections["techindicator_analysis_eval"]}
 _____
 
-User Data: {user_data}
+User Data: {sections["user_data"]}
 _____
 
-Three-Day Stock Data: {three_days_stock_data}
+Three-Day Stock Data: {sections["three_days_stock_data"]}
 _____
 
-Minute-by-Minute Stock Data: {current_stock_data}
+Minute-by-Minute Stock Data: {sections["current_stock_data"]}
 
 """
 
@@ -112,6 +182,7 @@ You are a **Day Trader Agent** tasked with deciding on how to go in and out of a
 #### **Example 3: Selling**
 ```json
 {{
+  "action": "sell",
   "go_in": null,
   "go_out": "165.75",
   "risk_level": "high",
@@ -133,7 +204,7 @@ The Day Trader Agent must consider the following inputs for decision-making:
    - Geographic location and time zone to be considered when buying and considering opening hours of stock exchanges.
    - User desire on the decision making.
 6. **Three-Day Stock Data**: A rough overview of the stock’s performance over the past three days.
-7. **Minute-by-Minute Stock Data**: Current stock data updated in one-minute intervals.
+7. **Minute-by-Minute Stock Data**: Current stock data of the latest trading day as a summary block (VWAP, range, volume spikes) followed by OHLCV bars at the stated resolution.
 
 ---
 
@@ -144,6 +215,7 @@ The Day Trader Agent must consider the following inputs for decision-making:
 - When markets are **closed**, decisions should account for the next trading session. In such cases:
   - Prepare a position based on pre-market indicators or known events likely to influence the stock's behavior at the open.
 - You must follow the Day Trading Principles outlined below to ensure optimal decision-making.
+- An input may be marked as unavailable or as an earlier evaluation, because it could not be gathered in time. Decide with the remaining inputs, be more cautious about the risk level and mention the missing or outdated input in the `reason_of_decision`.
 - Use your own knolwedge and historical events as well as experience to make the best decision for the user.
 - Pay close attention to the opening time of the US market. 
 - For pre-market or after-hours trading, evaluate available data trends with extra caution as liquidity may be lower, increasing risk.
@@ -177,21 +249,75 @@ To excel as a day-trading agent, you must prioritize the following consideration
     - Ensure compliance with trading windows specific to the user's location and time zone.
     - Consider the user's desire on how to position the stock. If the user wants to buy, sell or hold, please consider this in your decision making. However, always make him aware of the risks and potential losses.
 """
-        def make_api_call():
-            completion = self.client.chat.completions.create(
-                model="chatgpt-4o-latest",
-                messages=[
-                    {"role": "system", "content": instruction},
-                    {
-                        "role": "user",
-                        "content": context
-                    }
-                ]
-            )
-            return completion
-        
-        completion = retry_request(make_api_call)
-        return completion.choices[0].message.content, context
+        # structured outputs are not supported by chatgpt-4o-latest, so the decision uses a snapshot model
+        content = create_chat_completion(
+            self.client,
+            model=os.getenv('DECISION_MODEL', 'gpt-4o'),
+            messages=[
+                {"role": "system", "content": instruction},
+                {
+                    "role": "user",
+                    "content": context
+                }
+            ],
+            call_type="day_trading_action",
+            on_stream=on_stream,
+            response_format=RESPONSE_FORMAT,
+        )
+        return content, context
+
+    def parse_decision(self, content):
+        """ Parse the answer of `generate_day_trading_action` into a decision.
+
+        A malformed answer is repaired by a small model that only reformats the answer, so the evaluation does
+        not have to be repeated.
+
+        Args:
+            content (str): The answer of the decision call.
+
+        Returns:
+            Decision: The decision.
+
+        Raises:
+            DecisionError: If the repaired answer is still no valid decision.
+        """
+        try:
+            return Decision.parse(content)
+        except DecisionError as e:
+            logging.warning(f"Repairing a malformed decision ({e}).")
+        repaired = create_chat_completion(
+            self.client,
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": "Convert the trading decision of the user into the JSON schema. Keep its content, only fix the format. Use null for prices that are not given."},
+                {"role": "user", "content": content or ""},
+            ],
+            call_type="decision_repair",
+            response_format=RESPONSE_FORMAT,
+        )
+        return Decision.parse(repaired)
+
+    def _stage_fallback(self, ticker, name, error):
+        """Returns the result used for a stage that did not finish in time: its last result of an earlier
+        evaluation (if younger than `STAGE_FALLBACK_MAX_AGE` seconds) or a note that the section is unavailable.
+
+        Args:
+            ticker (str): The stock ticker.
+            name (str): The name of the stage.
+            error (Exception): The timeout.
+
+        Returns:
+            The replacement result, shaped like the result of the stage.
+        """
+        logging.warning(f"Stage {name} of {ticker} did not finish in time ({error}).")
+        if name in FALLBACK_STAGES:
+            latest = get_llm_cache().get_latest(f"{ticker}:{name}", max_age=float(os.getenv('STAGE_FALLBACK_MAX_AGE', 24 * 60 * 60)))
+            if latest is not None:
+                content, created = latest
+                return (f"(Earlier evaluation from {datetime.fromtimestamp(created):%Y-%m-%d %H:%M}, as the current one "
+                        f"was not available in time. It may be outdated.)\n{content}")
+        note = f"Section unavailable: the {SECTION_TITLES[name]} could not be gathered in time."
+        return (note, note) if name == "stock_data" else note
 
     def generate_summary_of_evaluation(self, ticker, context):
         """ Generate a summary of the evaluation for a given stock ticker.
@@ -217,21 +343,19 @@ Analyze the provided data on {company_name} ({ticker}) and today’s financial m
 Ensure brevity, clarity, and prioritization of actionable insights. Avoid extraneous information or excessive detail.
 Explain your summary in the in simple terms for the user to understand, as he is new into trading. State that jargon like "EMA" or "MACD crossover" must be accompanied by brief explanations, e.g., "A bullish reversal (a sign the price might go up) confirmed by moving averages crossing."
 """
-        def make_api_call():
-            completion = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": instruction},
-                    {
-                        "role": "user",
-                        "content": context
-                    }
-                ]
-            )
-            return completion
-        
-        completion = retry_request(make_api_call)
-        return completion.choices[0].message.content
+        content = create_chat_completion(
+            self.client,
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": instruction},
+                {
+                    "role": "user",
+                    "content": context
+                }
+            ],
+            call_type="evaluation_summary",
+        )
+        return content
     
 
 if __name__ == "__main":
@@ -0,0 +1,146 @@
+import re
+import json
+
+ACTIONS = ("buy", "sell", "hold")
+RISK_LEVELS = ("very low", "low", "medium", "high", "very high")
+
+# JSON schema of the decision for structured outputs (`response_format`)
+DECISION_SCHEMA = {
+    "name": "day_trading_decision",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "action": {"type": "string", "enum": list(ACTIONS)},
+            "go_in": {"type": ["string", "null"], "description": "Entry price in USD, null if hold or sell."},
+            "go_out": {"type": ["string", "null"], "description": "Exit price in USD, null if hold."},
+            "risk_level": {"type": "string", "enum": list(RISK_LEVELS)},
+            "reason_of_decision": {"type": "string"},
+        },
+        "required": ["action", "go_in", "go_out", "risk_level", "reason_of_decision"],
+        "additionalProperties": False,
+    },
+}
+RESPONSE_FORMAT = {"type": "json_schema", "json_schema": DECISION_SCHEMA}
+
+_FENCE = re.compile(r"```(?:json)?(.*?)```", re.DOTALL)
+_LINE_COMMENT = re.compile(r'("(?:[^"\\]|\\.)*")|//[^\n]*')
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+class DecisionError(ValueError):
+    """Raised if an answer cannot be parsed into a valid decision."""
+
+
+def _price(value, field):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        text = value.strip().replace("$", "").replace(",", "").replace("USD", "").strip()
+        if text.lower() in ("", "null", "none", "n/a"):
+            return None
+        try:
+            return float(text)
+        except ValueError:
+            pass
+    raise DecisionError(f"'{field}' is not a price: {value!r}")
+
+
+class Decision:
+    """A validated trading decision of the Day Trader Agent."""
+    __slots__ = ("action", "go_in", "go_out", "risk_level", "reason_of_decision")
+
+    def __init__(self, action, go_in, go_out, risk_level, reason_of_decision):
+        """
+        Args:
+            action (str): "buy", "sell" or "hold".
+            go_in (float): The entry price in USD, or None.
+            go_out (float): The exit price in USD, or None.
+            risk_level (str): The risk level of the action, e.g. "medium".
+            reason_of_decision (str): The explanation of the decision.
+        """
+        self.action = action
+        self.go_in = go_in
+        self.go_out = go_out
+        self.risk_level = risk_level
+        self.reason_of_decision = reason_of_decision
+
+    @classmethod
+    def from_dict(cls, data):
+        """Validates a decision object.
+
+        Args:
+            data (dict): The decoded JSON object.
+
+        Returns:
+            Decision: The decision.
+
+        Raises:
+            DecisionError: If a field is missing or invalid.
+        """
+        if not isinstance(data, dict):
+            raise DecisionError(f"the decision is not an object: {type(data).__name__}")
+        action = str(data.get("action") or "").strip().lower()
+        if action not in ACTIONS:
+            raise DecisionError(f"'action' must be one of {ACTIONS}: {data.get('action')!r}")
+        reason = data.get("reason_of_decision")
+        if not isinstance(reason, str) or not reason.strip():
+            raise DecisionError("'reason_of_decision' is missing")
+        risk_level = data.get("risk_level")
+        if not isinstance(risk_level, str) or not risk_level.strip():
+            raise DecisionError("'risk_level' is missing")
+        return cls(action, _price(data.get("go_in"), "go_in"), _price(data.get("go_out"), "go_out"),
+                   risk_level.strip().lower(), reason.strip())
+
+    @classmethod
+    def parse(cls, text):
+        """Parses an answer of the decision call.
+
+        Structured outputs are plain JSON and decoded directly. Other answers are repaired locally: the JSON is taken
+        from a ```json fence or the outermost braces, and comments and trailing commas are removed.
+
+        Args:
+            text (str): The answer.
+
+        Returns:
+            Decision: The decision.
+
+        Raises:
+            DecisionError: If the answer contains no valid decision.
+        """
+        text = (text or "").strip()
+        try:
+            return cls.from_dict(json.loads(text))
+        except ValueError:
+            pass
+        fence = _FENCE.search(text)
+        candidate = fence.group(1) if fence else text
+        start, end = candidate.find("{"), candidate.rfind("}")
+        if start == -1 or end < start:
+            raise DecisionError("the answer contains no JSON object")
+        candidate = _LINE_COMMENT.sub(lambda match: match.group(1) or "", candidate[start:end + 1])
+        candidate = _TRAILING_COMMA.sub(r"\1", candidate)
+        try:
+            data = json.loads(candidate)
+        except ValueError as e:
+            raise DecisionError(f"the answer is not valid JSON: {e}") from e
+        return cls.from_dict(data)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def format(self):
+        """Formats the decision as markdown for the email and the app.
+
+        Returns:
+            str: The formatted decision.
+        """
+        def price(value):
+            return "-" if value is None else f"${value:,.2f}"
+        return (f"**Action:** {self.action} \n\n **Go in at:** {price(self.go_in)} \n\n **Go out at:** {price(self.go_out)} "
+                f"\n\n **Risk Level:** {self.risk_level} \n\n **Reason of Decision:** {self.reason_of_decision}")
+
+    def __repr__(self):
+        return f"Decision(action={self.action!r}, go_in={self.go_in!r}, go_out={self.go_out!r}, risk_level={self.risk_level!r})"
@@ -1,20 +1,50 @@
 import os
 import json
+import logging
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
 
-from openai import OpenAI
 from dotenv import load_dotenv
 
-from connector import news_fetcher, news_sentiment, technical_indicators
-from agents.utils.helpers import retry_request
+from connector import news_fetcher, news_sentiment
+from agents.utils import deadline
+from agents.utils.helpers import create_chat_completion, get_openai_client
+from agents.utils.run_cache import run_cache
+from agents.utils.token_budget import pack_batches
+from agents.utils.tracing import span
 
 load_dotenv()
 
+
+def batch_response_format(tickers):
+    """Builds the structured output format of a batched analysis: a JSON object with one string per ticker.
+
+    Args:
+        tickers (list[str]): The tickers of the batch.
+
+    Returns:
+        dict: The `response_format` of the request.
+    """
+    return {"type": "json_schema", "json_schema": {
+        "name": "technical_indicator_analyses",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {ticker: {"type": "string"} for ticker in tickers},
+            "required": list(tickers),
+            "additionalProperties": False,
+        },
+    }}
+
+
 class FinancialAnalystAgent:
-    def __init__(self):
+    def __init__(self, client=None):
         """Initializing OpenAI Client for the Financia lAnalyst Agent
+
+        Args:
+            client (openai.OpenAI): The OpenAI client. Defaults to the shared client.
         """
-        api_key = os.getenv('OPENAI_KEY')
-        self.client = OpenAI(api_key=api_key)
+        self.client = client or get_openai_client()
         with open('ticker_db.json') as f:
             self.TICKER_OVERVIEW_DB = json.load(f)
         self.news_fetcher_obj = news_fetcher.NewsFetcher(num_articles=9)
@@ -41,26 +71,36 @@ Provide:
 
 Be concise and ensure your analysis is focused, actionable, and cautious of risks.
 """
-        def make_api_call():
-            completion = self.client.chat.completions.create(
-                model="chatgpt-4o-latest",
-                messages=[
-                    {"role": "system", "content": instruction},
-                    {
-                        "role": "user",
-                        "content": context
-                    }
-                ]
-            )
-            return completion
-        
-        completion = retry_request(make_api_call)
+        content = create_chat_completion(
+            self.client,
+            model="chatgpt-4o-latest",
+            messages=[
+                {"role": "system", "content": instruction},
+                {
+                    "role": "user",
+                    "content": context
+                }
+            ],
+            call_type="bing_eval",
+        )
         print("Success: Generated Financial Evaluation on Bing Search Engine")
-        return completion.choices[0].message.content
+        return content
     
     def generate_financial_evaluation_on_general_news(self):
         """ Generate a financial evaluation based on general news.
 
+        The evaluation does not depend on a ticker, so it is computed once per run and shared by all tickers
+        (and, if `GENERAL_NEWS_EVAL_TTL` is set, across processes for that many seconds).
+
+        Returns:
+            str: The generated financial evaluation.
+        """
+        ttl = float(os.getenv('GENERAL_NEWS_EVAL_TTL', 0))
+        return run_cache.get_or_compute("general_news_eval", self._generate_financial_evaluation_on_general_news, ttl=ttl)
+
+    def _generate_financial_evaluation_on_general_news(self):
+        """ Generate a financial evaluation based on general news without memoization.
+
         Returns:
             str: The generated financial evaluation.
         """
@@ -81,22 +121,20 @@ Your response should include:
 
 Focus on clarity, brevity, and actionable insights while filtering out irrelevant or outdated information."
 """
-        def make_api_call():
-            completion = self.client.chat.completions.create(
-                model="chatgpt-4o-latest",
-                messages=[
-                    {"role": "system", "content": instruction},
-                    {
-                        "role": "user",
-                        "content": combined_context
-                    }
-                ]
-            )
-            return completion
-        
-        completion = retry_request(make_api_call)
+        content = create_chat_completion(
+            self.client,
+            model="chatgpt-4o-latest",
+            messages=[
+                {"role": "system", "content": instruction},
+                {
+                    "role": "user",
+                    "content": combined_context
+                }
+            ],
+            call_type="general_news_eval",
+        )
         print("Success: Generated Financial Evaluation on General News")
-        return completion.choices[0].message.content
+        return content
     
     def generate_financial_evaluation_on_stock_news(self, ticker):
         """ Generate a financial evaluation based on stock news.
@@ -119,22 +157,20 @@ Provide:
 
 Be concise and ensure your analysis is focused, actionable, and cautious of risks.
 """
-        def make_api_call():
-            completion = self.client.chat.completions.create(
-                model="chatgpt-4o-latest",
-                messages=[
-                    {"role": "system", "content": instruction},
-                    {
-                        "role": "user",
-                        "content": combined_context
-                    }
-                ]
-            )
-            return completion
-        
-        completion = retry_request(make_api_call)
+        content = create_chat_completion(
+            self.client,
+            model="chatgpt-4o-latest",
+            messages=[
+                {"role": "system", "content": instruction},
+                {
+                    "role": "user",
+                    "content": combined_context
+                }
+            ],
+            call_type="stock_news_eval",
+        )
         print("Success: Generated Financial Evaluation on Stock News")
-        return completion.choices[0].message.content
+        return content
     
     def generate_sentiment_analysis(self, ticker):
         """ generate a sentiment analysis based on the news sentiment data.
@@ -176,26 +212,46 @@ Be concise and ensure your analysis is focused, actionable, and cautious of risk
 
 Present your analysis in a detailed written report, structured in paragraphs with comprehensive insights and a clear conclusion on the trading strategy. Begin with a summary of key insights, followed by detailed analysis, and end with a final trading recommendation. 
 """
-        def make_api_call():
-            completion = self.client.chat.completions.create(
-                model="chatgpt-4o-latest",
-                messages=[
-                    {"role": "system", "content": instruction},
-                    {
-                        "role": "user",
-                        "content": news_sentiment_context
-                    }
-                ]
-            )
-            return completion
-        
-        completion = retry_request(make_api_call)
+        content = create_chat_completion(
+            self.client,
+            model="chatgpt-4o-latest",
+            messages=[
+                {"role": "system", "content": instruction},
+                {
+                    "role": "user",
+                    "content": news_sentiment_context
+                }
+            ],
+            call_type="sentiment_analysis",
+        )
         print("Success: Generated Sentiment Analysis")
-        return completion.choices[0].message.content
+        return content
     
     def generate_technical_indicator_analysis(self, ticker):
         """ Generate a technical indicator analysis based on the stock ticker.
 
+        The analysis of the batched requests of `precompute_technical_indicator_analyses` is used if the run has one;
+        a batch that is still running is awaited.
+
+        Args:
+            ticker (str): The stock ticker to evaluate.
+
+        Returns:
+            str: The generated technical indicator analysis.
+        """
+        precomputed = run_cache.get(f"techindicator_analysis_eval:{ticker}")
+        if isinstance(precomputed, Future):
+            try:
+                precomputed = precomputed.result(timeout=deadline.remaining())
+            except FutureTimeoutError as e:
+                raise deadline.DeadlineExceeded(f"the batched analysis of {ticker} did not finish in time") from e
+        if precomputed:
+            return precomputed
+        return self._generate_technical_indicator_analysis(ticker)
+
+    def _generate_technical_indicator_analysis(self, ticker):
+        """ Generate a technical indicator analysis of a single ticker with its own request.
+
         Args:
             ticker (str): The stock ticker to evaluate.
 
@@ -203,6 +259,8 @@ Present your analysis in a detailed written report, structured in paragraphs wit
             str: The generated technical indicator analysis.
         """
         company_name = self.TICKER_OVERVIEW_DB[ticker]
+        # pandas and numpy are only loaded by the stages that work on bars
+        from connector import technical_indicators
         technical_indicators_context = technical_indicators.fetch_technical_indicators_of_ticker(ticker=ticker)
         
         instruction = f"""Analyze the technical indicators of a stock from the past 30 days at one-day intervals to generate an opinion about day trading prospects for {company_name} ({ticker}) stock. The data for each day includes:
@@ -239,19 +297,145 @@ Use this data to provide a day trading evaluation for the stock.
 - State a clear opinion on the day trading prospects of the stock.
 - Especially focus on the last three days of the data to ensure the analysis is up-to-date.
 """
-        def make_api_call():
-            completion = self.client.chat.completions.create(
-                model="chatgpt-4o-latest",
-                messages=[
-                    {"role": "system", "content": instruction},
-                    {
-                        "role": "user",
-                        "content": technical_indicators_context
-                    }
-                ]
-            )
-            return completion
-        
-        completion = retry_request(make_api_call)
+        content = create_chat_completion(
+            self.client,
+            model="chatgpt-4o-latest",
+            messages=[
+                {"role": "system", "content": instruction},
+                {
+                    "role": "user",
+                    "content": technical_indicators_context
+                }
+            ],
+            call_type="technical_indicator_analysis",
+        )
         print("Success: Generated Technical Indicator Analysis")
-        return completion.choices[0].message.content
\ No newline at end of file
+        return content
+
+    def precompute_technical_indicator_analyses(self, tickers, executor=None):
+        """ Analyse the technical indicators of many tickers with a few batched requests and keep the analyses for
+        the run, so `generate_technical_indicator_analysis` does not send a request per ticker.
+
+        The compact indicator tables of as many tickers as fit into `TECH_ANALYSIS_BATCH_TOKENS` tokens (at most
+        `TECH_ANALYSIS_BATCH_MAX_TICKERS`) share one request and its instruction. A future per ticker is put into the
+        run cache right away, so evaluations started meanwhile only wait for the batch of their own ticker. Tickers
+        that fail or are missing in an answer are analysed individually.
+
+        Args:
+            tickers (list[str]): The stock tickers to analyse.
+            executor (concurrent.futures.Executor): Computes the batches in the background, so this returns at once.
+                Without an executor the batches are computed before returning.
+
+        Returns:
+            dict: Maps every ticker to the future of its analysis (None if it has to be analysed individually).
+        """
+        futures = {ticker: Future() for ticker in tickers}
+        for ticker, future in futures.items():
+            run_cache.put(f"techindicator_analysis_eval:{ticker}", future)
+        if executor is None:
+            self._precompute_technical_indicator_analyses(futures)
+        else:
+            executor.submit(contextvars.copy_context().run, self._precompute_technical_indicator_analyses, futures)
+        return futures
+
+    def _precompute_technical_indicator_analyses(self, futures):
+        """ Compute the batched analyses and resolve the futures of `precompute_technical_indicator_analyses`.
+
+        Args:
+            futures (dict): Maps every ticker to the future of its analysis.
+        """
+        try:
+            with span("techindicator_batch", kind="stage"), deadline.within(float(os.getenv('TICKER_DEADLINE', 180))):
+                # pandas and numpy are only loaded by the stages that work on bars
+                from connector import technical_indicators
+                tables = {}
+                for ticker in futures:
+                    try:
+                        tables[ticker] = technical_indicators.fetch_technical_indicators_of_ticker(ticker, layout="table")
+                    except Exception:
+                        logging.exception(f"Computing the technical indicators of {ticker} failed.")
+                        futures[ticker].set_result(None)
+                batches = pack_batches(tables, int(os.getenv('TECH_ANALYSIS_BATCH_TOKENS', 20000)),
+                                       int(os.getenv('TECH_ANALYSIS_BATCH_MAX_TICKERS', 8)))
+                if not batches:
+                    return
+                analysed = 0
+                with ThreadPoolExecutor(max_workers=min(len(batches), 4), thread_name_prefix="techindicator-batch") as executor:
+                    pending = {executor.submit(contextvars.copy_context().run, self._generate_technical_indicator_batch, batch): batch
+                               for batch in batches}
+                    # every batch is handed to its tickers as soon as it is done
+                    for future in as_completed(pending):
+                        batch = pending[future]
+                        try:
+                            analyses = future.result()
+                        except Exception:
+                            logging.exception(f"Batched technical indicator analysis of {', '.join(batch)} failed.")
+                            analyses = {}
+                        for ticker in batch:
+                            futures[ticker].set_result(analyses.get(ticker))
+                        analysed += len(analyses)
+                logging.info(f"Technical indicator analyses of {analysed}/{len(futures)} tickers in {len(batches)} batched requests.")
+        except Exception:
+            logging.exception("Batched technical indicator analysis failed. Tickers are analysed individually.")
+        finally:
+            # tickers without a batched analysis are analysed individually
+            for future in futures.values():
+                if not future.done():
+                    future.set_result(None)
+
+    def _generate_technical_indicator_batch(self, tables):
+        """ Analyse the indicator tables of several tickers with one request.
+
+        Args:
+            tables (dict): Maps a ticker to its indicator table (see `technical_indicators.format_as_table`).
+
+        Returns:
+            dict: Maps every ticker of the answer to its analysis.
+        """
+        context = "\n\n".join(f"### {ticker} ({self.TICKER_OVERVIEW_DB.get(ticker, ticker)})\n{table}" for ticker, table in tables.items())
+        instruction = f"""Analyze the technical indicators of several stocks from the past month at one-hour intervals to generate an opinion about the day trading prospects of each stock. The data of every stock is a CSV table below a `### TICKER (Company)` heading with the columns:
+
+- time: Start of the hour
+- close: Close price
+- rsi, rsi_status: Relative Strength Index and whether it is overbought, oversold or neutral
+- sma_20: 20-period Simple Moving Average
+- ema_20: 20-period Exponential Moving Average
+- vwap: Volume-Weighted Average Price
+- atr, atr_status: Average True Range and whether the volatility is high or low
+
+For every stock independently:
+1. Evaluate RSI for overbought or oversold conditions, SMA_20 and EMA_20 for momentum and trend direction, VWAP for the price relative to the traded volume and ATR for the expected volatility.
+2. Combine the indicator signals and look for confirmation of trends or reversals.
+3. Conclude with a clear opinion about the stock's suitability for day trading, with favorable entry and exit points or risks.
+Especially focus on the last three days of the data. Never mix up the data of different stocks.
+
+# Output Format
+
+Respond with a JSON object that maps every ticker ({", ".join(tables)}) to a detailed paragraph with its assessment.
+"""
+        content = create_chat_completion(
+            self.client,
+            # structured outputs are not available on chatgpt-4o-latest
+            model=os.getenv('TECH_ANALYSIS_BATCH_MODEL', 'gpt-4o'),
+            messages=[
+                {"role": "system", "content": instruction},
+                {
+                    "role": "user",
+                    "content": context
+                }
+            ],
+            call_type="technical_indicator_batch",
+            response_format=batch_response_format(list(tables)),
+        )
+        try:
+            answer = json.loads(content or "")
+        except ValueError as e:
+            logging.warning(f"Batched technical indicator analysis is not valid JSON: {e}")
+            answer = {}
+        if not isinstance(answer, dict):
+            answer = {}
+        analyses = {ticker: text for ticker, text in answer.items() if ticker in tables and isinstance(text, str) and text.strip()}
+        missing = set(tables) - set(analyses)
+        if missing:
+            logging.warning(f"Batched technical indicator analysis has no answer for {', '.join(sorted(missing))}.")
+        return analyses
@@ -0,0 +1,73 @@
+import time
+import contextvars
+from contextlib import contextmanager
+
+# absolute time.monotonic() by which the current ticker evaluation must be done
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised by a call that would start (or keep waiting) after the deadline of its evaluation."""
+
+
+@contextmanager
+def within(seconds):
+    """Bounds the block and every call made from it (also in thread pools that copy the context) to `seconds`.
+
+    A nested deadline can only shorten the enclosing one.
+
+    Args:
+        seconds (float): The budget in seconds. None leaves the enclosing deadline unchanged.
+
+    Yields:
+        float: The absolute deadline in `time.monotonic()` seconds, or None without a deadline.
+    """
+    current = _deadline.get()
+    if seconds is not None:
+        new = time.monotonic() + seconds
+        current = new if current is None else min(current, new)
+    token = _deadline.set(current)
+    try:
+        yield current
+    finally:
+        _deadline.reset(token)
+
+
+def remaining(default=None):
+    """Returns the seconds left until the deadline of the current context (at least 0), or `default` without one."""
+    current = _deadline.get()
+    if current is None:
+        return default
+    return max(0.0, current - time.monotonic())
+
+
+def expired():
+    """Returns True if the deadline of the current context has passed."""
+    return remaining() == 0.0
+
+
+def check():
+    """Raises DeadlineExceeded if the deadline of the current context has passed."""
+    if expired():
+        raise DeadlineExceeded("the evaluation ran out of time")
+
+
+def timeout(limit):
+    """Returns the timeout for a blocking call: `limit`, shortened to the time left until the deadline.
+
+    Args:
+        limit (float): The timeout of the call without a deadline.
+
+    Returns:
+        float: The timeout in seconds.
+
+    Raises:
+        DeadlineExceeded: If the deadline has already passed.
+    """
+    check()
+    return min(limit, remaining(default=limit))
+
+
+def is_timeout(error):
+    """Returns True if an exception is a timeout, e.g. DeadlineExceeded or a timeout of requests, Selenium or OpenAI."""
+    return isinstance(error, TimeoutError) or "timeout" in type(error).__name__.lower()
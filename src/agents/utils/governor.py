@@ -0,0 +1,435 @@
+import os
+import re
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+
+from agents.utils import deadline
+from agents.utils.deadline import DeadlineExceeded
+from agents.utils.tracing import current_span, span
+
+_governors = {}
+_governors_lock = threading.Lock()
+
+# error classes that can never succeed when retried
+PERMANENT_ERRORS = {"context_length", "client"}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a service whose circuit breaker is open."""
+
+
+def classify_error(error):
+    """Classifies an exception of an API call.
+
+    Works on the OpenAI SDK exceptions (and any exception with a `status_code`) without importing the SDK.
+
+    Args:
+        error (Exception): The exception.
+
+    Returns:
+        str: "rate_limit" (429), "server" (5xx, 408, 409), "context_length" (prompt too long),
+            "client" (other 4xx), "connection" (timeouts and connection errors) or "unknown".
+    """
+    status = getattr(error, "status_code", None)
+    message = str(error).lower()
+    code = str(getattr(error, "code", "") or "").lower()
+    if status == 429:
+        return "rate_limit"
+    if "context_length_exceeded" in code or "maximum context length" in message or "context_length_exceeded" in message:
+        return "context_length"
+    if status is not None and (status >= 500 or status in (408, 409)):
+        return "server"
+    if status is not None and 400 <= status < 500:
+        return "client"
+    name = type(error).__name__.lower()
+    if "timeout" in name or "connection" in name or isinstance(error, (TimeoutError, ConnectionError)):
+        return "connection"
+    return "unknown"
+
+
+def _duration_seconds(value):
+    """Parses durations like "1s", "6m0s", "20ms" or "0.5" into seconds."""
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = re.findall(r"([\d.]+)(ms|h|m|s)", value)
+    if not parts:
+        return None
+    factors = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(number) * factors[unit] for number, unit in parts)
+
+
+def retry_after(error):
+    """Reads the backoff hint of a server response.
+
+    Args:
+        error (Exception): The exception, whose `response` carries the headers.
+
+    Returns:
+        float: Seconds to wait according to `retry-after-ms`, `retry-after` or the `x-ratelimit-reset-*` headers,
+            or None without a hint.
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    if headers.get("retry-after-ms"):
+        seconds = _duration_seconds(headers["retry-after-ms"])
+        if seconds is not None:
+            return seconds / 1000
+    if headers.get("retry-after"):
+        seconds = _duration_seconds(headers["retry-after"])
+        if seconds is None:
+            try:
+                seconds = parsedate_to_datetime(headers["retry-after"]).timestamp() - time.time()
+            except (TypeError, ValueError):
+                seconds = None
+        if seconds is not None:
+            return max(0.0, seconds)
+    resets = [_duration_seconds(headers[key]) for key in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens") if headers.get(key)]
+    resets = [seconds for seconds in resets if seconds is not None]
+    return max(resets) if resets else None
+
+
+class TokenBucket:
+    """A token bucket refilled continuously at `rate_per_minute`, e.g. for requests or tokens per minute."""
+    def __init__(self, rate_per_minute, capacity=None):
+        """
+        Args:
+            rate_per_minute (float): Refill rate. 0 disables the limit.
+            capacity (float): Maximum burst. Defaults to one minute of refill.
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1, timeout=None):
+        """Takes `amount` tokens, waiting until they are available.
+
+        Amounts above the capacity are capped, so a single large request cannot block forever.
+
+        Args:
+            amount (float): The tokens to take.
+            timeout (float): Maximum seconds to wait, e.g. the time left until the deadline. None waits as long as needed.
+
+        Returns:
+            float: Seconds waited.
+
+        Raises:
+            DeadlineExceeded: If the tokens are not available within `timeout`.
+        """
+        if not self.rate:
+            return 0.0
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                wait = (amount - self.tokens) / self.rate
+            if timeout is not None:
+                if waited >= timeout:
+                    raise DeadlineExceeded(f"waited {waited:.1f}s for the rate limit")
+                wait = min(wait, timeout - waited)
+            time.sleep(wait)
+            waited += wait
+
+    def adjust(self, amount):
+        """Returns (positive) or additionally takes (negative) tokens, e.g. once the real usage of a call is known."""
+        if not self.rate:
+            return
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures and lets one trial call through after `reset_seconds`."""
+    def __init__(self, failure_threshold=5, reset_seconds=30):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """str: "closed", "open" or "half-open"."""
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_seconds else "open"
+
+    def allow(self):
+        """Decides if a call may go through. In the half-open state only one trial call is allowed.
+
+        Returns:
+            str: "call", or "trial" for the trial call of the half-open state, if the call may go through, otherwise None.
+        """
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return "call"
+            if state == "half-open" and not self._trial_running:
+                self._trial_running = True
+                return "trial"
+            return None
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def release_trial(self):
+        """Ends a trial call without an outcome (e.g. it was cut off by a deadline), so the next call can be the trial."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                if self.opened_at is None:
+                    logging.warning(f"Circuit breaker opened after {self.failures} consecutive failures.")
+                self.opened_at = time.monotonic()
+
+
+class AIMDLimiter:
+    """A concurrency limit that grows by one per window of successful calls and halves on rate limits."""
+    def __init__(self, initial=8, minimum=1, maximum=16):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, timeout=None):
+        """Waits for a free slot.
+
+        Args:
+            timeout (float): Maximum seconds to wait, e.g. the time left until the deadline. None waits as long as needed.
+
+        Returns:
+            float: Seconds waited.
+
+        Raises:
+            DeadlineExceeded: If no slot becomes free within `timeout`.
+        """
+        start = time.monotonic()
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.in_flight < int(self.limit), timeout=timeout):
+                raise DeadlineExceeded(f"waited {time.monotonic() - start:.1f}s for a free slot")
+            self.in_flight += 1
+        return time.monotonic() - start
+
+    def release(self, rate_limited=False, adjust=True):
+        """Frees a slot. The limit halves if the call was rate limited and grows otherwise, unless `adjust` is False
+        (e.g. the call never reached the service)."""
+        with self._condition:
+            self.in_flight -= 1
+            if not adjust:
+                pass
+            elif rate_limited:
+                self.limit = max(self.minimum, self.limit / 2)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class CallGovernor:
+    """Governs all calls to one API: rate limits, adaptive concurrency, error-aware retries and a circuit breaker.
+
+    Requests and tokens per minute are limited by token buckets. The concurrency adapts with AIMD, so parallel
+    evaluations use the quota without running into rate limits over and over. Rate limits and server errors are
+    retried with the server's backoff hint (`Retry-After`) or exponential backoff with jitter, and a rate limit
+    pauses all calls of the governor until its backoff is over. Errors that cannot succeed on a retry (prompt too
+    long, other 4xx) are raised at once. The tokens of a call are charged once, not per attempt.
+    """
+    def __init__(self, name, rpm=0, tpm=0, max_concurrency=16, initial_concurrency=8, max_retries=4,
+                 base_delay=1.0, max_delay=60.0, failure_threshold=5, reset_seconds=30):
+        """
+        Args:
+            name (str): The name of the governed API, used in log messages.
+            rpm (float): Requests per minute. 0 disables the limit.
+            tpm (float): Tokens per minute. 0 disables the limit.
+            max_concurrency (int): Upper bound of the adaptive concurrency.
+            initial_concurrency (int): Start value of the adaptive concurrency.
+            max_retries (int): Retries of a call after its first attempt.
+            base_delay (float): Seconds of the first exponential backoff without a server hint.
+            max_delay (float): Maximum seconds of a backoff.
+            failure_threshold (int): Consecutive failures after which the circuit breaker opens.
+            reset_seconds (float): Seconds after which an open circuit breaker lets a trial call through.
+        """
+        self.name = name
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.concurrency = AIMDLimiter(initial=min(initial_concurrency, max_concurrency), maximum=max_concurrency)
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        # monotonic time until which all calls wait, e.g. after a rate limit
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _block(self, seconds):
+        """Pauses all calls for `seconds`, e.g. after the server reported a rate limit."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def _wait_until_unblocked(self):
+        """Waits until a pause of `_block` is over. Returns the seconds waited.
+
+        Raises:
+            DeadlineExceeded: If the pause ends after the deadline.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                pause = self._blocked_until - time.monotonic()
+            if pause <= 0:
+                return waited
+            if pause > deadline.remaining(default=float("inf")):
+                raise DeadlineExceeded(f"{self.name}: calls are paused for {pause:.1f}s after a rate limit")
+            time.sleep(pause)
+            waited += pause
+
+    def _backoff(self, attempt, error, error_class):
+        hint = retry_after(error)
+        if hint is not None:
+            return min(self.max_delay, hint)
+        # full jitter
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _acquire(self, tokens):
+        """Waits for a pause to end, a concurrency slot and the rate limits, at most until the deadline. Returns the
+        seconds waited."""
+        waited = self._wait_until_unblocked()
+        waited += self.concurrency.acquire(timeout=deadline.remaining())
+        try:
+            waited += self.requests.acquire(1, timeout=deadline.remaining())
+            try:
+                if tokens:
+                    waited += self.tokens.acquire(tokens, timeout=deadline.remaining())
+            except DeadlineExceeded:
+                self.requests.adjust(1)
+                raise
+        except DeadlineExceeded:
+            self.concurrency.release(adjust=False)
+            raise
+        return waited
+
+    def call(self, func, *args, tokens=0, max_retries=None, **kwargs):
+        """Calls `func` within the limits and retries it on transient errors.
+
+        Args:
+            func (callable): The API call.
+            *args: Positional arguments of `func`.
+            tokens (int): Estimated tokens of the call (prompt and completion) for the tokens-per-minute limit.
+            max_retries (int): Overrides the number of retries of the governor.
+            **kwargs: Keyword arguments of `func`.
+
+        Returns:
+            The result of `func`.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open.
+            DeadlineExceeded: If the deadline of the current context (see `deadline`) has passed.
+            Exception: The error of the last attempt, the first permanent error, or an error whose retry
+                would end after the deadline.
+        """
+        max_retries = self.max_retries if max_retries is None else max_retries
+        for attempt in range(max_retries + 1):
+            deadline.check()
+            permit = self.breaker.allow()
+            if permit is None:
+                raise CircuitOpenError(f"{self.name}: circuit breaker is open after repeated failures")
+            try:
+                # every attempt is a request, but the tokens of the call are only charged by the first one
+                waited = self._acquire(tokens if attempt == 0 else 0)
+            except DeadlineExceeded:
+                if permit == "trial":
+                    self.breaker.release_trial()
+                raise
+            if current_span() is not None and waited > 0.01:
+                current_span().add("governor_wait", waited)
+            rate_limited = False
+            # the breaker learns the outcome of every call, except calls cut off by the deadline of their evaluation
+            recorded = False
+            try:
+                result = func(*args, **kwargs)
+            except DeadlineExceeded:
+                raise
+            except Exception as error:
+                if deadline.is_timeout(error) and deadline.expired():
+                    # the request timeout was shortened to the deadline, the service did not fail
+                    raise DeadlineExceeded(f"{self.name}: the call ran out of time ({error})") from error
+                recorded = True
+                error_class = classify_error(error)
+                rate_limited = error_class == "rate_limit"
+                if error_class in PERMANENT_ERRORS or rate_limited:
+                    # the service is up, the request or the quota is the problem
+                    self.breaker.record_success()
+                else:
+                    self.breaker.record_failure()
+                if error_class in PERMANENT_ERRORS:
+                    raise
+                delay = self._backoff(attempt, error, error_class)
+                # a retry after the deadline of the evaluation would be cut off anyway
+                if attempt == max_retries or delay >= deadline.remaining(default=float("inf")):
+                    raise
+                message = str(error)
+                if rate_limited:
+                    # every caller waits for the reset, not only this one
+                    self._block(delay)
+                logging.warning(f"{self.name}: {error_class} error ({error}), retry {attempt + 1}/{max_retries} in {delay:.1f}s")
+                if current_span() is not None:
+                    current_span().add("retries")
+            else:
+                recorded = True
+                self.breaker.record_success()
+                return result
+            finally:
+                if not recorded and permit == "trial":
+                    self.breaker.release_trial()
+                self.concurrency.release(rate_limited=rate_limited, adjust=recorded)
+            with span("retry.backoff", kind="retry", attempt=attempt + 1, sleep=delay, error_class=error_class, error=message):
+                time.sleep(delay)
+
+
+def get_governor(name="openai"):
+    """Returns the process-wide governor of an API, configured by `<NAME>_RPM`, `<NAME>_TPM`,
+    `<NAME>_MAX_CONCURRENCY` and `<NAME>_MAX_RETRIES` (e.g. `OPENAI_RPM`).
+
+    Args:
+        name (str): The name of the API.
+
+    Returns:
+        CallGovernor: The shared governor.
+    """
+    with _governors_lock:
+        if name not in _governors:
+            prefix = name.upper()
+            _governors[name] = CallGovernor(
+                name,
+                rpm=float(os.getenv(f'{prefix}_RPM', 0)),
+                tpm=float(os.getenv(f'{prefix}_TPM', 0)),
+                max_concurrency=int(os.getenv(f'{prefix}_MAX_CONCURRENCY', 16)),
+                max_retries=int(os.getenv(f'{prefix}_MAX_RETRIES', 4)),
+                failure_threshold=int(os.getenv('CIRCUIT_BREAKER_THRESHOLD', 5)),
+                reset_seconds=float(os.getenv('CIRCUIT_BREAKER_RESET', 30)),
+            )
+        return _governors[name]
@@ -1,19 +1,177 @@
+import os
 import time
-import random
-import openai
-
-def retry_request(func, *args, max_retries=2, **kwargs):
-    base_sleep = 1  # base sleep time in seconds
-    for attempt in range(max_retries + 1):
-        try:
-            return func(*args, **kwargs)
-        except Exception as e:
-            # Handle non-OpenAI specific exceptions
-            print(f"An unexpected error occurred: {str(e)}")
-            if attempt == max_retries:
-                raise
-            sleep_time = base_sleep * 2 ** attempt
-            sleep_time += random.uniform(0, base_sleep)
-            print(f"Retrying request, attempt {attempt + 1}. Waiting {sleep_time} seconds. General Error: {str(e)}")
-            time.sleep(sleep_time)
-    return None
\ No newline at end of file
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from agents.utils import deadline
+from agents.utils.deadline import DeadlineExceeded, is_timeout
+from agents.utils.governor import get_governor
+from agents.utils.llm_cache import get_llm_cache
+from agents.utils.tracing import current_span, span
+
+_client = None
+_client_lock = threading.Lock()
+# completion tokens reserved per LLM call before its real usage is known
+COMPLETION_TOKEN_ESTIMATE = 500
+
+def get_openai_client():
+    """Returns the process-wide OpenAI client. The client is thread-safe, so all agents share its connection pool.
+
+    Returns:
+        openai.OpenAI: The shared client.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            # openai is slow to import, so it is only loaded once a client is needed
+            import openai
+            # retries are left to the call governor, which shares rate limits and backoff across all calls
+            _client = openai.OpenAI(api_key=os.getenv('OPENAI_KEY'), max_retries=0)
+        return _client
+
+def retry_request(func, *args, max_retries=None, governor="openai", **kwargs):
+    """Call `func` through a call governor, which retries transient errors and applies its rate limits.
+
+    Args:
+        func (callable): The call.
+        *args: Positional arguments of `func`.
+        max_retries (int): Retries after the first attempt. Defaults to the governor's setting.
+        governor (str): The name of the governor (see `get_governor`).
+        **kwargs: Keyword arguments of `func`.
+
+    Returns:
+        The result of `func`.
+    """
+    return get_governor(governor).call(func, *args, max_retries=max_retries, **kwargs)
+
+def run_task_graph(tasks, max_workers=None, on_done=None, timeout=None, fallback=None):
+    """Run a small dependency graph of tasks, executing independent branches concurrently.
+
+    Args:
+        tasks (dict): Maps a task name to a tuple `(func, dependencies)`. `func` is called with the
+            results of its dependencies as keyword arguments once all of them are done.
+        max_workers (int): Maximum number of tasks running at the same time. Defaults to the number of tasks.
+        on_done (callable): Called with the name and the result of every task once it is done (e.g. for progress).
+        timeout (float): Seconds after which unfinished tasks are given up. Their threads are not waited for.
+        fallback (callable): Called with the name of a task and the error if the task timed out or was given up,
+            and returns the result used instead. Without it, timeouts are raised.
+
+    Returns:
+        dict: Maps every task name to its result.
+
+    Raises:
+        ValueError: If a dependency is unknown or the graph contains a cycle.
+        DeadlineExceeded: If `timeout` passed and no `fallback` is given.
+    """
+    for name, (_, dependencies) in tasks.items():
+        unknown = set(dependencies) - set(tasks)
+        if unknown:
+            raise ValueError(f"Task '{name}' depends on unknown tasks: {sorted(unknown)}")
+
+    def finish(name, result):
+        results[name] = result
+        if on_done is not None:
+            on_done(name, result)
+
+    def give_up(name, error):
+        if fallback is None:
+            raise error
+        finish(name, fallback(name, error))
+
+    results = {}
+    pending = dict(tasks)
+    running = {}
+    end = None if timeout is None else time.monotonic() + timeout
+    timed_out = False
+    executor = ThreadPoolExecutor(max_workers=max_workers or len(tasks) or 1)
+    try:
+        while pending or running:
+            ready = [name for name, (_, dependencies) in pending.items() if all(dep in results for dep in dependencies)]
+            if not ready and not running:
+                raise ValueError(f"Task graph contains a cycle: {sorted(pending)}")
+            for name in ready:
+                func, dependencies = pending.pop(name)
+                # every task runs in a copy of the caller's context, so its span is a child of the caller's span
+                running[executor.submit(contextvars.copy_context().run, _run_stage, name, func,
+                                        **{dep: results[dep] for dep in dependencies})] = name
+            done, _ = wait(running, timeout=None if end is None else max(0.0, end - time.monotonic()),
+                           return_when=FIRST_COMPLETED)
+            if not done:
+                timed_out = True
+                for name in [*running.values(), *pending]:
+                    give_up(name, DeadlineExceeded(f"task '{name}' did not finish within {timeout:.0f}s"))
+                break
+            for future in done:
+                name = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if not is_timeout(e):
+                        raise
+                    give_up(name, e)
+                else:
+                    finish(name, result)
+    finally:
+        # threads of given up tasks finish in the background, bounded by the deadline of their context
+        executor.shutdown(wait=not timed_out, cancel_futures=True)
+    return results
+
+
+def _run_stage(name, func, **kwargs):
+    with span(name, kind="stage"):
+        return func(**kwargs)
+
+
+def create_chat_completion(client, model, messages, call_type, bypass_cache=False, on_stream=None, **params):
+    """Send a chat completion request through the OpenAI call governor, serving identical requests from the LLM cache.
+
+    Args:
+        client (openai.OpenAI): The OpenAI client.
+        model (str): The model name.
+        messages (list[dict]): The chat messages.
+        call_type (str): The kind of call (e.g. "bing_eval"), which selects the cache TTL.
+        bypass_cache (bool): Skip the cache lookup and always call the API.
+        on_stream (callable): If given, the answer is streamed and this is called with the answer so far after
+            every chunk (a retry starts over), and once with a cached answer.
+        **params: Further request parameters (e.g. `response_format`), which are part of the cache key.
+
+    Returns:
+        str: The content of the answer.
+    """
+    def record_usage(llm_span, usage):
+        if usage is not None:
+            llm_span.set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+
+    def make_api_call():
+        llm_span = current_span()
+        llm_span.set(cache="miss")
+        # the request is cut off at the deadline of the evaluation
+        request_timeout = deadline.timeout(float(os.getenv('LLM_REQUEST_TIMEOUT', 120)))
+        if on_stream is None:
+            completion = client.chat.completions.create(model=model, messages=messages, timeout=request_timeout, **params)
+            record_usage(llm_span, completion.usage)
+            return completion.choices[0].message.content
+        content = ""
+        stream = client.chat.completions.create(model=model, messages=messages, stream=True, timeout=request_timeout,
+                                                stream_options={"include_usage": True}, **params)
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                content += chunk.choices[0].delta.content
+                on_stream(content)
+            record_usage(llm_span, getattr(chunk, "usage", None))
+        return content
+
+    prompt_chars = sum(len(str(message["content"])) for message in messages)
+    # rough estimate (4 characters per token) for the tokens-per-minute limit, corrected once the usage is known
+    estimated_tokens = prompt_chars // 4 + COMPLETION_TOKEN_ESTIMATE
+    governor = get_governor("openai")
+    with span(f"llm.{call_type}", kind="llm", model=model, prompt_chars=prompt_chars, cache="hit") as llm_span:
+        content = get_llm_cache().get_or_call(call_type, model, messages,
+                                              lambda: governor.call(make_api_call, tokens=estimated_tokens), bypass=bypass_cache, **params)
+        llm_span.set(response_chars=len(content or ""))
+        if llm_span.attrs.get("prompt_tokens") is not None:
+            governor.tokens.adjust(estimated_tokens - llm_span.attrs["prompt_tokens"] - (llm_span.attrs.get("completion_tokens") or 0))
+    if on_stream is not None:
+        on_stream(content)
+    return content
@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+
+# seconds an answer stays valid per call type. Override with LLM_CACHE_TTL_<CALL_TYPE>, e.g. LLM_CACHE_TTL_BING_EVAL=600.
+DEFAULT_TTLS = {
+    "bing_eval": 60 * 60,
+    "general_news_eval": 30 * 60,
+    "stock_news_eval": 30 * 60,
+    "sentiment_analysis": 60 * 60,
+    "technical_indicator_analysis": 60 * 60,
+    "technical_indicator_batch": 60 * 60,
+    "day_trading_action": 5 * 60,
+    "decision_repair": 60 * 60,
+    "evaluation_summary": 60 * 60,
+}
+DEFAULT_TTL = 30 * 60
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def request_key(model, messages, **params):
+    """Hashes a chat completion request.
+
+    Args:
+        model (str): The model name.
+        messages (list[dict]): The chat messages.
+        **params: Further request parameters that influence the answer (e.g. `response_format`).
+
+    Returns:
+        str: The SHA-256 hex digest of the request.
+    """
+    payload = json.dumps({"model": model, "messages": messages, **params}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """A content-addressed cache of LLM answers keyed by a hash of model and messages.
+
+    The SQLite file is shared by the scheduler and the Streamlit app, so identical context is only sent once.
+    """
+    def __init__(self, path=None, bypass=False):
+        """Opens (and creates if needed) the cache database.
+
+        Args:
+            path (str): The SQLite database file. Defaults to a file in `CACHE_DIR` (`.cache`).
+            bypass (bool): If True, every request goes to the API and nothing is read from the cache.
+        """
+        self.bypass = bypass
+        self._counters = {}
+        self._lock = threading.Lock()
+        path = path or os.path.join(os.getenv('CACHE_DIR', '.cache'), 'llm_cache.sqlite')
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, call_type TEXT, content TEXT, created REAL)"
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS latest (label TEXT PRIMARY KEY, content TEXT, created REAL)")
+
+    @staticmethod
+    def ttl_for(call_type):
+        """Returns the TTL in seconds of a call type."""
+        return float(os.getenv(f"LLM_CACHE_TTL_{call_type.upper()}", DEFAULT_TTLS.get(call_type, DEFAULT_TTL)))
+
+    def _count(self, call_type, outcome):
+        with self._lock:
+            counters = self._counters.setdefault(call_type, {"hits": 0, "misses": 0, "bypassed": 0})
+            counters[outcome] += 1
+
+    def stats(self):
+        """Returns the hit/miss counters of this process.
+
+        Returns:
+            dict: Hits, misses and bypassed lookups per call type.
+        """
+        with self._lock:
+            return {call_type: dict(counters) for call_type, counters in self._counters.items()}
+
+    def get(self, key, call_type):
+        """Returns a cached answer that is younger than the TTL of its call type, otherwise None."""
+        with self._lock:
+            row = self._conn.execute("SELECT content, created FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is not None and time.time() - row[1] < self.ttl_for(call_type):
+            return row[0]
+        return None
+
+    def put(self, key, call_type, content):
+        """Stores an answer."""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", (key, call_type, content, time.time()))
+
+    def put_latest(self, label, content):
+        """Stores the latest result under a stable label (e.g. "AAPL:bing_eval"), as a fallback for later runs
+        whose own evaluation does not finish in time."""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO latest VALUES (?, ?, ?)", (label, content, time.time()))
+
+    def get_latest(self, label, max_age=None):
+        """Returns the latest result stored under a label.
+
+        Args:
+            label (str): The label.
+            max_age (float): Maximum age in seconds. Defaults to no limit.
+
+        Returns:
+            tuple[str, float]: The content and its creation time, or None.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT content, created FROM latest WHERE label = ?", (label,)).fetchone()
+        if row is None or (max_age is not None and time.time() - row[1] > max_age):
+            return None
+        return row
+
+    def get_or_call(self, call_type, model, messages, func, bypass=False, **params):
+        """Returns the cached answer of a request or calls `func` and caches its answer.
+
+        Args:
+            call_type (str): The kind of call, which selects the TTL and groups the statistics.
+            model (str): The model name.
+            messages (list[dict]): The chat messages.
+            func (callable): Sends the request and returns the answer text.
+            bypass (bool): Skip the cache lookup for this call. The fresh answer is still stored.
+            **params: Further request parameters that are part of the cache key.
+
+        Returns:
+            str: The answer text.
+        """
+        key = request_key(model, messages, **params)
+        if self.bypass or bypass:
+            self._count(call_type, "bypassed")
+        else:
+            content = self.get(key, call_type)
+            if content is not None:
+                self._count(call_type, "hits")
+                return content
+            self._count(call_type, "misses")
+        content = func()
+        if content:
+            self.put(key, call_type, content)
+        return content
+
+
+def get_llm_cache():
+    """Returns the process-wide LLM cache. `LLM_CACHE_BYPASS=1` disables cache lookups.
+
+    Returns:
+        LLMCache: The shared LLM cache.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache(bypass=os.getenv('LLM_CACHE_BYPASS', '0').lower() in ('1', 'true', 'yes'))
+        return _cache
@@ -0,0 +1,114 @@
+import os
+import json
+import time
+import threading
+
+
+class RunCache:
+    """Memoizes ticker-independent results (e.g. the general market evaluation) for the duration of a run.
+
+    Values live in memory until `clear` is called at the start of the next run, or until they are older than
+    `max_age` seconds. The age limit bounds their lifetime in long-lived processes without runs, e.g. the Streamlit
+    app. If a `ttl` is given for a key, the value is additionally persisted to a JSON file, so other processes
+    (e.g. the Streamlit app and the scheduler) can reuse it until it expires.
+    """
+    def __init__(self, path=None, max_age=None):
+        """Initializes an empty run cache.
+
+        Args:
+            path (str): The JSON file used for TTL-scoped, cross-process entries. Defaults to a file in `CACHE_DIR` (`.cache`).
+            max_age (float): Seconds an in-memory value is served. Defaults to `RUN_CACHE_MAX_AGE` (900). 0 disables the limit.
+        """
+        self._path = path
+        self._max_age = max_age
+        self._values = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        return self._path or os.path.join(os.getenv('CACHE_DIR', '.cache'), 'run_cache.json')
+
+    @property
+    def max_age(self):
+        return self._max_age if self._max_age is not None else float(os.getenv('RUN_CACHE_MAX_AGE', 900))
+
+    def _fresh(self, key):
+        """Returns the in-memory entry of `key` as a (value, created) tuple, or None if it is missing or too old."""
+        entry = self._values.get(key)
+        if entry is not None and self.max_age and time.time() - entry[1] >= self.max_age:
+            del self._values[key]
+            return None
+        return entry
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _read_disk(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_disk(self, key, value):
+        with self._lock:
+            entries = self._read_disk()
+            entries[key] = {"value": value, "created": time.time()}
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+
+    def get_or_compute(self, key, func, ttl=None):
+        """Returns the cached value for `key` or computes it with `func`.
+
+        Concurrent callers asking for the same key wait for the first computation instead of repeating it.
+        Exceptions are not cached.
+
+        Args:
+            key (str): The cache key.
+            func (callable): Computes the value if it is not cached. The value must be JSON serializable if `ttl` is set.
+            ttl (float): Optional number of seconds the value is shared across processes through the cache file.
+
+        Returns:
+            The cached or computed value.
+        """
+        with self._key_lock(key):
+            with self._lock:
+                entry = self._fresh(key)
+            if entry is not None:
+                return entry[0]
+            if ttl:
+                entry = self._read_disk().get(key)
+                if entry and time.time() - entry["created"] < ttl:
+                    with self._lock:
+                        self._values[key] = (entry["value"], entry["created"])
+                    return entry["value"]
+            value = func()
+            with self._lock:
+                self._values[key] = (value, time.time())
+            if ttl:
+                self._write_disk(key, value)
+            return value
+
+    def get(self, key, default=None):
+        """Returns the in-memory value of `key`, or `default` if it was not computed in this run or is too old."""
+        with self._lock:
+            entry = self._fresh(key)
+        return default if entry is None else entry[0]
+
+    def put(self, key, value):
+        """Stores a value for the rest of the run, e.g. one of several results computed together."""
+        with self._lock:
+            self._values[key] = (value, time.time())
+
+    def clear(self):
+        """Forgets all in-memory values, which starts a new run. Persisted TTL entries stay valid."""
+        with self._lock:
+            self._values.clear()
+
+
+run_cache = RunCache()
@@ -0,0 +1,78 @@
+import logging
+
+from common.tokens import count_tokens, truncate_to_tokens
+
+
+def pack_batches(items, max_batch_tokens, max_batch_items):
+    """Packs items into batches in order, so that no batch exceeds `max_batch_tokens` or `max_batch_items`.
+    An item that exceeds the token budget on its own gets a batch of its own.
+
+    Args:
+        items (dict[str, str]): Maps a key (e.g. a ticker) to its text.
+        max_batch_tokens (int): The maximum number of tokens of the texts of a batch.
+        max_batch_items (int): The maximum number of items of a batch.
+
+    Returns:
+        list[dict[str, str]]: The batches.
+    """
+    batches, batch, total = [], {}, 0
+    for key, text in items.items():
+        tokens = count_tokens(text)
+        if batch and (total + tokens > max_batch_tokens or len(batch) >= max_batch_items):
+            batches.append(batch)
+            batch, total = {}, 0
+        batch[key] = text
+        total += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class TokenBudget:
+    """Enforces per-section and total token budgets on the sections of a prompt context and logs their sizes."""
+    def __init__(self, total, limits=None, keep=None, name="prompt"):
+        """Initializes the budget.
+
+        Args:
+            total (int): The maximum number of tokens of all sections.
+            limits (dict): Maximum tokens per section name. Sections without a limit are only bound by `total`.
+            keep (dict): Per section, "head" or "tail" (see `truncate_to_tokens`). Defaults to "head".
+            name (str): Name used in the log message.
+        """
+        self.total = total
+        self.limits = limits or {}
+        self.keep = keep or {}
+        self.name = name
+
+    def fit(self, sections):
+        """Trims the sections to their budgets.
+
+        Sections over their own limit are truncated first. If the total is still exceeded, the largest sections
+        are cut down to an equal share of the remaining budget, so no single section starves the others.
+
+        Args:
+            sections (dict): Maps section names to their texts, in prompt order.
+
+        Returns:
+            dict: The trimmed sections in the same order.
+        """
+        counts = {name: count_tokens(text) for name, text in sections.items()}
+        fitted = {}
+        for name, text in sections.items():
+            limit = self.limits.get(name)
+            fitted[name] = truncate_to_tokens(text, limit, self.keep.get(name, "head")) if limit and counts[name] > limit else str(text)
+        fitted_counts = {name: count_tokens(text) for name, text in fitted.items()}
+
+        if sum(fitted_counts.values()) > self.total:
+            remaining, share = self.total, 0
+            by_size = sorted(fitted_counts, key=lambda name: (fitted_counts[name], name))
+            for position, name in enumerate(by_size):
+                share = remaining // (len(by_size) - position)
+                if fitted_counts[name] > share:
+                    fitted[name] = truncate_to_tokens(fitted[name], share, self.keep.get(name, "head"))
+                    fitted_counts[name] = count_tokens(fitted[name])
+                remaining -= fitted_counts[name]
+
+        sizes = ", ".join(f"{name}={counts[name]}->{fitted_counts[name]}" for name in sections)
+        logging.info(f"{self.name} tokens: {sizes} (total {sum(counts.values())}->{sum(fitted_counts.values())}, budget {self.total})")
+        return fitted
@@ -0,0 +1,166 @@
+import os
+import re
+import json
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from collections import defaultdict
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_current_run = contextvars.ContextVar("current_run", default=None)
+# threads that were not started with a copied context (e.g. the outbox sender) record into the active run
+_active_run = None
+
+
+class Span:
+    """A timed operation of a run (a stage, a connector or LLM call, a retry or an email send)."""
+    def __init__(self, name, kind, parent=None, ticker=None, attrs=None):
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.name = name
+        self.kind = kind
+        self.ticker = ticker or (parent.ticker if parent else None)
+        self.attrs = dict(attrs or {})
+        self.start = time.time()
+        self.duration = None
+        self.status = "ok"
+        self.error = None
+
+    def set(self, **attrs):
+        """Sets attributes of the span, e.g. payload sizes or token usage."""
+        self.attrs.update(attrs)
+
+    def add(self, key, amount=1):
+        """Increments a numeric attribute of the span, e.g. its retry count."""
+        self.attrs[key] = self.attrs.get(key, 0) + amount
+
+    def to_dict(self):
+        return {"span_id": self.span_id, "parent_id": self.parent_id, "name": self.name, "kind": self.kind,
+                "ticker": self.ticker, "start": self.start, "duration": self.duration, "status": self.status,
+                "error": self.error, **self.attrs}
+
+
+class TraceRun:
+    """Collects the spans of one run and appends them to a JSONL file as they finish."""
+    def __init__(self, run_id, path=None):
+        """
+        Args:
+            run_id (str): The id of the run.
+            path (str): The JSONL file. Defaults to `<run_id>.jsonl` in `TRACE_DIR` (`CACHE_DIR/traces`).
+        """
+        self.run_id = run_id
+        trace_dir = os.getenv('TRACE_DIR', os.path.join(os.getenv('CACHE_DIR', '.cache'), 'traces'))
+        self.path = path or os.path.join(trace_dir, re.sub(r"[^\w.-]", "_", run_id) + ".jsonl")
+        self.spans = []
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._file = open(self.path, "a")
+
+    def record(self, span):
+        line = json.dumps({"run_id": self.run_id, **span.to_dict()}, default=str)
+        with self._lock:
+            self.spans.append(span)
+            if not self._file.closed:
+                self._file.write(line + "\n")
+                self._file.flush()
+
+    def summary(self):
+        """Aggregates the spans per ticker and span name.
+
+        Returns:
+            str: A table with calls, total and maximum seconds, retries, LLM tokens and errors.
+        """
+        rows = defaultdict(lambda: {"calls": 0, "seconds": 0.0, "max": 0.0, "retries": 0, "tokens_in": 0, "tokens_out": 0, "errors": 0})
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            row = rows[(span.ticker or "-", span.name)]
+            row["calls"] += 1
+            row["seconds"] += span.duration
+            row["max"] = max(row["max"], span.duration)
+            row["retries"] += span.attrs.get("retries", 0)
+            row["tokens_in"] += span.attrs.get("prompt_tokens", 0) or 0
+            row["tokens_out"] += span.attrs.get("completion_tokens", 0) or 0
+            row["errors"] += span.status != "ok"
+        lines = [f"{'Ticker':<10}{'Span':<36}{'Calls':>6}{'Total s':>9}{'Max s':>8}{'Retries':>8}{'Tok in':>8}{'Tok out':>8}{'Errors':>7}"]
+        for (ticker, name), row in sorted(rows.items(), key=lambda item: (item[0][0], -item[1]["seconds"])):
+            lines.append(f"{ticker:<10}{name:<36}{row['calls']:>6}{row['seconds']:>9.2f}{row['max']:>8.2f}"
+                         f"{row['retries']:>8}{row['tokens_in']:>8}{row['tokens_out']:>8}{row['errors']:>7}")
+        return "\n".join(lines)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def start_run(run_id):
+    """Starts recording the spans of a run in the current context.
+
+    Args:
+        run_id (str): The id of the run.
+
+    Returns:
+        TraceRun: The run, to be passed to `end_run`.
+    """
+    global _active_run
+    run = TraceRun(run_id)
+    _active_run = run
+    _current_run.set(run)
+    return run
+
+
+def end_run(run):
+    """Logs the summary table of a run and closes its JSONL file.
+
+    Args:
+        run (TraceRun): The run returned by `start_run`.
+    """
+    global _active_run
+    logging.info(f"Trace summary of run {run.run_id} ({run.path}):\n{run.summary()}")
+    run.close()
+    if _active_run is run:
+        _active_run = None
+    if _current_run.get() is run:
+        _current_run.set(None)
+
+
+def current_span():
+    """Returns the innermost open span of the current context, or None."""
+    return _current_span.get()
+
+
+@contextmanager
+def span(name, kind="connector", ticker=None, **attrs):
+    """Times a block as a span of the current run. Without a run the span is timed but not recorded.
+
+    Child spans inherit the ticker of their parent. Thread pools must run their tasks with
+    `contextvars.copy_context().run` to keep the parent span.
+
+    Args:
+        name (str): The name of the span (e.g. "bing.search").
+        kind (str): The kind of span, e.g. "ticker", "stage", "connector", "llm", "retry" or "email".
+        ticker (str): The ticker the span belongs to. Defaults to the ticker of the parent span.
+        **attrs: Additional attributes, e.g. payload sizes.
+
+    Yields:
+        Span: The span, whose attributes can be set while it is open.
+    """
+    run = _current_run.get() or _active_run
+    new_span = Span(name, kind, parent=_current_span.get(), ticker=ticker, attrs=attrs)
+    token = _current_span.set(new_span)
+    start = time.perf_counter()
+    try:
+        yield new_span
+    except BaseException as e:
+        new_span.status = "error"
+        new_span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        new_span.duration = time.perf_counter() - start
+        _current_span.reset(token)
+        if run is not None:
+            run.record(new_span)
+
@@ -1,11 +1,10 @@
 import json
-import time
-import re
 import os
+import uuid
 import streamlit as st
 from dotenv import load_dotenv
-from agents.day_trader import DayTraderAgent
-from connector.email_bot import send_email
+from agents.utils.helpers import get_openai_client
+from job_runner import JobRunner
 
 # Load environment variables
 load_dotenv()
@@ -24,38 +23,38 @@ with open('ticker_db.json') as f:
     ticker_db = json.load(f)
 tickers = ticker_db.keys()
 
-def extract_json_from_string(string):
-    json_pattern = re.compile(r'```json(.*?)```', re.DOTALL)
-    json_match = json_pattern.search(string)
-    if json_match:
-        json_str = json_match.group(1).strip()
-        json_ = json.loads(json_str)
-
-        formatted_action = f"**Action:** {json_['action']} \n\n Certificate Type: {json_['buy_type']} \n\n **Amount**: {json_['amount']} \n\n **Rechecking process in seconds**: {json_['look_back_in_seconds']} \n\n **Reason of Decision:** {json_['reason_of_decision']}"
-        if json_['buy_type'] == None:
-            return "hold", formatted_action
-        else:
-            return json_['buy_type'], formatted_action
-    return None, string
+@st.cache_resource
+def get_job_runner():
+    """The background job runner shared by all sessions. Its jobs share the OpenAI client, not their agents."""
+    return JobRunner(client=get_openai_client(), max_workers=int(os.getenv('MAX_TICKER_WORKERS', 4)))
+
+def show_jobs():
+    """Renders the progress and the streamed decisions of the jobs of this session."""
+    jobs = st.session_state.get("jobs", [])
+    for job in jobs:
+        with st.container():
+            st.subheader(job.ticker)
+            st.progress(job.progress)
+            st.caption(job.status)
+            if job.decision:
+                st.markdown(job.decision)
+    if st.session_state.get("jobs_running") and all(job.done for job in jobs):
+        # one last rerun of the whole script stops the polling
+        st.session_state.jobs_running = False
+        st.rerun()
 
 selected_tickers = st.multiselect('Select tickers', tickers)
 
 # a input mask for messages
 message = st.text_area("Please provide your trading goal")
 if st.button('Submit'):
-    for ticker in selected_tickers:
-        day_trader = DayTraderAgent()
-        action, context = day_trader.generate_day_trading_action(ticker, user_message=message)
-        try:
-            proposal, formatted_action = extract_json_from_string(action)
-            output_text = f"{formatted_action} \n\n\n Here is the data I used to support my decision: \n {context}"
-            send_email(body=output_text, ticker=ticker, proposal=proposal)
-        except:
-            output_text = f"{action} \n\n\n Here is the data I used to support my decision: \n‚{context}"
-            send_email(body=output_text, ticker=ticker, proposal="Unknown")
-
-        time.sleep(10)
-        st.write(f"Day trading action for {ticker}: {action}")
+    # evaluated in background threads; the jobs survive reruns of this script
+    st.session_state.jobs = get_job_runner().submit(selected_tickers, message, uuid.uuid4().hex)
+    st.session_state.jobs_running = True
+
+# while jobs are running only this fragment is rerun to refresh them, so the rest of the page stays usable
+running = st.session_state.get("jobs_running", False)
+st.fragment(show_jobs, run_every=0.5 if running else None)()
 
 if st.button("Logout"):
     st.session_state.authenticated = False
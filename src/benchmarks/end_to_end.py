@@ -0,0 +1,130 @@
+"""Offline end-to-end benchmark of `perform_ticker_evaluation`.
+
+OpenAI, Bing, the article pages and SMTP are served by local stand-ins (see `fake_services`), yfinance is
+replaced by synthetic bars. Every universe size runs in a fresh interpreter with empty caches. The report shows
+wall time, peak memory (tracemalloc and max RSS) and latency percentiles per span from the run's trace.
+
+Run from the repository root:
+    python src/benchmarks/end_to_end.py [--tickers 1 10 100] [--workers 4] [--llm-latency 0.2]
+"""
+import os
+import sys
+import json
+import shutil
+import logging
+import argparse
+import tempfile
+import subprocess
+from collections import defaultdict
+
+SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC)
+
+import numpy as np
+
+from benchmarks.fake_services import FakeOpenAIServer, StaticSiteServer, SMTPSink, fake_yfinance
+
+# spans of these kinds are listed in the report
+REPORTED_KINDS = ("ticker", "stage", "llm", "connector", "email")
+
+
+def child(args):
+    """Runs one evaluation of a synthetic universe in this process and writes the measurements to `args.result`."""
+    import time
+    import tracemalloc
+    import resource
+
+    sys.modules["yfinance"] = fake_yfinance(os.environ["BENCHMARK_SITE_URL"], latency=args.yf_latency)
+    os.chdir(args.workdir)
+    if args.tracemalloc:
+        tracemalloc.start()
+    import entrypoint
+    logging.getLogger().setLevel(logging.WARNING)
+
+    start = time.perf_counter()
+    results = entrypoint.perform_ticker_evaluation(max_workers=args.workers)
+    wall = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+
+    spans = defaultdict(list)
+    trace_dir = os.environ["TRACE_DIR"]
+    for name in os.listdir(trace_dir):
+        with open(os.path.join(trace_dir, name)) as f:
+            for line in f:
+                record = json.loads(line)
+                if record["kind"] in REPORTED_KINDS:
+                    spans[f"{record['kind']}:{record['name']}"].append(record["duration"])
+    with open(args.result, "w") as f:
+        json.dump({"wall": wall, "tracemalloc_peak": peak, "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+                   "failed": sum(result["status"] != "ok" for result in results), "spans": spans}, f)
+
+
+def run_universe(tickers, args, services):
+    """Evaluates a synthetic universe of `tickers` tickers in a fresh interpreter.
+
+    Returns:
+        dict: The measurements written by `child`.
+    """
+    openai_server, site_server, smtp_sink = services
+    workdir = tempfile.mkdtemp(prefix="benchmark-")
+    try:
+        with open(os.path.join(workdir, "ticker_db.json"), "w") as f:
+            json.dump({f"T{i:03d}": f"Synthetic Company {i}" for i in range(tickers)}, f)
+        shutil.copy(os.path.join(os.path.dirname(SRC), "user_information.json"), workdir)
+        env = dict(os.environ, PYTHONPATH=SRC, CACHE_DIR=os.path.join(workdir, ".cache"), TRACE_DIR=os.path.join(workdir, "traces"),
+                   OPENAI_BASE_URL=openai_server.base_url, OPENAI_KEY="benchmark", BENCHMARK_SITE_URL=site_server.base_url,
+                   BING_ENDPOINT=f"{site_server.base_url}/bing", AZURE_BING_SUBSCRIPTIONKEY="benchmark",
+                   ALPHA_VANTAGE_API_KEY="benchmark", SMTP_HOST="127.0.0.1", SMTP_PORT=str(smtp_sink.port), SMTP_SECURITY="none",
+                   SENDER_EMAIL="agent@benchmark.local", RECIPIENT_EMAIL="trader@benchmark.local", GMAIL_APP_PASSWORD="",
+                   EMAIL_DIGEST="0", LLM_CACHE_BYPASS="0", INDICATOR_ENGINE="incremental")
+        result_path = os.path.join(workdir, "result.json")
+        command = [sys.executable, os.path.abspath(__file__), "--child", "--workdir", workdir, "--result", result_path,
+                   "--workers", str(args.workers), "--yf-latency", str(args.yf_latency)]
+        if not args.tracemalloc:
+            command.append("--no-tracemalloc")
+        output = None if args.verbose else subprocess.DEVNULL
+        subprocess.run(command, env=env, check=True, stdout=output, stderr=output)
+        with open(result_path) as f:
+            return json.load(f)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def report(tickers, result, emails):
+    print(f"\n{tickers} tickers: wall {result['wall']:.2f} s ({tickers / result['wall']:.2f} tickers/s), "
+          f"failed {result['failed']}, emails {emails}, max RSS {result['max_rss'] / 2**20:.0f} MB"
+          + (f", tracemalloc peak {result['tracemalloc_peak'] / 2**20:.1f} MB" if result["tracemalloc_peak"] else ""))
+    print(f"    {'Span':<44}{'Count':>7}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}")
+    for name, durations in sorted(result["spans"].items(), key=lambda item: -np.percentile(item[1], 90)):
+        p50, p90, p99 = np.percentile(durations, [50, 90, 99]) * 1000
+        print(f"    {name:<44}{len(durations):>7}{p50:>10.1f}{p90:>10.1f}{p99:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tickers", type=int, nargs="+", default=[1, 10, 100], help="universe sizes")
+    parser.add_argument("--workers", type=int, default=4, help="tickers evaluated in parallel")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds per fake LLM answer")
+    parser.add_argument("--site-latency", type=float, default=0.05, help="seconds per article page or search")
+    parser.add_argument("--yf-latency", type=float, default=0.05, help="seconds per yfinance request")
+    parser.add_argument("--no-tracemalloc", dest="tracemalloc", action="store_false",
+                        help="skip tracemalloc, which slows allocation-heavy code down")
+    parser.add_argument("--verbose", action="store_true", help="show the output of the runs")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        sys.exit()
+
+    services = (FakeOpenAIServer(latency=args.llm_latency).start(), StaticSiteServer(latency=args.site_latency).start(), SMTPSink().start())
+    try:
+        for tickers in args.tickers:
+            emails_before = services[2].messages
+            result = run_universe(tickers, args, services)
+            report(tickers, result, services[2].messages - emails_before)
+    finally:
+        for service in services:
+            service.close()
@@ -0,0 +1,260 @@
+"""Local stand-ins for the external services of a run, used by the offline end-to-end benchmark.
+
+    - `FakeOpenAIServer`: an OpenAI-compatible `/v1/chat/completions` endpoint (also streaming) with configurable latency.
+    - `StaticSiteServer`: article pages with enough paragraphs for the static fetch tier, and a Bing-compatible search endpoint.
+    - `SMTPSink`: a minimal SMTP server that accepts and counts every email.
+    - `fake_yfinance`: a drop-in `yfinance` module serving synthetic OHLCV bars and news.
+"""
+import re
+import json
+import time
+import types
+import zlib
+import threading
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+
+from benchmarks.synthetic import generate_bars
+
+DECISION = """```json
+{
+  "action": "buy",
+  "go_in": "101.20",
+  "go_out": "103.80",
+  "risk_level": "medium",
+  "reason_of_decision": "Synthetic decision of the benchmark server. The price is above its VWAP (the average price weighted by volume) and momentum is positive."
+}
+```"""
+ANALYSIS = ("Synthetic analysis of the benchmark server. Momentum is positive, volume is above average and the RSI "
+            "(a measure of how strongly the price moved recently) is neutral. ") * 6
+PARAGRAPH = ("Synthetic article paragraph of the benchmark server about earnings, guidance, analyst ratings and the "
+             "short-term outlook of the company, long enough to be accepted by the static fetch tier. ")
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, content_type, body):
+        body = body.encode() if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # the client gave up, e.g. at the deadline of its evaluation
+            self.close_connection = True
+
+
+class _Server:
+    """Runs an HTTP or TCP server on a free local port in a daemon thread."""
+    server_class = ThreadingHTTPServer
+
+    def __init__(self, handler):
+        self.server = self.server_class(("127.0.0.1", 0), handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeOpenAIServer(_Server):
+    """An OpenAI-compatible chat completions endpoint. Decision prompts get a JSON decision, all others an analysis."""
+    def __init__(self, latency=0.2, chunks=20):
+        """
+        Args:
+            latency (float): Seconds until the answer is sent (spread over the chunks when streaming).
+            chunks (int): Number of chunks of a streamed answer.
+        """
+        self.requests = 0
+        server = self
+
+        class Handler(_QuietHandler):
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                server.requests += 1
+                system = request["messages"][0]["content"]
+                if "Day Trader Agent" in system:
+                    # structured outputs are plain JSON without a fence
+                    content = DECISION.strip("`\n").removeprefix("json\n") if request.get("response_format") else DECISION
+                elif "several stocks" in system:
+                    # batched technical indicator analysis: one analysis per `### TICKER` heading
+                    tickers = re.findall(r"^### (\S+)", request["messages"][1]["content"], re.MULTILINE)
+                    content = json.dumps({ticker: ANALYSIS for ticker in tickers})
+                else:
+                    content = ANALYSIS
+                prompt_tokens = sum(len(str(message["content"])) for message in request["messages"]) // 4
+                usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                         "total_tokens": prompt_tokens + len(content) // 4}
+                base = {"id": "chatcmpl-benchmark", "created": int(time.time()), "model": request["model"]}
+                if not request.get("stream"):
+                    time.sleep(latency)
+                    self._send(200, "application/json", json.dumps({
+                        **base, "object": "chat.completion", "usage": usage,
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    }))
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                size = max(1, len(content) // chunks)
+                for start in range(0, len(content), size):
+                    time.sleep(latency / chunks)
+                    chunk = {**base, "object": "chat.completion.chunk",
+                             "choices": [{"index": 0, "delta": {"content": content[start:start + size]}, "finish_reason": None}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                final = {**base, "object": "chat.completion.chunk", "choices": [], "usage": usage}
+                self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode())
+                self.close_connection = True
+
+        super().__init__(Handler)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}/v1"
+
+
+class StaticSiteServer(_Server):
+    """Serves `/article/<id>` pages and a Bing-compatible `/bing` search endpoint linking to them."""
+    def __init__(self, latency=0.05, paragraphs=6, results=7):
+        """
+        Args:
+            latency (float): Seconds until a page or search result is sent.
+            paragraphs (int): Number of `<p>` elements per article.
+            results (int): Number of search hits.
+        """
+        server = self
+
+        class Handler(_QuietHandler):
+            def do_GET(self):
+                time.sleep(latency)
+                url = urlparse(self.path)
+                if url.path == "/bing":
+                    query = parse_qs(url.query).get("q", [""])[0]
+                    key = zlib.crc32(query.encode())
+                    hits = [{"name": f"Search hit {i}", "url": f"{server.base_url}/article/search-{key}-{i}"} for i in range(results)]
+                    self._send(200, "application/json", json.dumps({"webPages": {"value": hits}}))
+                elif url.path.startswith("/article/"):
+                    body = "".join(f"<p>{PARAGRAPH}</p>" for _ in range(paragraphs))
+                    self._send(200, "text/html", f"<html><body><h1>{url.path}</h1>{body}</body></html>")
+                else:
+                    self._send(404, "text/plain", "not found")
+
+        super().__init__(Handler)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+
+class SMTPSink(_Server):
+    """A minimal SMTP server (no TLS, no auth) that accepts every email and counts it and the connections."""
+    server_class = socketserver.ThreadingTCPServer
+
+    def __init__(self):
+        self.messages = 0
+        self.connections = 0
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write(f"{line}\r\n".encode())
+
+            def handle(self):
+                server.connections += 1
+                self.reply("220 localhost benchmark sink")
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    command = line.decode(errors="replace").strip().upper()
+                    if command.startswith(("EHLO", "HELO")):
+                        self.reply("250 localhost")
+                    elif command == "DATA":
+                        self.reply("354 end data with <CR><LF>.<CR><LF>")
+                        while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                            pass
+                        server.messages += 1
+                        self.reply("250 OK")
+                    elif command == "QUIT":
+                        self.reply("221 bye")
+                        return
+                    else:
+                        self.reply("250 OK")
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        super().__init__(Handler)
+
+
+def _market_index(start, end, interval):
+    """Timestamps of the bars of an interval between start and end, restricted to NYSE hours on weekdays."""
+    start = pd.Timestamp(start).tz_convert("America/New_York")
+    end = min(pd.Timestamp(end), pd.Timestamp.now(tz="UTC")).tz_convert("America/New_York")
+    if interval == "1d":
+        index = pd.date_range(start.normalize(), end, freq="D")
+        return index[index.weekday < 5]
+    index = pd.date_range(start.ceil("min"), end, freq={"1m": "min", "1h": "h"}.get(interval, "min"))
+    minutes = index.hour * 60 + index.minute
+    return index[(index.weekday < 5) & (minutes >= 9 * 60 + 30) & (minutes < 16 * 60)]
+
+
+def fake_yfinance(news_url, latency=0.05, articles=9):
+    """Builds a module that replaces `yfinance` with synthetic data (`Ticker.history`, `Ticker.news`,
+    `Ticker.fast_info` and `download`).
+
+    Args:
+        news_url (str): Base URL of the `StaticSiteServer` the news articles link to.
+        latency (float): Seconds every request takes.
+        articles (int): Number of news articles per ticker.
+
+    Returns:
+        types.ModuleType: The module, to be put into `sys.modules["yfinance"]`.
+    """
+    def history(symbol, start, end, interval):
+        index = _market_index(start, end, interval)
+        bars = generate_bars(periods=len(index), seed=zlib.crc32(f"{symbol}/{interval}".encode()),
+                             start_price=50 + zlib.crc32(symbol.encode()) % 400)
+        bars.index = index
+        bars.index.name = "Date" if interval == "1d" else "Datetime"
+        return bars
+
+    class Ticker:
+        def __init__(self, symbol):
+            self.symbol = symbol
+            self.fast_info = {"timezone": "America/New_York"}
+
+        def history(self, start=None, end=None, interval="1d", **kwargs):
+            time.sleep(latency)
+            return history(self.symbol, start, end, interval)
+
+        @property
+        def news(self):
+            time.sleep(latency)
+            now = int(time.time())
+            return [{"title": f"{self.symbol} news {i}", "link": f"{news_url}/article/{self.symbol}-{i}",
+                     "publisher": "Benchmark Wire", "providerPublishTime": now - 600 * i} for i in range(articles)]
+
+    def download(tickers, start=None, end=None, interval="1d", **kwargs):
+        time.sleep(latency)
+        return pd.concat({ticker: history(ticker, start, end, interval) for ticker in tickers}, axis=1)
+
+    module = types.ModuleType("yfinance")
+    module.Ticker = Ticker
+    module.download = download
+    return module
+
@@ -0,0 +1,45 @@
+"""Micro-benchmark of the vectorized `format_as_text` against the former row-wise implementation.
+
+Run from the repository root:
+    python src/benchmarks/format_as_text.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import generate_bars
+from connector.indicator_engine import IndicatorEngine
+from connector.technical_indicators import format_as_text
+
+
+def format_as_text_iterrows(data):
+    """The former row-wise implementation, kept as the reference."""
+    output = []
+    for date, row in data.iterrows():
+        rsi_status = "Overbought" if row['RSI'] > 70 else "Oversold" if row['RSI'] < 30 else "Neutral"
+        atr_status = "High Volatility" if row['ATR'] > 2 else "Low Volatility"
+        formatted = f"""
+Date: {date.date()}
+Close Price: ${row['Close']:.2f}
+RSI: {row['RSI']:.1f} ({rsi_status})
+SMA (20): ${row['SMA_20']:.2f}
+EMA (20): ${row['EMA_20']:.2f}
+VWAP: ${row['VWAP']:.2f}
+ATR: {row['ATR']:.1f} ({atr_status})
+"""
+        output.append(formatted.strip())
+    return "\n\n".join(output)
+
+
+if __name__ == "__main__":
+    for periods in (150, 1500, 15000):
+        data = IndicatorEngine().update("BENCH", generate_bars(periods=periods, freq="h")).dropna()
+        assert format_as_text(data) == format_as_text_iterrows(data), "legacy layout is not byte-for-byte compatible"
+        number = max(1, 3000 // periods)
+        iterrows_seconds = timeit.timeit(lambda: format_as_text_iterrows(data), number=number) / number
+        vectorized_seconds = timeit.timeit(lambda: format_as_text(data), number=number) / number
+        table_seconds = timeit.timeit(lambda: format_as_text(data, layout="table"), number=number) / number
+        print(f"{len(data):>6} rows: iterrows {iterrows_seconds * 1000:8.2f} ms, vectorized {vectorized_seconds * 1000:7.2f} ms "
+              f"({iterrows_seconds / vectorized_seconds:5.1f}x), table {table_seconds * 1000:7.2f} ms")
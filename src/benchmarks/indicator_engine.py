@@ -0,0 +1,74 @@
+"""Benchmark of the incremental indicator engine against the pandas_ta path.
+
+Run from the repository root:
+    python src/benchmarks/indicator_engine.py
+"""
+import os
+import sys
+import time
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import generate_bars
+from connector.bar_store import BarStore
+from connector.indicator_engine import IndicatorEngine
+from connector import technical_indicators
+
+COLUMNS = ["RSI", "SMA_20", "EMA_20", "BBL_20_2.0", "BBM_20_2.0", "BBU_20_2.0", "VWAP", "ATR"]
+
+
+def compare(bars):
+    """Returns the largest absolute difference per indicator between both paths on the same bars."""
+    expected = technical_indicators.add_technical_indicators(bars.copy())
+    actual = IndicatorEngine().update("BENCH", bars)
+    return {column: float(np.nanmax(np.abs(actual[column] - expected[column]))) for column in COLUMNS}
+
+
+def benchmark_new_bars(periods, new_bars=50, engine="incremental"):
+    """Times `compute_technical_indicators` while `new_bars` hourly bars arrive one at a time.
+
+    Like in production, the bars are stored in a bar store that keeps growing and every call renders the
+    sliding one-month window of the latest bars.
+
+    Args:
+        periods (int): Number of stored hourly bars (more than a month, so the store covers the window).
+        new_bars (int): Number of bars arriving during the benchmark.
+        engine (str): "incremental" or "pandas_ta" (see `INDICATOR_ENGINE`).
+
+    Returns:
+        float: Seconds of all calls.
+    """
+    start = (datetime.now() - timedelta(hours=periods)).replace(minute=0, second=0, microsecond=0)
+    bars = generate_bars(periods=periods, freq="h", start=start)
+    history = len(bars) - new_bars
+    os.environ['INDICATOR_ENGINE'] = engine
+    with tempfile.TemporaryDirectory() as directory:
+        store = BarStore(path=os.path.join(directory, "bars.sqlite"))
+        technical_indicators.get_bar_store = lambda: store
+        technical_indicators.get_indicator_engine = lambda engine=IndicatorEngine(): engine
+        store.upsert("BENCH", "1h", bars.iloc[:history])
+        technical_indicators.compute_technical_indicators("BENCH")
+        seconds = 0.0
+        for end in range(history, len(bars)):
+            store.upsert("BENCH", "1h", bars.iloc[end:end + 1])
+            started = time.perf_counter()
+            technical_indicators.compute_technical_indicators("BENCH")
+            seconds += time.perf_counter() - started
+    return seconds
+
+
+if __name__ == "__main__":
+    bars = generate_bars(periods=150, freq="h")
+    print("Max abs difference per indicator (same bars):")
+    for column, difference in compare(bars).items():
+        print(f"  {column:<12}{difference:.2e}")
+
+    for periods in (1000, 3000):
+        pandas_ta_seconds = benchmark_new_bars(periods, engine="pandas_ta")
+        engine_seconds = benchmark_new_bars(periods)
+        print(f"{periods} stored bars, 50 new bars, one-month window: pandas_ta {pandas_ta_seconds * 1000:.1f} ms, "
+              f"incremental {engine_seconds * 1000:.1f} ms ({pandas_ta_seconds / engine_seconds:.1f}x)")
@@ -0,0 +1,69 @@
+"""Startup benchmark: import cost per module, based on `python -X importtime`.
+
+Every target is imported in a fresh interpreter. The report lists the total import time, which heavy
+dependencies the import pulled in, and the packages with the highest self time.
+
+Run from the repository root:
+    python src/benchmarks/startup.py [--top 10] [--repeat 3] [module ...]
+"""
+import os
+import re
+import sys
+import argparse
+import subprocess
+from collections import defaultdict
+
+SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = ["entrypoint", "agents.day_trader", "agents.financial_analyst", "connector.news_fetcher",
+           "connector.technical_indicators", "connector.email_bot"]
+# dependencies that should only be loaded by the stage that needs them
+HEAVY = ["openai", "selenium", "webdriver_manager", "yfinance", "pandas", "pandas_ta", "numpy", "bs4", "markdown", "tiktoken"]
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def measure(module):
+    """Imports a module in a fresh interpreter with `-X importtime`.
+
+    Args:
+        module (str): The dotted module name, relative to `src`.
+
+    Returns:
+        tuple: Total import time in seconds, self time per top-level package in seconds, the heavy
+            dependencies that were loaded and the error of a failed import (or None).
+    """
+    code = f"import sys; import {module}; print(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    env = dict(os.environ, PYTHONPATH=SRC + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                             cwd=os.path.dirname(SRC), env=env)
+    total, packages, error = 0, defaultdict(int), None
+    for line in process.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match is None:
+            if line.strip() and not line.startswith("import time:"):
+                error = line.strip()
+            continue
+        self_us, cumulative_us, indent, name = int(match[1]), int(match[2]), len(match[3]), match[4]
+        packages[name.split(".")[0]] += self_us
+        if indent == 1:
+            total += cumulative_us
+    loaded = process.stdout.strip().split(",") if process.returncode == 0 and process.stdout.strip() else []
+    return total / 1e6, {name: us / 1e6 for name, us in packages.items()}, loaded, error if process.returncode else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=TARGETS)
+    parser.add_argument("--top", type=int, default=8, help="number of packages listed per module")
+    parser.add_argument("--repeat", type=int, default=3, help="imports per module, the fastest one is reported")
+    args = parser.parse_args()
+
+    for module in args.modules:
+        runs = [measure(module) for _ in range(args.repeat)]
+        total, packages, loaded, error = min(runs, key=lambda run: run[0])
+        print(f"{module:<34}{total * 1000:9.1f} ms   heavy: {', '.join(loaded) or 'none'}")
+        if error:
+            print(f"    import failed: {error}")
+        for name, seconds in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+            print(f"    {name:<30}{seconds * 1000:9.1f} ms")
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+
+def generate_bars(periods=150, freq="h", start="2024-01-02 09:30", seed=0, start_price=100.0):
+    """Generates synthetic OHLCV bars following a random walk.
+
+    Args:
+        periods (int): Number of bars.
+        freq (str): Bar frequency as a pandas offset alias (e.g. "min", "h", "D").
+        start (str): Timestamp of the first bar.
+        seed (int): Seed of the random generator.
+        start_price (float): Price of the first bar.
+
+    Returns:
+        pandas.DataFrame: Bars with 'Open', 'High', 'Low', 'Close' and 'Volume' columns and a datetime index.
+    """
+    rng = np.random.default_rng(seed)
+    close = start_price + np.cumsum(rng.normal(0, start_price * 0.002, periods))
+    open_ = np.concatenate([[start_price], close[:-1]])
+    spread = np.abs(rng.normal(0, start_price * 0.001, (2, periods)))
+    index = pd.date_range(start, periods=periods, freq=freq)
+    return pd.DataFrame({
+        "Open": open_,
+        "High": np.maximum(open_, close) + spread[0],
+        "Low": np.minimum(open_, close) - spread[1],
+        "Close": close,
+        "Volume": rng.integers(10_000, 500_000, periods).astype(float),
+    }, index=index)
@@ -0,0 +1,85 @@
+import logging
+import threading
+
+_encoding = None
+_encoding_lock = threading.Lock()
+_ENCODING_UNAVAILABLE = object()
+
+TRUNCATION_MARKER = "\n[... truncated ...]"
+
+
+def _get_encoding():
+    """Loads the tiktoken encoding of the GPT-4o models once. Returns None if tiktoken is not available."""
+    global _encoding
+    with _encoding_lock:
+        if _encoding is None:
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding("o200k_base")
+            except Exception as e:
+                logging.warning(f"tiktoken is not available, estimating tokens from characters: {e}")
+                _encoding = _ENCODING_UNAVAILABLE
+        return None if _encoding is _ENCODING_UNAVAILABLE else _encoding
+
+
+def count_tokens(text):
+    """Counts the tokens of a text with the local tokenizer (about four characters per token without tiktoken).
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        int: The number of tokens.
+    """
+    text = str(text)
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text, max_tokens, keep="head"):
+    """Deterministically truncates a text to at most `max_tokens` tokens.
+
+    Args:
+        text (str): The text.
+        max_tokens (int): The maximum number of tokens.
+        keep (str): "head" keeps the beginning of the text, "tail" keeps the end (e.g. the most recent bars).
+
+    Returns:
+        str: The text, with a truncation marker if it was shortened.
+    """
+    text = str(text)
+    if count_tokens(text) <= max_tokens:
+        return text
+    budget = max(0, max_tokens - count_tokens(TRUNCATION_MARKER))
+    encoding = _get_encoding()
+    if encoding is None:
+        chars = budget * 4
+        kept = text[:chars] if keep == "head" else text[len(text) - chars:] if chars else ""
+    else:
+        tokens = encoding.encode(text, disallowed_special=())
+        kept = encoding.decode(tokens[:budget] if keep == "head" else tokens[len(tokens) - budget:] if budget else [])
+    return kept + TRUNCATION_MARKER if keep == "head" else TRUNCATION_MARKER.strip() + "\n" + kept
+
+
+def fit_items(items, max_item_tokens, max_total_tokens):
+    """Truncates every item to `max_item_tokens` and drops trailing items once `max_total_tokens` is reached.
+
+    Args:
+        items (list[str]): The items in order of importance (e.g. newest article first).
+        max_item_tokens (int): The maximum number of tokens per item.
+        max_total_tokens (int): The maximum number of tokens of all items.
+
+    Returns:
+        list[str]: The items that fit.
+    """
+    fitted, total = [], 0
+    for item in items:
+        item = truncate_to_tokens(item, max_item_tokens)
+        tokens = count_tokens(item)
+        if total + tokens > max_total_tokens:
+            break
+        fitted.append(item)
+        total += tokens
+    return fitted
@@ -0,0 +1,127 @@
+import os
+import time
+import sqlite3
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+TRACKING_PARAMS = {"fbclid", "gclid", "guccounter", "guce_referrer", "guce_referrer_sig", "ncid", "mc_cid", "mc_eid", "cmpid"}
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def canonical_url(url):
+    """Normalizes a URL, so the same article is cached once.
+
+    Lowercases scheme and host, drops default ports, fragments, tracking parameters and trailing slashes,
+    and sorts the remaining query parameters.
+
+    Args:
+        url (str): The URL of the article.
+
+    Returns:
+        str: The canonical URL.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if (scheme, netloc.rsplit(':', 1)[-1]) in {("http", "80"), ("https", "443")}:
+        netloc = netloc.rsplit(':', 1)[0]
+    query = sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS)
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((scheme, netloc, path, urlencode(query), ''))
+
+
+class ArticleCache:
+    """An on-disk article content cache keyed by canonical URL.
+
+    Entries expire after `ttl` seconds and the least recently used entries are evicted once more than
+    `max_entries` are stored. The SQLite file can be shared by the scheduler and the Streamlit app.
+    """
+    def __init__(self, path=None, ttl=6 * 60 * 60, max_entries=5000):
+        """Opens (and creates if needed) the cache database.
+
+        Args:
+            path (str): The SQLite database file. Defaults to a file in `CACHE_DIR` (`.cache`).
+            ttl (float): Seconds an article stays valid.
+            max_entries (int): Maximum number of cached articles.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        path = path or os.path.join(os.getenv('CACHE_DIR', '.cache'), 'articles.sqlite')
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS articles (url TEXT PRIMARY KEY, content TEXT, created REAL, accessed REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS articles_accessed ON articles (accessed)")
+
+    def get(self, url):
+        """Returns the cached content of an article.
+
+        Args:
+            url (str): The URL of the article.
+
+        Returns:
+            str: The cached content, or None if the article is not cached or expired.
+        """
+        key = canonical_url(url)
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT content, created FROM articles WHERE url = ?", (key,)).fetchone()
+            if row is None or now - row[1] >= self.ttl:
+                if row is not None:
+                    self._conn.execute("DELETE FROM articles WHERE url = ?", (key,))
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE articles SET accessed = ? WHERE url = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, url, content):
+        """Stores the content of an article and evicts the least recently used articles if the cache is full.
+
+        Args:
+            url (str): The URL of the article.
+            content (str): The content of the article.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO articles VALUES (?, ?, ?, ?)", (canonical_url(url), content, now, now))
+            overflow = self._conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM articles WHERE url IN (SELECT url FROM articles ORDER BY accessed LIMIT ?)", (overflow,)
+                )
+                self.evictions += overflow
+
+    def stats(self):
+        """Returns the hit/miss counters of this process.
+
+        Returns:
+            dict: Hits, misses, evictions and the hit rate.
+        """
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+def get_article_cache():
+    """Returns the process-wide article cache, configured by `ARTICLE_CACHE_TTL` and `ARTICLE_CACHE_MAX_ENTRIES`.
+
+    Returns:
+        ArticleCache: The shared article cache.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ArticleCache(ttl=float(os.getenv('ARTICLE_CACHE_TTL', 6 * 60 * 60)),
+                                  max_entries=int(os.getenv('ARTICLE_CACHE_MAX_ENTRIES', 5000)))
+        return _cache
@@ -0,0 +1,153 @@
+import os
+import threading
+import logging
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from agents.utils import deadline
+from agents.utils.tracing import span
+from connector.article_cache import get_article_cache
+from connector.browser_pool import get_browser_pool
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+
+def extract_paragraphs(html):
+    """Extracts the text of all `<p>` elements of a page.
+
+    Args:
+        html (str): The page source.
+
+    Returns:
+        str: The joined paragraph texts.
+    """
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    return ' '.join([p.get_text() for p in soup.find_all('p')])
+
+
+class ArticleFetcher:
+    """Fetches article content with a tiered strategy.
+
+    A pooled `requests` session is tried first, as most news pages serve their paragraphs without JavaScript.
+    Only if the static extraction is empty or too short, the page is loaded with a pooled headless Chrome.
+    The fetcher learns per domain which tier works and skips the static tier for domains where it keeps failing.
+    """
+    def __init__(self, min_content_length=500, timeout=10, reprobe_every=10):
+        """Initializes the HTTP session and the per-domain statistics.
+
+        Args:
+            min_content_length (int): Minimum number of characters a static extraction needs to be accepted.
+            timeout (float): Timeout in seconds for the static HTTP request, shortened to the deadline of the evaluation.
+            reprobe_every (int): For domains that need the browser, the static tier is retried every n-th fetch.
+        """
+        self.min_content_length = min_content_length
+        self.timeout = timeout
+        self.reprobe_every = reprobe_every
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=20, pool_maxsize=20)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(HEADERS)
+        self.domain_stats = {}
+        self._lock = threading.Lock()
+
+    def _stats(self, domain):
+        return self.domain_stats.setdefault(domain, {"static_hits": 0, "static_misses": 0, "browser_fetches": 0})
+
+    def _use_static_tier(self, domain):
+        with self._lock:
+            stats = self._stats(domain)
+            if stats["static_misses"] < 2 or stats["static_hits"] >= stats["static_misses"]:
+                return True
+            return stats["browser_fetches"] % self.reprobe_every == 0
+
+    def _record(self, domain, key):
+        with self._lock:
+            self._stats(domain)[key] += 1
+
+    def fetch_static(self, url):
+        """Fetches the paragraphs of a page with a plain HTTP request.
+
+        Args:
+            url (str): The URL of the article.
+
+        Returns:
+            str: The content of the article.
+        """
+        with span("article.static") as static_span:
+            response = self.session.get(url, timeout=deadline.timeout(self.timeout))
+            response.raise_for_status()
+            static_span.set(response_bytes=len(response.content))
+            return extract_paragraphs(response.text)
+
+    def fetch_browser(self, url):
+        """Fetches the paragraphs of a page with a pooled headless Chrome.
+
+        Args:
+            url (str): The URL of the article.
+
+        Returns:
+            str: The content of the article.
+        """
+        with span("article.browser") as browser_span:
+            page_source = get_browser_pool().get_page_source(url)
+            browser_span.set(response_bytes=len(page_source))
+            return extract_paragraphs(page_source)
+
+    def fetch(self, url):
+        """Fetches the content of an article, escalating from the static to the browser tier if needed.
+        Articles already fetched by this or an earlier run are served from the article cache.
+
+        Args:
+            url (str): The URL of the article.
+
+        Returns:
+            str: The content of the article.
+        """
+        with span("article.fetch", domain=urlparse(url).netloc.lower()) as fetch_span:
+            cache = get_article_cache()
+            content = cache.get(url)
+            fetch_span.set(cache="hit" if content is not None else "miss")
+            if content is None:
+                content = self._fetch_tiered(url)
+                if content.strip():
+                    cache.put(url, content)
+            fetch_span.set(content_chars=len(content))
+            return content
+
+    def _fetch_tiered(self, url):
+        domain = urlparse(url).netloc.lower()
+        if self._use_static_tier(domain):
+            try:
+                content = self.fetch_static(url)
+            except Exception as e:
+                logging.warning(f"Static fetch failed for {url}: {e}")
+                content = ""
+            if len(content.strip()) >= self.min_content_length:
+                self._record(domain, "static_hits")
+                return content
+            self._record(domain, "static_misses")
+        self._record(domain, "browser_fetches")
+        return self.fetch_browser(url)
+
+
+def get_article_fetcher():
+    """Returns the process-wide article fetcher. `ARTICLE_MIN_STATIC_CHARS` configures the minimum static content length.
+
+    Returns:
+        ArticleFetcher: The shared article fetcher.
+    """
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = ArticleFetcher(min_content_length=int(os.getenv('ARTICLE_MIN_STATIC_CHARS', 500)))
+        return _fetcher
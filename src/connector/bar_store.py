@@ -0,0 +1,244 @@
+import os
+import time
+import sqlite3
+import threading
+import contextvars
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from agents.utils.tracing import span
+
+COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+# how far back yfinance serves bars of an interval
+MAX_HISTORY = {"1m": timedelta(days=7), "1h": timedelta(days=729)}
+# bars of an interval are not refetched if the last download is younger than this many seconds,
+# or if they were downloaded by the prefetch of the current run (see `mark_prefetched`)
+REFRESH_SECONDS = {"1m": 60, "1h": 15 * 60, "1d": 60 * 60}
+PERIOD_DAYS = {"1d": 1, "5d": 5, "1mo": 30, "3mo": 91, "6mo": 182, "1y": 365, "2y": 730}
+
+_store = None
+_store_lock = threading.Lock()
+# (ticker, interval) pairs downloaded by the prefetch of the current run
+_prefetched = contextvars.ContextVar("prefetched", default=frozenset())
+
+
+def period_start(period):
+    """Converts a yfinance period (e.g. "1mo") into the start datetime of that period.
+
+    Args:
+        period (str): The yfinance period.
+
+    Returns:
+        datetime: The start of the period in UTC.
+    """
+    return datetime.now(timezone.utc) - timedelta(days=PERIOD_DAYS[period])
+
+
+def mark_prefetched(series):
+    """Marks series as fresh for the rest of the current context (and the thread pools that copy it), e.g. after
+    the grouped download at the start of a run. Replaces the series marked before.
+
+    Args:
+        series (iterable): (ticker, interval) pairs.
+    """
+    _prefetched.set(frozenset(series))
+
+
+def _covers(first_ts, start):
+    # the stored bars cover the requested range if they start within a long weekend of it
+    return first_ts is not None and datetime.fromtimestamp(first_ts, timezone.utc) - start < timedelta(days=4)
+
+
+def _as_utc(value):
+    timestamp = pd.Timestamp(value)
+    return timestamp.tz_localize("UTC") if timestamp.tzinfo is None else timestamp.tz_convert("UTC")
+
+
+class BarStore:
+    """A local, incremental OHLCV store per ticker and interval.
+
+    Bars are kept in a SQLite file. yfinance is only asked for bars newer than the last stored timestamp
+    (the last bar is refetched, as it may have been incomplete), everything else is served from disk.
+    """
+    def __init__(self, path=None):
+        """Opens (and creates if needed) the bar database.
+
+        Args:
+            path (str): The SQLite database file. Defaults to a file in `CACHE_DIR` (`.cache`).
+        """
+        self._lock = threading.Lock()
+        self._frames = {}
+        path = path or os.path.join(os.getenv('CACHE_DIR', '.cache'), 'bars.sqlite')
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS bars (ticker TEXT, interval TEXT, ts INTEGER, open REAL, high REAL, "
+                "low REAL, close REAL, volume REAL, PRIMARY KEY (ticker, interval, ts))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS series (ticker TEXT, interval TEXT, tz TEXT, fetched_at REAL, "
+                "PRIMARY KEY (ticker, interval))"
+            )
+
+    def _series(self, ticker, interval):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT tz, fetched_at, MAX(ts), MIN(ts) FROM series LEFT JOIN bars USING (ticker, interval) "
+                "WHERE ticker = ? AND interval = ? GROUP BY ticker, interval", (ticker, interval)
+            ).fetchone()
+        return row or (None, None, None, None)
+
+    def timezone(self, ticker, interval):
+        """Returns the exchange timezone stored for a series, or None if the series is unknown."""
+        return self._series(ticker, interval)[0]
+
+    def last_timestamp(self, ticker, interval):
+        """Returns the timestamp of the last stored bar of a series, or None if nothing is stored."""
+        last_ts = self._series(ticker, interval)[2]
+        return datetime.fromtimestamp(last_ts, timezone.utc) if last_ts is not None else None
+
+    def download_start(self, ticker, interval, start):
+        """Returns the time from which the bars of a series have to be downloaded to have them from `start` up to now.
+
+        That is `start` if the stored bars do not reach back to it, else the last stored bar (it may have been
+        incomplete). If no bar arrived for a while before the last download (e.g. a halted ticker), bars are only
+        requested from shortly before that download, so a stale series does not pull the start back.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+            interval (str): The bar interval.
+            start (datetime): The oldest bar that is needed.
+
+        Returns:
+            datetime: The start of the download in UTC.
+        """
+        _, fetched_at, last_ts, first_ts = self._series(ticker, interval)
+        start = _as_utc(start).to_pydatetime()
+        if fetched_at is None or (first_ts is not None and not _covers(first_ts, start)):
+            return start
+        # bars published late (or missed by a failed download) are picked up within this margin
+        margin = max(2 * pd.Timedelta(interval).to_pytimedelta(), timedelta(minutes=15))
+        resume = datetime.fromtimestamp(fetched_at, timezone.utc) - margin
+        if last_ts is not None:
+            resume = max(resume, datetime.fromtimestamp(last_ts, timezone.utc))
+        return max(start, resume)
+
+    def upsert(self, ticker, interval, data):
+        """Stores bars and marks the series as freshly downloaded. Bars older than the history yfinance
+        serves for the interval are pruned.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+            interval (str): The bar interval (e.g. "1m", "1h", "1d").
+            data (pandas.DataFrame): Bars with a timezone-aware datetime index (in the exchange timezone) and OHLCV columns.
+        """
+        tz, rows = None, []
+        if not data.empty:
+            data = data.dropna(subset=["Close"])
+            index = data.index if data.index.tz is not None else data.index.tz_localize("UTC")
+            tz = str(index.tz)
+            timestamps = index.tz_convert("UTC").asi8 // 10**9
+            rows = [(ticker, interval, int(ts), *map(float, values))
+                    for ts, values in zip(timestamps, data[COLUMNS].itertuples(index=False))]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO series VALUES (?, ?, COALESCE(?, (SELECT tz FROM series WHERE ticker = ? AND interval = ?)), ?)",
+                (ticker, interval, tz, ticker, interval, time.time())
+            )
+            if interval in MAX_HISTORY:
+                cutoff = (datetime.now(timezone.utc) - MAX_HISTORY[interval]).timestamp()
+                self._conn.execute("DELETE FROM bars WHERE ticker = ? AND interval = ? AND ts < ?", (ticker, interval, cutoff))
+            self._frames.pop((ticker, interval), None)
+
+    def load(self, ticker, interval, start=None, end=None):
+        """Loads stored bars. A series is read from disk once and then sliced in memory until new bars arrive.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+            interval (str): The bar interval.
+            start (datetime): Optional inclusive lower bound.
+            end (datetime): Optional exclusive upper bound.
+
+        Returns:
+            pandas.DataFrame: OHLCV bars indexed by time in the exchange timezone.
+        """
+        with self._lock:
+            data = self._frames.get((ticker, interval))
+        if data is None:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT ts, open, high, low, close, volume FROM bars WHERE ticker = ? AND interval = ? ORDER BY ts",
+                    (ticker, interval)
+                ).fetchall()
+            tz = self.timezone(ticker, interval) or "UTC"
+            data = pd.DataFrame(rows, columns=["ts"] + COLUMNS)
+            data.index = pd.to_datetime(data.pop("ts").to_numpy(dtype="int64"), unit="s", utc=True).tz_convert(tz)
+            data.index.name = "Datetime" if interval.endswith(("m", "h")) else "Date"
+            with self._lock:
+                self._frames[(ticker, interval)] = data
+        mask = np.ones(len(data), dtype=bool)
+        if start is not None:
+            mask &= data.index >= _as_utc(start)
+        if end is not None:
+            mask &= data.index < _as_utc(end)
+        return data[mask].copy()
+
+    def refresh(self, ticker, interval, start):
+        """Downloads the bars missing since the last stored timestamp, unless the series is still fresh or was
+        prefetched in the current run.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+            interval (str): The bar interval.
+            start (datetime): The oldest bar that is needed.
+        """
+        _, fetched_at, last_ts, first_ts = self._series(ticker, interval)
+        now = datetime.now(timezone.utc)
+        fetch_start = _as_utc(start).to_pydatetime()
+        covered = _covers(first_ts, fetch_start)
+        fresh = (ticker, interval) in _prefetched.get() or (
+            fetched_at is not None and time.time() - fetched_at < REFRESH_SECONDS.get(interval, 60))
+        if covered and fresh:
+            return
+        if covered:
+            fetch_start = max(fetch_start, datetime.fromtimestamp(last_ts, timezone.utc))
+        if interval in MAX_HISTORY:
+            fetch_start = max(fetch_start, now - MAX_HISTORY[interval] + timedelta(minutes=5))
+        import yfinance as yf
+        with span("yfinance.history", interval=interval) as history_span:
+            data = yf.Ticker(ticker).history(start=fetch_start, end=now + timedelta(days=1), interval=interval)
+            history_span.set(rows=len(data))
+        self.upsert(ticker, interval, data)
+
+    def get_bars(self, ticker, interval, start, end=None):
+        """Returns bars of a ticker, downloading only what is not stored yet.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+            interval (str): The bar interval.
+            start (datetime): Inclusive lower bound.
+            end (datetime): Optional exclusive upper bound.
+
+        Returns:
+            pandas.DataFrame: OHLCV bars indexed by time in the exchange timezone.
+        """
+        self.refresh(ticker, interval, start)
+        return self.load(ticker, interval, start=start, end=end)
+
+
+def get_bar_store():
+    """Returns the process-wide bar store.
+
+    Returns:
+        BarStore: The shared bar store.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = BarStore()
+        return _store
@@ -0,0 +1,172 @@
+import os
+import queue
+import atexit
+import threading
+from contextlib import contextmanager
+
+from agents.utils import deadline
+from agents.utils.deadline import DeadlineExceeded
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_driver_path():
+    """Resolves the ChromeDriver binary once per process.
+
+    Returns:
+        str: The `CHROMEDRIVER_PATH` environment variable if set, otherwise the path installed by webdriver-manager.
+    """
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            _driver_path = os.getenv('CHROMEDRIVER_PATH')
+            if not _driver_path:
+                from webdriver_manager.chrome import ChromeDriverManager
+                _driver_path = ChromeDriverManager().install()
+        return _driver_path
+
+
+class _BrowserSession:
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+
+
+class BrowserPool:
+    """A pool of warm headless Chrome sessions.
+
+    Sessions are health-checked before they are handed out and recycled after `max_pages` page loads
+    or as soon as they crash, so a run only pays the browser startup a few times.
+    """
+    def __init__(self, size=2, max_pages=50, page_load_timeout=20):
+        """Initializes an empty pool. Sessions are started lazily.
+
+        Args:
+            size (int): Maximum number of concurrent browser sessions.
+            max_pages (int): Number of page loads after which a session is recycled.
+            page_load_timeout (float): Seconds a page load may take, shortened to the deadline of the evaluation.
+        """
+        self.size = size
+        self.max_pages = max_pages
+        self.page_load_timeout = page_load_timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _create_session(self):
+        # selenium is only imported once a page actually needs a browser
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+        options = webdriver.ChromeOptions()
+        options.add_argument('--headless')
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-dev-shm-usage')
+        driver = webdriver.Chrome(service=Service(get_driver_path()), options=options)
+        return _BrowserSession(driver)
+
+    @staticmethod
+    def _is_healthy(session):
+        try:
+            session.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _quit(session):
+        try:
+            session.driver.quit()
+        except Exception:
+            pass
+
+    def _acquire(self):
+        # a stage waits for a free session at most until its deadline
+        if not self._slots.acquire(timeout=deadline.remaining()):
+            raise DeadlineExceeded("no browser session became free before the deadline")
+        try:
+            while True:
+                try:
+                    session = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._create_session()
+                if self._is_healthy(session):
+                    return session
+                self._quit(session)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, session, failed=False):
+        session.pages += 1
+        if session.pages >= self.max_pages or (failed and not self._is_healthy(session)):
+            self._quit(session)
+        else:
+            self._idle.put(session)
+        self._slots.release()
+
+    @contextmanager
+    def borrow(self):
+        """Borrows a browser session from the pool.
+
+        Yields:
+            selenium.webdriver.Chrome: A healthy web driver, returned to the pool afterwards.
+
+        Raises:
+            DeadlineExceeded: If no session becomes free before the deadline of the current context.
+        """
+        session = self._acquire()
+        try:
+            yield session.driver
+        except Exception:
+            self._release(session, failed=True)
+            raise
+        else:
+            self._release(session)
+
+    def get_page_source(self, url, wait_seconds=0.5):
+        """Loads a page with a pooled browser session.
+
+        Args:
+            url (str): The URL to load.
+            wait_seconds (float): How long to wait for the page body to be present.
+
+        Returns:
+            str: The page source.
+        """
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        with self.borrow() as driver:
+            # `WebDriverWait` only starts after `driver.get` returned, so the load itself needs its own bound.
+            # It is computed after borrowing, as waiting for a session counts against the deadline.
+            driver.set_page_load_timeout(deadline.timeout(self.page_load_timeout))
+            driver.get(url)
+            WebDriverWait(driver, min(wait_seconds, deadline.remaining(default=wait_seconds))).until(EC.presence_of_element_located((By.TAG_NAME, 'body')))
+            return driver.page_source
+
+    def close(self):
+        """Quits all idle browser sessions."""
+        while True:
+            try:
+                self._quit(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+def get_browser_pool():
+    """Returns the process-wide browser pool, configured by `BROWSER_POOL_SIZE`, `BROWSER_MAX_PAGES` and
+    `BROWSER_PAGE_LOAD_TIMEOUT`.
+
+    Returns:
+        BrowserPool: The shared browser pool.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool(size=int(os.getenv('BROWSER_POOL_SIZE', 2)),
+                                max_pages=int(os.getenv('BROWSER_MAX_PAGES', 50)),
+                                page_load_timeout=float(os.getenv('BROWSER_PAGE_LOAD_TIMEOUT', 20)))
+            atexit.register(_pool.close)
+        return _pool
@@ -1,10 +1,13 @@
+import logging
 from datetime import datetime
 from dotenv import load_dotenv
 import os
 import ssl
+import threading
 from email.message import EmailMessage
 import smtplib
-import markdown
+
+from agents.utils.tracing import span
 
 load_dotenv()
 
@@ -12,49 +15,193 @@ sender_email = os.getenv('SENDER_EMAIL')
 sender_password = os.getenv('GMAIL_APP_PASSWORD')
 receiver_email = os.getenv('RECIPIENT_EMAIL')
 
-def send_email(body, ticker, proposal):
+# SMTP server. For local testing run `python -m aiosmtpd -n -l localhost:1025` and set
+# SMTP_HOST=localhost, SMTP_PORT=1025 and SMTP_SECURITY=none.
+smtp_host = os.getenv('SMTP_HOST', 'smtp.gmail.com')
+smtp_port = int(os.getenv('SMTP_PORT', 465))
+smtp_security = os.getenv('SMTP_SECURITY', 'ssl')  # ssl, starttls or none
+
+_mailer = None
+_mailer_lock = threading.Lock()
+
+
+def build_message(subject, body):
     """
-    Send an email with trading proposal.
-    
+    Build an email with a markdown body and its HTML rendering.
+
     Args:
+        subject (str): The subject of the email
         body (str): The email body content in markdown
+    Returns:
+        EmailMessage: The email message
+    """
+    import markdown
+    em = EmailMessage()
+    em["From"] = sender_email
+    em["To"] = receiver_email
+    em["Subject"] = subject
+    em.set_content(body)  # Plain text fallback
+    em.add_alternative(markdown.markdown(body, extensions=['toc']), subtype='html')  # HTML content
+    return em
+
+
+def proposal_subject(ticker, proposal):
+    """
+    Build the subject of a trading proposal email.
+
+    Args:
         ticker (str): The ticker symbol of the trading proposal
         proposal (str): The trading proposal (either buy or sell)
     Returns:
-        bool: True if email sent successfully, False otherwise
+        str: The subject
+    """
+    current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S %Z')
+    return f"[TradingAgent] New {proposal}ing Proposal for {ticker}! - {current_time}"
+
+
+def build_digest(entries):
     """
-    try:
-        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S %Z')
-        subject = f"[TradingAgent] New {proposal}ing Proposal for {ticker}! - {current_time}"
-
-        # Convert markdown body to HTML
-        html_body = markdown.markdown(body)
-
-        # Create email message
-        em = EmailMessage()
-        em["From"] = sender_email
-        em["To"] = receiver_email
-        em["Subject"] = subject
-        em.set_content(body)  # Plain text fallback
-        em.add_alternative(html_body, subtype='html')  # HTML content
-
-        # Create SSL context and send
+    Build one email from several trading proposals, with a per-ticker table of contents.
+
+    Args:
+        entries (list[tuple]): (ticker, proposal, body) of every proposal, body in markdown
+    Returns:
+        tuple: (subject, body) of the digest
+    """
+    from markdown.extensions.toc import slugify
+    headings = [f"{ticker}: {proposal} proposal" for ticker, proposal, _ in entries]
+    table_of_contents = "\n".join(f"- [{heading}](#{slugify(heading, '-')})" for heading in headings)
+    sections = "\n\n".join(f"## {heading}\n\n{body}" for heading, (_, _, body) in zip(headings, entries))
+    current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S %Z')
+    tickers = ", ".join(ticker for ticker, _, _ in entries)
+    subject = f"[TradingAgent] {len(entries)} Proposals ({tickers}) - {current_time}"
+    return subject, f"# Trading proposals\n\n{table_of_contents}\n\n{sections}"
+
+
+class Mailer:
+    """
+    Keeps one authenticated SMTP connection for a whole run and reconnects transparently if it drops.
+    """
+    def __init__(self, host=None, port=None, security=None, username=None, password=None):
+        """
+        Args:
+            host (str): SMTP host. Defaults to `SMTP_HOST` (smtp.gmail.com).
+            port (int): SMTP port. Defaults to `SMTP_PORT` (465).
+            security (str): "ssl", "starttls" or "none". Defaults to `SMTP_SECURITY` (ssl).
+            username (str): Login user. Defaults to `SENDER_EMAIL`. No login happens without a password.
+            password (str): Login password. Defaults to `GMAIL_APP_PASSWORD`.
+        """
+        self.host = host or smtp_host
+        self.port = port or smtp_port
+        self.security = security or smtp_security
+        self.username = username or sender_email
+        self.password = password if password is not None else sender_password
+        self._server = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
         context = ssl.create_default_context()
-        with smtplib.SMTP_SSL('smtp.gmail.com', 465, context=context) as server:
-            server.login(sender_email, sender_password)
-            server.send_message(em)
-            print(f"Email sent successfully for {ticker}")
+        if self.security == 'ssl':
+            server = smtplib.SMTP_SSL(self.host, self.port, context=context, timeout=30)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=30)
+            if self.security == 'starttls':
+                server.starttls(context=context)
+        if self.password:
+            server.login(self.username, self.password)
+        self._server = server
+
+    def _is_connected(self):
+        try:
+            return self._server is not None and self._server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _disconnect(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._server = None
+
+    def send_message(self, em):
+        """
+        Send an email over the shared connection, reconnecting once if the connection dropped.
+
+        Args:
+            em (EmailMessage): The email to send
+        """
+        with self._lock, span("smtp.send", kind="email", message_bytes=len(em.as_bytes())) as smtp_span:
+            if not self._is_connected():
+                self._disconnect()
+                self._connect()
+                smtp_span.set(connected=True)
+            try:
+                self._server.send_message(em)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                smtp_span.add("retries")
+                self._disconnect()
+                self._connect()
+                self._server.send_message(em)
+
+    def send_proposal(self, body, ticker, proposal):
+        """
+        Send an email with trading proposal.
+
+        Args:
+            body (str): The email body content in markdown
+            ticker (str): The ticker symbol of the trading proposal
+            proposal (str): The trading proposal (either buy or sell)
+        Returns:
+            bool: True if email sent successfully, False otherwise
+        """
+        try:
+            self.send_message(build_message(proposal_subject(ticker, proposal), body))
+            logging.info(f"Email sent successfully for {ticker}")
             return True
+        except Exception as e:
+            logging.error(f"Failed to send email: {e}")
+            return False
+
+    def close(self):
+        """Close the SMTP connection."""
+        with self._lock:
+            self._disconnect()
+
+
+def get_mailer():
+    """
+    Return the process-wide mailer, whose connection is shared by all emails of a run.
+
+    Returns:
+        Mailer: The shared mailer.
+    """
+    global _mailer
+    with _mailer_lock:
+        if _mailer is None:
+            _mailer = Mailer()
+        return _mailer
+
+
+def send_email(body, ticker, proposal):
+    """
+    Send an email with trading proposal over the shared SMTP connection.
+
+    Args:
+        body (str): The email body content in markdown
+        ticker (str): The ticker symbol of the trading proposal
+        proposal (str): The trading proposal (either buy or sell)
+    Returns:
+        bool: True if email sent successfully, False otherwise
+    """
+    return get_mailer().send_proposal(body, ticker, proposal)
 
-    except Exception as e:
-        print(f"Failed to send email: {str(e)}")
-        return False
-    
 if __name__ == "__main__":
     markdown_content = """
     # Trading Proposal
 
-    **Hello**, 
+    **Hello**,
 
     This is a test email to propose a **buy** for **AAPL**.
 
@@ -65,4 +212,4 @@ if __name__ == "__main__":
     Thanks,
     Trading Bot
     """
-    send_email(markdown_content, "AAPL", "buy")
\ No newline at end of file
+    send_email(markdown_content, "AAPL", "buy")
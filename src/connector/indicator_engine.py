@@ -0,0 +1,222 @@
+import copy
+import threading
+
+import numpy as np
+import pandas as pd
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+class IndicatorState:
+    """Rolling indicator state of one ticker, updated in O(1) per bar.
+
+    Reproduces the pandas_ta 0.3.14b definitions used by `technical_indicators.add_technical_indicators`:
+        - RSI and ATR: Wilder smoothing as pandas_ta's `rma`, i.e. an adjusted EWM with alpha = 1 / length,
+          kept as running numerator/weight sums.
+        - EMA: seeded with the SMA of the first `length` closes, then a recursive EMA with alpha = 2 / (length + 1).
+        - SMA and Bollinger Bands: running sums of the last `length` closes and their squares, kept with a ring
+          buffer of the closes that leave the window (population std, ddof=0).
+        - VWAP: cumulative typical price * volume and volume sums, reset every day.
+    """
+    def __init__(self, length=20, std=2.0, rsi_length=14, atr_length=14, ddof=0):
+        """Initializes an empty state.
+
+        Args:
+            length (int): Window of SMA, EMA and Bollinger Bands.
+            std (float): Number of standard deviations of the Bollinger Bands.
+            rsi_length (int): Window of the RSI.
+            atr_length (int): Window of the ATR.
+            ddof (int): Delta degrees of freedom of the Bollinger standard deviation.
+        """
+        self.length = length
+        self.std = std
+        self.rsi_length = rsi_length
+        self.atr_length = atr_length
+        self.ddof = ddof
+        self.closes = np.empty(length)
+        self.count = 0
+        # [sum of the closes in the window, sum of their squares]
+        self.sums = np.zeros(2)
+        self.prev_close = np.nan
+        self.ema = np.nan
+        # adjusted EWM sums: [rsi gains, rsi losses, rsi weight, rsi observations, atr sum, atr weight, atr observations]
+        self.wilder = np.zeros(7)
+        # [day, sum of typical price * volume, sum of volume]
+        self.vwap = np.array([np.nan, 0.0, 0.0])
+
+    def update(self, day, high, low, close, volume):
+        """Adds one bar and returns the indicator values after it.
+
+        Args:
+            day (int): The day number of the bar (e.g. days since epoch), used to anchor the VWAP.
+            high (float): High price.
+            low (float): Low price.
+            close (float): Close price.
+            volume (float): Volume.
+
+        Returns:
+            tuple: RSI, SMA, EMA, lower/middle/upper band, bandwidth, percent, VWAP and ATR. NaN until warmed up.
+        """
+        wilder = self.wilder
+        if not np.isnan(self.prev_close):
+            change = close - self.prev_close
+            rsi_decay = 1.0 - 1.0 / self.rsi_length
+            wilder[0] = max(change, 0.0) + rsi_decay * wilder[0]
+            wilder[1] = min(change, 0.0) + rsi_decay * wilder[1]
+            wilder[2] = 1.0 + rsi_decay * wilder[2]
+            wilder[3] += 1
+            true_range = max(high - low, abs(high - self.prev_close), abs(self.prev_close - low))
+            atr_decay = 1.0 - 1.0 / self.atr_length
+            wilder[4] = true_range + atr_decay * wilder[4]
+            wilder[5] = 1.0 + atr_decay * wilder[5]
+            wilder[6] += 1
+        self.prev_close = close
+
+        rsi = atr = np.nan
+        if wilder[3] >= self.rsi_length and wilder[0] - wilder[1] > 0:
+            rsi = 100.0 * wilder[0] / (wilder[0] - wilder[1])
+        if wilder[6] >= self.atr_length:
+            atr = wilder[4] / wilder[5]
+
+        slot = self.count % self.length
+        if self.count >= self.length:
+            leaving = self.closes[slot]
+            self.sums[0] -= leaving
+            self.sums[1] -= leaving * leaving
+        self.closes[slot] = close
+        self.sums[0] += close
+        self.sums[1] += close * close
+        self.count += 1
+        sma = std = ema = np.nan
+        if self.count >= self.length:
+            sma = self.sums[0] / self.length
+            variance = (self.sums[1] - self.sums[0] * sma) / (self.length - self.ddof)
+            std = np.sqrt(max(variance, 0.0))
+            if self.count == self.length:
+                self.ema = sma
+            else:
+                alpha = 2.0 / (self.length + 1)
+                self.ema = alpha * close + (1.0 - alpha) * self.ema
+            ema = self.ema
+        lower, upper = sma - self.std * std, sma + self.std * std
+        bandwidth = 100.0 * (upper - lower) / sma if sma else np.nan
+        percent = (close - lower) / (upper - lower) if upper != lower else np.nan
+
+        vwap = self.vwap
+        if vwap[0] != day:
+            vwap[:] = (day, 0.0, 0.0)
+        vwap[1] += (high + low + close) / 3.0 * volume
+        vwap[2] += volume
+        vwap_value = vwap[1] / vwap[2] if vwap[2] else np.nan
+
+        return rsi, sma, ema, lower, sma, upper, bandwidth, percent, vwap_value, atr
+
+    def copy(self):
+        """Returns an independent copy of the state."""
+        state = copy.copy(self)
+        state.closes = self.closes.copy()
+        state.sums = self.sums.copy()
+        state.wilder = self.wilder.copy()
+        state.vwap = self.vwap.copy()
+        return state
+
+
+class IndicatorEngine:
+    """Keeps an `IndicatorState` per ticker and only feeds it the bars it has not seen yet.
+
+    A state is only continued if the new data starts with exactly the bars it has seen: same first bar, same
+    timestamps and same values, except for the last bar, which is always re-applied from a snapshot, as the latest
+    bar of a data source may still be incomplete. Otherwise (a gap, a revision, older data or a window that slid
+    forward) the state is rebuilt from the given bars, so the values always equal pandas_ta on the same bars.
+    Callers should therefore pass a history anchored at a fixed first bar (e.g. the whole stored series) and
+    slice the result, not a sliding window.
+    """
+    def __init__(self, length=20, std=2.0, rsi_length=14, atr_length=14):
+        """Initializes an engine without any ticker state.
+
+        Args:
+            length (int): Window of SMA, EMA and Bollinger Bands.
+            std (float): Number of standard deviations of the Bollinger Bands.
+            rsi_length (int): Window of the RSI.
+            atr_length (int): Window of the ATR.
+        """
+        self.params = dict(length=length, std=std, rsi_length=rsi_length, atr_length=atr_length)
+        self.columns = ["RSI", f"SMA_{length}", f"EMA_{length}", f"BBL_{length}_{float(std)}", f"BBM_{length}_{float(std)}",
+                        f"BBU_{length}_{float(std)}", f"BBB_{length}_{float(std)}", f"BBP_{length}_{float(std)}", "VWAP", "ATR"]
+        self._tickers = {}
+        self._lock = threading.Lock()
+
+    def _new_entry(self):
+        return {"state": IndicatorState(**self.params), "snapshot": None, "size": 0,
+                "timestamps": np.empty(0, dtype="datetime64[ns]"), "values": np.empty((0, 4)),
+                "rows": np.empty((0, len(self.columns)))}
+
+    @staticmethod
+    def _continues(entry, timestamps, values):
+        """Returns True if the bars start with the bars of the entry (the last one may have changed)."""
+        size = entry["size"]
+        if not size or len(timestamps) < size:
+            return False
+        return (np.array_equal(timestamps[:size], entry["timestamps"][:size])
+                and np.array_equal(values[:size - 1], entry["values"][:size - 1], equal_nan=True))
+
+    def _replay(self, entry, timestamps, days, values):
+        size = entry["size"]
+        needed = size + len(timestamps)
+        if needed > len(entry["timestamps"]):
+            capacity = max(needed, 2 * len(entry["timestamps"]), 256)
+            entry["timestamps"] = np.resize(entry["timestamps"], capacity)
+            entry["values"] = np.resize(entry["values"], (capacity, 4))
+            entry["rows"] = np.resize(entry["rows"], (capacity, len(self.columns)))
+        state, last = entry["state"], needed - 1
+        for i, (day, (high, low, close, volume)) in enumerate(zip(days, values), start=size):
+            if i == last:
+                # the state before the last bar, to re-apply it if it was incomplete
+                entry["snapshot"] = state.copy()
+            entry["rows"][i] = state.update(day, high, low, close, volume)
+        entry["timestamps"][size:needed] = timestamps
+        entry["values"][size:needed] = values
+        entry["size"] = needed
+
+    def update(self, ticker, data):
+        """Updates the state of a ticker with new bars and returns the bars joined with their indicators.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+            data (pandas.DataFrame): Consecutive bars with a datetime index and 'High', 'Low', 'Close', 'Volume' columns.
+
+        Returns:
+            pandas.DataFrame: `data` with the indicator columns added, like `add_technical_indicators`.
+        """
+        if data.empty:
+            return data.join(pd.DataFrame(columns=self.columns, index=data.index, dtype=float))
+        timestamps = data.index.values.astype("datetime64[ns]")
+        days = timestamps.astype("datetime64[D]").astype(np.int64)
+        values = data[["High", "Low", "Close", "Volume"]].to_numpy(dtype=float)
+        with self._lock:
+            entry = self._tickers.get(ticker)
+            if entry is not None and self._continues(entry, timestamps, values):
+                # re-apply the last seen bar, it may have been incomplete
+                entry["state"] = entry["snapshot"]
+                entry["size"] -= 1
+            else:
+                entry = self._new_entry()
+                self._tickers[ticker] = entry
+            start = entry["size"]
+            self._replay(entry, timestamps[start:], days[start:], values[start:])
+            rows = entry["rows"][:entry["size"]].copy()
+        return pd.concat([data, pd.DataFrame(rows, index=data.index, columns=self.columns)], axis=1)
+
+
+def get_indicator_engine():
+    """Returns the process-wide indicator engine.
+
+    Returns:
+        IndicatorEngine: The shared indicator engine.
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = IndicatorEngine()
+        return _engine
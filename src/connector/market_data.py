@@ -0,0 +1,89 @@
+import logging
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from agents.utils.tracing import span
+from connector.bar_store import get_bar_store, mark_prefetched, period_start, MAX_HISTORY
+
+# (interval, period) pairs the pipeline needs: three-day bars, one month of hourly bars for the
+# technical indicators and the minute bars of the latest trading day.
+DEFAULT_INTERVALS = (("1d", "5d"), ("1h", "1mo"), ("1m", "5d"))
+# exchange timezone of tickers that are not in the bar store yet, if the download has no exchange timezone
+DEFAULT_TIMEZONE = "America/New_York"
+
+
+def _exchange_timezone(bar_store, ticker, index):
+    """Returns the exchange timezone of a ticker without a network request: the timezone stored for one of its
+    series, the timezone of the downloaded bars, or `DEFAULT_TIMEZONE` (grouped downloads of tickers of several
+    exchanges are in UTC)."""
+    for interval, _ in DEFAULT_INTERVALS:
+        tz = bar_store.timezone(ticker, interval)
+        if tz and tz != "UTC":
+            return tz
+    if index.tz is not None and str(index.tz) != "UTC":
+        return str(index.tz)
+    return DEFAULT_TIMEZONE
+
+
+def _store_download(bar_store, data, tickers, interval):
+    """Stores the bars of a grouped download per ticker. Tickers without bars are stored empty, which records
+    the download time of their series (see `BarStore.download_start`)."""
+    for ticker in tickers:
+        frame = pd.DataFrame(columns=["Close"])
+        if isinstance(data.columns, pd.MultiIndex):
+            if ticker in data.columns.get_level_values(0):
+                frame = data[ticker]
+        elif "Close" in data.columns:
+            frame = data
+        frame = frame.dropna(subset=["Close"])
+        if not frame.empty:
+            tz = _exchange_timezone(bar_store, ticker, frame.index)
+            if frame.index.tz is None:
+                frame.index = frame.index.tz_localize(tz)
+            else:
+                frame.index = frame.index.tz_convert(tz)
+        bar_store.upsert(ticker, interval, frame)
+
+
+def prefetch_market_data(tickers, intervals=DEFAULT_INTERVALS):
+    """Downloads the bars of a whole ticker universe in grouped requests and stores them in the bar store, so the
+    per-ticker functions (`get_stock_data`, `fetch_stock_data`) only slice them locally.
+
+    Per interval, the tickers with stored bars share one request for the bars since the oldest of their
+    download starts (see `BarStore.download_start`), so halted tickers do not pull it back. Tickers without
+    stored bars share a second request for the whole period. The downloaded series stay fresh for the rest of the
+    calling context (e.g. a run and the ticker evaluations it starts with a copy of its context), so tickers
+    evaluated late in a run do not download their bars again.
+
+    Args:
+        tickers (list[str]): The stock ticker symbols.
+        intervals (tuple): (interval, period) pairs to download.
+    """
+    tickers = list(tickers)
+    if not tickers:
+        return
+    import yfinance as yf
+    bar_store = get_bar_store()
+    # the series of an earlier prefetch are not trusted if this one fails
+    mark_prefetched(())
+    prefetched = set()
+    now = datetime.now(timezone.utc)
+    for interval, period in intervals:
+        needed_start = period_start(period)
+        if interval in MAX_HISTORY:
+            needed_start = max(needed_start, now - MAX_HISTORY[interval] + timedelta(minutes=5))
+        starts = {ticker: bar_store.download_start(ticker, interval, needed_start) for ticker in tickers}
+        groups = {}
+        for ticker, start in starts.items():
+            groups.setdefault(start <= needed_start, []).append(ticker)
+        for full, group in groups.items():
+            start = needed_start if full else min(starts[ticker] for ticker in group)
+            with span("yfinance.download", interval=interval, tickers=len(group)) as download_span:
+                data = yf.download(group, start=start, end=now + timedelta(days=1), interval=interval,
+                                   group_by="ticker", auto_adjust=True, ignore_tz=False, threads=True, progress=False)
+                download_span.set(rows=len(data))
+            _store_download(bar_store, data, group, interval)
+            prefetched.update((ticker, interval) for ticker in group)
+        logging.info(f"Prefetched {interval} bars for {len(tickers)} tickers")
+    mark_prefetched(prefetched)
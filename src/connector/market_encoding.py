@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+from common.tokens import count_tokens
+
+# coarser resolutions tried in order when the encoded bars exceed the token budget
+RESOLUTIONS = ["1min", "5min", "15min", "30min", "60min"]
+
+
+def resample_bars(data, resolution):
+    """Resamples OHLCV bars to a coarser resolution.
+
+    Args:
+        data (pandas.DataFrame): Bars with a datetime index and 'Open', 'High', 'Low', 'Close', 'Volume' columns.
+        resolution (str): A pandas offset alias (e.g. "5min"), or None to keep the bars as they are.
+
+    Returns:
+        pandas.DataFrame: The resampled bars.
+    """
+    if not resolution or resolution == "1min" or data.empty:
+        return data
+    resampled = data.resample(resolution, label="left", closed="left").agg(
+        {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+    )
+    return resampled.dropna(subset=["Close"])
+
+
+def summarize_bars(data, spike_zscore=2.5, time_format="%H:%M"):
+    """Computes a summary block of a bar series: VWAP, range, change and volume spikes.
+
+    Args:
+        data (pandas.DataFrame): Bars with a datetime index and OHLCV columns.
+        spike_zscore (float): Volume z-score from which a bar counts as a volume spike.
+        time_format (str): strftime format of the times of volume spikes.
+
+    Returns:
+        str: The summary block.
+    """
+    if data.empty:
+        return "Summary: no bars available"
+    close = data["Close"].to_numpy(dtype=float)
+    high = data["High"].to_numpy(dtype=float)
+    low = data["Low"].to_numpy(dtype=float)
+    volume = data["Volume"].to_numpy(dtype=float)
+    total_volume = volume.sum()
+    vwap = ((high + low + close) / 3 * volume).sum() / total_volume if total_volume else np.nan
+    first_open = float(data["Open"].iloc[0])
+    change = (close[-1] / first_open - 1) * 100 if first_open else np.nan
+    spikes = np.array([], dtype=int)
+    if len(volume) > 1 and volume.std() > 0:
+        spikes = np.flatnonzero((volume - volume.mean()) / volume.std() >= spike_zscore)
+    spike_text = ", ".join(f"{data.index[i].strftime(time_format)} ({volume[i] / volume.mean():.1f}x avg)" for i in spikes[-5:]) or "none"
+    return "\n".join([
+        f"Summary: {data.index[0]:%Y-%m-%d %H:%M} to {data.index[-1]:%Y-%m-%d %H:%M} ({len(data)} bars)",
+        f"Open {first_open:.2f}, Last {close[-1]:.2f}, Change {change:+.2f}%",
+        f"High {high.max():.2f}, Low {low.min():.2f}, Range {high.max() - low.min():.2f}",
+        f"VWAP {vwap:.2f}, Last vs VWAP {close[-1] - vwap:+.2f}",
+        f"Volume {total_volume:,.0f}, Volume spikes (z>={spike_zscore}): {spike_text}",
+    ])
+
+
+def format_bars_csv(data, precision=2, time_format="%H:%M"):
+    """Formats OHLCV bars as compact, fixed-precision CSV rows.
+
+    Args:
+        data (pandas.DataFrame): Bars with a datetime index and OHLCV columns.
+        precision (int): Decimal places of the prices.
+        time_format (str): strftime format of the time column.
+
+    Returns:
+        str: A header line followed by one line per bar.
+    """
+    if data.empty:
+        return "time,open,high,low,close,volume"
+    prices = np.char.mod(f"%.{precision}f", data[["Open", "High", "Low", "Close"]].to_numpy(dtype=float))
+    volume = np.char.mod("%d", data["Volume"].to_numpy(dtype=float).round().astype(np.int64))
+    times = np.asarray(data.index.strftime(time_format), dtype=str)
+    columns = [times, prices[:, 0], prices[:, 1], prices[:, 2], prices[:, 3], volume]
+    rows = columns[0]
+    for column in columns[1:]:
+        rows = np.char.add(np.char.add(rows, ","), column)
+    return "time,open,high,low,close,volume\n" + "\n".join(rows.tolist())
+
+
+def encode_bars(data, resolution="5min", precision=2, token_budget=1500, time_format="%H:%M"):
+    """Encodes OHLCV bars compactly for a prompt: a summary block followed by CSV rows.
+
+    If the encoding exceeds `token_budget`, coarser resolutions are tried, and as a last resort only the most
+    recent rows that fit are kept.
+
+    Args:
+        data (pandas.DataFrame): Bars with a datetime index and OHLCV columns.
+        resolution (str): Initial resolution as a pandas offset alias (e.g. "1min", "5min"), or None to keep the bars.
+        precision (int): Decimal places of the prices.
+        token_budget (int): Maximum number of tokens of the encoding.
+        time_format (str): strftime format of the time column.
+
+    Returns:
+        str: The encoded bars.
+    """
+    summary = summarize_bars(data, time_format=time_format)
+    if resolution in RESOLUTIONS:
+        candidates = RESOLUTIONS[RESOLUTIONS.index(resolution):]
+    else:
+        candidates = [resolution]
+    for candidate in candidates:
+        resampled = resample_bars(data, candidate)
+        label = f"Bars ({candidate or 'as provided'}):"
+        text = f"{summary}\n{label}\n{format_bars_csv(resampled, precision, time_format)}"
+        if count_tokens(text) <= token_budget:
+            return text
+    lines = text.split("\n")
+    header_length = summary.count("\n") + 3
+    header, rows = lines[:header_length], lines[header_length:]
+    while rows and count_tokens("\n".join(header + rows)) > token_budget:
+        rows = rows[max(1, len(rows) // 10):]
+    return "\n".join(header + rows)
@@ -2,18 +2,15 @@ import requests
 import os
 import json
 
-import yfinance as yf
 from datetime import datetime
 
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from dotenv import load_dotenv
 
+from agents.utils import deadline
+from agents.utils.tracing import span
+from common.tokens import fit_items, truncate_to_tokens
+from connector.article_fetcher import get_article_fetcher
+
 load_dotenv()
 
 class NewsFetcher:
@@ -22,20 +19,24 @@ class NewsFetcher:
 
         Args:
             num_articles (int): The number of articles to fetch. Default is 5.
+
+        Every article is cut to `ARTICLE_TOKEN_BUDGET` tokens and a combined news context to `NEWS_TOKEN_BUDGET` tokens.
         """
         self.fetched_news_about_stock = []
         self.fetched_news_general = []
         self.fetched_websearch_about_stock = []
         self.num_articles = num_articles
+        self.max_article_tokens = int(os.getenv('ARTICLE_TOKEN_BUDGET', 1200))
+        self.max_news_tokens = int(os.getenv('NEWS_TOKEN_BUDGET', 8000))
         self.subscription_key = os.getenv('AZURE_BING_SUBSCRIPTIONKEY')
-        self.endpoint = "https://api.bing.microsoft.com/v7.0/search"
+        self.endpoint = os.getenv('BING_ENDPOINT', "https://api.bing.microsoft.com/v7.0/search")
         with open('ticker_db.json') as f:
             self.TICKER_OVERVIEW_DB = json.load(f)
 
     def get_article_content(self, url):
         """
-        Fetches the content of an article from the given URL using Selenium and updates the list of
-        fetched news.
+        Fetches the content of an article from the given URL and updates the list of fetched news.
+        A plain HTTP request is tried first; a pooled Selenium browser session is only used if that yields no content.
 
         Args:
             url (str): The URL of the article.
@@ -44,22 +45,10 @@ class NewsFetcher:
             str: The content of the article.
         """
         print(f"Fetching article content from {url}")
-        options = webdriver.ChromeOptions()
-        options.add_argument('--headless')
-        options.add_argument('--no-sandbox')
-        options.add_argument('--disable-dev-shm-usage')
-        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-        driver.get(url)
-        
         try:
-            WebDriverWait(driver, 0.5).until(EC.presence_of_element_located((By.TAG_NAME, 'body')))
-            soup = BeautifulSoup(driver.page_source, 'html.parser')
-            paragraphs = soup.find_all('p')
-            content = ' '.join([p.get_text() for p in paragraphs])
+            content = get_article_fetcher().fetch(url)
         except Exception as e:
             content = f"Failed to retrieve the article content: {e}"
-        finally:
-            driver.quit()
         
         return content
     
@@ -81,15 +70,20 @@ class NewsFetcher:
             "mkt": "en-US"
         }
 
-        response = requests.get(self.endpoint, headers=headers, params=params)
+        with span("bing.search") as bing_span:
+            response = requests.get(self.endpoint, headers=headers, params=params,
+                                    timeout=deadline.timeout(float(os.getenv('BING_TIMEOUT', 10))))
+            bing_span.set(status_code=response.status_code, response_bytes=len(response.content))
         web_results = []
         if response.status_code == 200:
             results = response.json()
             for result in results.get("webPages", {}).get("value", []):
+                if deadline.expired():
+                    break
                 search_hit = self.get_article_content(url=result['url'])
                 if search_hit and type(search_hit)==str:
                     web_results.append("Websearch Title: "+result['name']+"\n"+search_hit)
-            return web_results
+            return fit_items(web_results, self.max_article_tokens, self.max_news_tokens)
         else:
             print(response.json())
             return False
@@ -107,13 +101,18 @@ class NewsFetcher:
         Returns:
             list: A list of dictionaries containing the title, link, publisher, published time, and content of each article.
         """
-        ticker = yf.Ticker(ticker_symbol)
-        news = ticker.news[:self.num_articles]
+        import yfinance as yf
+        with span("yfinance.news") as news_span:
+            ticker = yf.Ticker(ticker_symbol)
+            news = ticker.news[:self.num_articles]
+            news_span.set(items=len(news))
         
         existing_links = {item['link'] for item in list_of_news_to_update}
         updated = False
         
         for article in news:
+            if deadline.expired():
+                break
             if article['link'] not in existing_links:
                 publish_time = datetime.fromtimestamp(article['providerPublishTime']).strftime('%Y-%m-%d %H:%M:%S')
                 content = self.get_article_content(article['link'])
@@ -149,10 +148,10 @@ class NewsFetcher:
                 title = f"Title: {news_item['title']}"
                 publisher = f"Publisher: {news_item['publisher']}"
                 published = f"Published at: {news_item['published']}"
-                content = f"Content: {news_item['content']}"
+                content = f"Content: {truncate_to_tokens(news_item['content'], self.max_article_tokens)}"
 
                 output_text.append(f"\n{title}\n{publisher}\n{published}\n{content}\n")
-            return "\n".join(output_text)
+            return "\n".join(fit_items(output_text, self.max_article_tokens + 100, self.max_news_tokens))
 
     def fetch_news_about_stock(self, ticker):
         """
@@ -175,10 +174,10 @@ class NewsFetcher:
                 title = f"Title: {news_item['title']}"
                 publisher = f"Publisher: {news_item['publisher']}"
                 published = f"Published at: {news_item['published']}"
-                content = f"Content: {news_item['content']}"
+                content = f"Content: {truncate_to_tokens(news_item['content'], self.max_article_tokens)}"
 
                 output_text.append(f"\n{title}\n{publisher}\n{published}\n{content}\n")
-            return "\n".join(output_text)
+            return "\n".join(fit_items(output_text, self.max_article_tokens + 100, self.max_news_tokens))
         
     def fetch_websearch_results_on_stock(self, ticker="AAPL"):
         """Fetch web results on a given stock.
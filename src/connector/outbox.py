@@ -0,0 +1,221 @@
+import os
+import time
+import atexit
+import logging
+import sqlite3
+import threading
+
+from agents.utils.tracing import span
+from connector.email_bot import build_digest, build_message, get_mailer
+
+_outbox = None
+_outbox_lock = threading.Lock()
+
+
+class Outbox:
+    """A persistent email queue delivered by a background sender thread.
+
+    Evaluations only enqueue their emails, so a slow or unreachable mail server never holds them up. Failed
+    deliveries are retried with exponential backoff, emails are deduplicated by (ticker, run id), and emails that
+    were not delivered before the process exited are sent when the next outbox is started.
+
+    In digest mode, the proposals of a run are stored with `add_to_digest` as they are made and queued as one
+    email by `release_digests`, so the proposals of a run that died are still sent by the next one.
+    """
+    def __init__(self, path=None, max_attempts=6, base_delay=30, max_delay=30 * 60, poll_interval=5, mailer=None):
+        """Opens (and creates if needed) the outbox database.
+
+        Args:
+            path (str): The SQLite database file. Defaults to a file in `CACHE_DIR` (`.cache`).
+            max_attempts (int): Delivery attempts after which an email is marked as failed.
+            base_delay (float): Seconds before the first retry. Doubles with every attempt.
+            max_delay (float): Maximum seconds between two attempts.
+            poll_interval (float): Seconds the sender waits for new emails before checking for due retries.
+            mailer (Mailer): The mailer used for delivery. Defaults to the shared mailer.
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.mailer = mailer or get_mailer()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._idle = threading.Condition()
+        self._thread = None
+        path = path or os.path.join(os.getenv('CACHE_DIR', '.cache'), 'outbox.sqlite')
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, run_id TEXT, ticker TEXT, "
+                "subject TEXT, body TEXT, status TEXT, attempts INTEGER, next_attempt REAL, last_error TEXT, "
+                "created REAL, sent REAL, UNIQUE (ticker, run_id))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS digest (run_id TEXT, ticker TEXT, proposal TEXT, body TEXT, created REAL, "
+                "UNIQUE (ticker, run_id))"
+            )
+
+    def enqueue(self, run_id, ticker, subject, body):
+        """Queues an email. An email for the same ticker and run is only queued once.
+
+        Args:
+            run_id (str): The id of the evaluation run.
+            ticker (str): The ticker symbol the email is about (or e.g. "digest").
+            subject (str): The subject of the email.
+            body (str): The email body content in markdown.
+
+        Returns:
+            bool: True if the email was queued, False if it was a duplicate.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO outbox (run_id, ticker, subject, body, status, attempts, next_attempt, created) "
+                "VALUES (?, ?, ?, ?, 'pending', 0, ?, ?)", (run_id, ticker, subject, body, now, now)
+            )
+        if cursor.rowcount == 0:
+            logging.info(f"Email for {ticker} in run {run_id} is already queued.")
+            return False
+        self._wakeup.set()
+        return True
+
+    def add_to_digest(self, run_id, ticker, proposal, body):
+        """Stores a proposal for the digest email of a run. A proposal for the same ticker and run is only stored once.
+
+        Args:
+            run_id (str): The id of the evaluation run.
+            ticker (str): The ticker symbol of the trading proposal.
+            proposal (str): The trading proposal (either buy or sell).
+            body (str): The email body content in markdown.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR IGNORE INTO digest VALUES (?, ?, ?, ?, ?)", (run_id, ticker, proposal, body, time.time()))
+
+    def release_digests(self, run_id=None):
+        """Queues one digest email per run from the stored proposals and removes them from the digest.
+
+        Args:
+            run_id (str): The run whose digest is queued. Defaults to all runs, e.g. runs that died before the end.
+
+        Returns:
+            int: The number of queued digests.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT run_id, ticker, proposal, body FROM digest WHERE ? IS NULL OR run_id = ? ORDER BY created, rowid",
+                (run_id, run_id)
+            ).fetchall()
+        runs = {}
+        for run, ticker, proposal, body in rows:
+            runs.setdefault(run, []).append((ticker, proposal, body))
+        for run, entries in runs.items():
+            # a digest queued before a crash is not queued twice, as emails are deduplicated by (ticker, run id)
+            self.enqueue(run, "digest", *build_digest(entries))
+            with self._lock, self._conn:
+                self._conn.execute("DELETE FROM digest WHERE run_id = ?", (run,))
+        return len(runs)
+
+    def pending(self):
+        """Returns the number of emails that still wait for delivery.
+
+        Returns:
+            int: The number of pending emails.
+        """
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+
+    def _next_due(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, ticker, subject, body, attempts FROM outbox WHERE status = 'pending' AND next_attempt <= ? "
+                "ORDER BY next_attempt LIMIT 1", (time.time(),)
+            ).fetchone()
+
+    def _deliver(self, row):
+        email_id, ticker, subject, body, attempts = row
+        try:
+            with span("outbox.deliver", kind="email", ticker=ticker, attempt=attempts + 1):
+                self.mailer.send_message(build_message(subject, body))
+        except Exception as e:
+            attempts += 1
+            status = 'failed' if attempts >= self.max_attempts else 'pending'
+            delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+            with self._lock, self._conn:
+                self._conn.execute("UPDATE outbox SET status = ?, attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?",
+                                   (status, attempts, time.time() + delay, str(e), email_id))
+            if status == 'failed':
+                logging.error(f"Giving up on the email for {ticker} after {attempts} attempts: {e}")
+            else:
+                logging.warning(f"Sending the email for {ticker} failed (attempt {attempts}), retrying in {delay:.0f}s: {e}")
+            return
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE outbox SET status = 'sent', attempts = ?, sent = ?, last_error = NULL WHERE id = ?",
+                               (attempts + 1, time.time(), email_id))
+        logging.info(f"Email sent successfully for {ticker}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            row = self._next_due()
+            if row is not None:
+                self._deliver(row)
+                continue
+            with self._idle:
+                self._idle.notify_all()
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def start(self):
+        """Starts the background sender thread if it is not running yet."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="outbox-sender", daemon=True)
+                self._thread.start()
+
+    def flush(self, timeout=60):
+        """Waits until every email that is due has been delivered or rescheduled.
+
+        Emails waiting for a retry stay in the outbox and are sent later or by the next process.
+
+        Args:
+            timeout (float): Maximum seconds to wait.
+
+        Returns:
+            bool: True if no emails are pending anymore.
+        """
+        self.start()
+        deadline = time.monotonic() + timeout
+        while self._next_due() is not None and time.monotonic() < deadline:
+            self._wakeup.set()
+            with self._idle:
+                self._idle.wait(min(1.0, max(0.0, deadline - time.monotonic())))
+        return self.pending() == 0
+
+    def close(self):
+        """Stops the sender thread after its current delivery and closes the mail connection."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=30)
+        self.mailer.close()
+
+
+def get_outbox():
+    """Returns the process-wide outbox with a running sender thread, configured by `OUTBOX_MAX_ATTEMPTS`
+    and `OUTBOX_RETRY_DELAY`.
+
+    Returns:
+        Outbox: The shared outbox.
+    """
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = Outbox(max_attempts=int(os.getenv('OUTBOX_MAX_ATTEMPTS', 6)),
+                             base_delay=float(os.getenv('OUTBOX_RETRY_DELAY', 30)))
+            atexit.register(_outbox.close)
+        _outbox.start()
+        return _outbox
@@ -1,18 +1,24 @@
-import yfinance as yf
+import os
 import pandas as pd
 from datetime import datetime, timedelta
 from typing import Tuple
 from pytz import timezone
 
+from connector.bar_store import get_bar_store
+from connector.market_encoding import encode_bars
+
 def get_stock_data(ticker: str) -> Tuple[str, str]:
     """
     Fetch both 3-day historical and current day intraday stock data for given ticker.
+    Bars are served from the local bar store, which only downloads bars it does not have yet, and are
+    compactly encoded (summary block plus CSV rows). The intraday bars are resampled to `MINUTE_BAR_RESOLUTION`
+    and bounded by `MINUTE_BAR_TOKEN_BUDGET`.
     
     Args:
         ticker (str): Stock ticker symbol (e.g. 'AAPL')
     
     Returns:
-        Tuple[str, str]: (3-day historical data, current day intraday data) in markdown format
+        Tuple[str, str]: (3-day historical data, current day intraday data) in a compact CSV format
     """
     try:
         mez_tz = timezone('Europe/Berlin')
@@ -20,13 +26,21 @@ def get_stock_data(ticker: str) -> Tuple[str, str]:
         end_date = now_mez.date()
         start_date = end_date - timedelta(days=3)
 
+        bar_store = get_bar_store()
+
         # Get historical data
-        stock_data = yf.download(ticker, start=start_date, end=end_date, interval="1d")
-        stock_data = stock_data.to_markdown(index=False)
+        stock_data = bar_store.get_bars(ticker, "1d",
+                                        start=pd.Timestamp(start_date).tz_localize(mez_tz),
+                                        end=pd.Timestamp(end_date).tz_localize(mez_tz))
+        stock_data = encode_bars(stock_data, resolution=None, time_format="%Y-%m-%d", token_budget=300)
 
-        # Fetch detailed data for current day
-        current_day_data = yf.download(ticker, period="1d", interval="1m")
-        current_day_data = current_day_data.to_markdown(index=False)
+        # Fetch detailed data for current day (the latest trading day)
+        current_day_data = bar_store.get_bars(ticker, "1m", start=now_mez - timedelta(days=5))
+        if not current_day_data.empty:
+            current_day_data = current_day_data[current_day_data.index.date == current_day_data.index[-1].date()]
+        current_day_data = encode_bars(current_day_data,
+                                       resolution=os.getenv('MINUTE_BAR_RESOLUTION', '5min'),
+                                       token_budget=int(os.getenv('MINUTE_BAR_TOKEN_BUDGET', 1500)))
 
         return stock_data, current_day_data
     
@@ -1,9 +1,14 @@
-import yfinance as yf
-import pandas_ta as ta
+import os
+
+import numpy as np
+
+from connector.bar_store import get_bar_store, period_start
+from connector.indicator_engine import get_indicator_engine
 
 def fetch_stock_data(ticker, period="1mo", interval="1d"):
     """
-    Fetch historical stock data for a given ticker.
+    Fetch historical stock data for a given ticker from the local bar store, which only downloads
+    bars it does not have yet.
 
     Parameters:
         ticker (str): The stock ticker symbol (e.g., "AAPL").
@@ -13,8 +18,7 @@ def fetch_stock_data(ticker, period="1mo", interval="1d"):
     Returns:
         pandas.DataFrame: Historical stock data with datetime index.
     """
-    stock = yf.Ticker(ticker)
-    data = stock.history(period=period, interval=interval)
+    data = get_bar_store().get_bars(ticker, interval, start=period_start(period))
     data.index = data.index.tz_localize(None)
     return data
 
@@ -34,6 +38,8 @@ def add_technical_indicators(data):
             - VWAP: Volume-Weighted Average Price
             - ATR: Average True Range
     """
+    # only the legacy path needs pandas_ta, which is slow to import
+    import pandas_ta as ta
     # Relative Strength Index (RSI)
     data['RSI'] = ta.rsi(data['Close'], length=14)
     # Simple Moving Average (SMA)
@@ -50,13 +56,33 @@ def add_technical_indicators(data):
     
     return data
 
+def _dates(index, date_format):
+    if index.tz is None and date_format == '%Y-%m-%d':
+        return index.values.astype('datetime64[D]').astype(str)
+    return np.asarray(index.strftime(date_format), dtype=str)
+
+def _render(row_template, columns, separator):
+    """Renders equally long columns into one string with a single printf-style formatting pass.
+
+    The columns are interleaved row-major into one flat tuple and formatted with `row_template` repeated once
+    per row, so no Python code runs per row.
+    """
+    rows = np.empty((len(columns[0]), len(columns)), dtype=object)
+    for position, column in enumerate(columns):
+        rows[:, position] = column
+    return separator.join([row_template] * len(rows)) % tuple(rows.ravel().tolist())
+
 # Function to format data into the desired text-based format
-def format_as_text(data):
+def format_as_text(data, layout="legacy"):
     """
     Format stock data with technical indicators into a structured text format.
+    The serialization is column-wise: statuses are classified with `numpy.where` and all rows are formatted in a
+    single pass over NumPy columns instead of a Python loop over the rows.
 
     Parameters:
         data (pandas.DataFrame): Stock data with columns for indicators like 'Close', 'RSI', 'SMA_20', etc.
+        layout (str): "legacy" for the block layout below (byte-for-byte identical to the former row-wise
+            implementation) or "table" for a compact CSV table (see `format_as_table`).
 
     Returns:
         str: A formatted string containing stock data and technical indicators for each row in the DataFrame.
@@ -69,34 +95,95 @@ def format_as_text(data):
                 VWAP: $XXX.XX
                 ATR: X.X (Status)
     """
-    output = []
-    for date, row in data.iterrows():
-        rsi_status = "Overbought" if row['RSI'] > 70 else "Oversold" if row['RSI'] < 30 else "Neutral"
-        atr_status = "High Volatility" if row['ATR'] > 2 else "Low Volatility"
-        formatted = f"""
-Date: {date.date()}
-Close Price: ${row['Close']:.2f}
-RSI: {row['RSI']:.1f} ({rsi_status})
-SMA (20): ${row['SMA_20']:.2f}
-EMA (20): ${row['EMA_20']:.2f}
-VWAP: ${row['VWAP']:.2f}
-ATR: {row['ATR']:.1f} ({atr_status})
-"""
-        output.append(formatted.strip())
-    return "\n\n".join(output)
-
-
-def fetch_technical_indicators_of_ticker(ticker):
+    if layout == "table":
+        return format_as_table(data)
+    if data.empty:
+        return ""
+    rsi = data['RSI'].to_numpy(dtype=float)
+    atr = data['ATR'].to_numpy(dtype=float)
+    columns = [
+        _dates(data.index, '%Y-%m-%d'),
+        data['Close'].to_numpy(dtype=float),
+        rsi,
+        np.where(rsi > 70, "Overbought", np.where(rsi < 30, "Oversold", "Neutral")),
+        data['SMA_20'].to_numpy(dtype=float),
+        data['EMA_20'].to_numpy(dtype=float),
+        data['VWAP'].to_numpy(dtype=float),
+        atr,
+        np.where(atr > 2, "High Volatility", "Low Volatility"),
+    ]
+    row_template = (
+        "Date: %s\nClose Price: $%.2f\nRSI: %.1f (%s)\nSMA (20): $%.2f\nEMA (20): $%.2f\nVWAP: $%.2f\nATR: %.1f (%s)"
+    )
+    return _render(row_template, columns, "\n\n")
+
+
+def format_as_table(data):
+    """
+    Format stock data with technical indicators as a compact CSV table, one line per bar.
+
+    Parameters:
+        data (pandas.DataFrame): Stock data with columns for indicators like 'Close', 'RSI', 'SMA_20', etc.
+
+    Returns:
+        str: A header line followed by one line per row:
+            time,close,rsi,rsi_status,sma_20,ema_20,vwap,atr,atr_status
+    """
+    header = "time,close,rsi,rsi_status,sma_20,ema_20,vwap,atr,atr_status"
+    if data.empty:
+        return header
+    rsi = data['RSI'].to_numpy(dtype=float)
+    atr = data['ATR'].to_numpy(dtype=float)
+    columns = [
+        _dates(data.index, '%Y-%m-%d %H:%M'),
+        data['Close'].to_numpy(dtype=float),
+        rsi,
+        np.where(rsi > 70, "overbought", np.where(rsi < 30, "oversold", "neutral")),
+        data['SMA_20'].to_numpy(dtype=float),
+        data['EMA_20'].to_numpy(dtype=float),
+        data['VWAP'].to_numpy(dtype=float),
+        atr,
+        np.where(atr > 2, "high", "low"),
+    ]
+    return header + "\n" + _render("%s,%.2f,%.1f,%s,%.2f,%.2f,%.2f,%.2f,%s", columns, "\n")
+
+
+def compute_technical_indicators(ticker):
+    """
+    Fetch the hourly bars of the last month of a ticker and compute their technical indicators.
+    Indicators are computed by the incremental indicator engine, unless `INDICATOR_ENGINE=pandas_ta` is set.
+    The engine warms up on the whole stored hourly series and only the last month is returned.
+
+    Parameters:
+        ticker (str): The stock ticker symbol.
+
+    Returns:
+        pandas.DataFrame: The bars with indicator columns, without the warm-up rows.
+    """
+    data = fetch_stock_data(ticker, period="1mo", interval="1h")
+    if os.getenv('INDICATOR_ENGINE', 'incremental') == 'pandas_ta':
+        data_with_indicators = add_technical_indicators(data)
+    else:
+        # the engine gets the whole stored series, whose first bar does not move like the start of the one-month
+        # window, so only the bars not seen by an earlier call are computed
+        history = get_bar_store().load(ticker, "1h")
+        history.index = history.index.tz_localize(None)
+        data_with_indicators = get_indicator_engine().update(ticker, history).loc[data.index]
+    return data_with_indicators.dropna()
+
+
+def fetch_technical_indicators_of_ticker(ticker, layout=None):
     """
     Main function to fetch stock data, compute technical indicators, and prepare the output.
 
+    Parameters:
+        ticker (str): The stock ticker symbol.
+        layout (str): "legacy" or "table" (see `format_as_text`). Defaults to `INDICATOR_TEXT_LAYOUT`.
+
     Returns:
         str: Stock data with added technical indicators.
     """
-    data = fetch_stock_data(ticker, period="1mo", interval="1h")
-    data_with_indicators = add_technical_indicators(data)
-    data_with_indicators_formatted = format_as_text(data_with_indicators.dropna())
-    return data_with_indicators_formatted
+    return format_as_text(compute_technical_indicators(ticker), layout=layout or os.getenv('INDICATOR_TEXT_LAYOUT', 'legacy'))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,115 @@
+import numpy as np
+
+
+def average_true_range(high, low, close, length=14):
+    """Average true range of the last `length` bars (simple mean of the true ranges).
+
+    Args:
+        high (numpy.ndarray): High prices.
+        low (numpy.ndarray): Low prices.
+        close (numpy.ndarray): Close prices.
+        length (int): Number of bars.
+
+    Returns:
+        float: The ATR, or NaN with fewer than `length + 1` bars.
+    """
+    if len(close) < length + 1:
+        return float("nan")
+    high, low, previous_close = high[-length:], low[-length:], close[-length - 1:-1]
+    true_range = np.maximum(high - low, np.maximum(np.abs(high - previous_close), np.abs(low - previous_close)))
+    return float(true_range.mean())
+
+
+def price_move(high, low, close, reference, k=3.0, length=14):
+    """Fires if the last close moved more than `k` ATRs away from a reference price.
+
+    Args:
+        high (numpy.ndarray): High prices.
+        low (numpy.ndarray): Low prices.
+        close (numpy.ndarray): Close prices.
+        reference (float): The price to compare with, e.g. the close at the last evaluation.
+        k (float): The threshold in ATRs.
+        length (int): Number of bars of the ATR.
+
+    Returns:
+        str: The reason the trigger fired, or None.
+    """
+    atr = average_true_range(high, low, close, length)
+    if not np.isfinite(atr) or atr <= 0 or reference is None:
+        return None
+    move = close[-1] - reference
+    if abs(move) > k * atr:
+        return f"price moved {move:+.2f} ({abs(move) / atr:.1f} ATR) since {reference:.2f}"
+    return None
+
+
+def volume_spike(volume, z=3.0, length=30):
+    """Fires if the volume of the last bar has a z-score above `z` against the `length` bars before it.
+
+    Args:
+        volume (numpy.ndarray): Volumes.
+        z (float): The threshold of the z-score.
+        length (int): Number of bars of the baseline.
+
+    Returns:
+        str: The reason the trigger fired, or None.
+    """
+    if len(volume) < length + 1:
+        return None
+    baseline = volume[-length - 1:-1]
+    std = baseline.std()
+    if std <= 0:
+        return None
+    score = (volume[-1] - baseline.mean()) / std
+    return f"volume z-score {score:.1f}" if score > z else None
+
+
+def bollinger_breakout(close, length=20, std=2.0):
+    """Fires if the last close is outside the Bollinger bands of the last `length` closes.
+
+    Args:
+        close (numpy.ndarray): Close prices.
+        length (int): Number of bars of the bands.
+        std (float): Width of the bands in standard deviations.
+
+    Returns:
+        str: The reason the trigger fired, or None.
+    """
+    if len(close) < length:
+        return None
+    window = close[-length:]
+    middle, width = window.mean(), std * window.std()
+    if width <= 0:
+        return None
+    if close[-1] > middle + width:
+        return f"close {close[-1]:.2f} above the upper Bollinger band {middle + width:.2f}"
+    if close[-1] < middle - width:
+        return f"close {close[-1]:.2f} below the lower Bollinger band {middle - width:.2f}"
+    return None
+
+
+def evaluate_triggers(bars, reference, k_atr=3.0, volume_z=3.0, bollinger_std=2.0, forming=False):
+    """Evaluates all triggers on the minute bars of a ticker.
+
+    Args:
+        bars (pandas.DataFrame): OHLCV bars, oldest first.
+        reference (float): The price of the last evaluation for the ATR move trigger.
+        k_atr (float): Threshold of the price move in ATRs.
+        volume_z (float): Threshold of the volume z-score.
+        bollinger_std (float): Width of the Bollinger bands in standard deviations.
+        forming (bool): True if the last bar is still forming. Its partial volume is not scored, the volume
+            trigger looks at the last complete bar instead.
+
+    Returns:
+        list[str]: The reasons of the triggers that fired.
+    """
+    high = bars['High'].to_numpy(dtype=float)
+    low = bars['Low'].to_numpy(dtype=float)
+    close = bars['Close'].to_numpy(dtype=float)
+    volume = bars['Volume'].to_numpy(dtype=float)
+    reasons = [
+        price_move(high, low, close, reference, k=k_atr),
+        volume_spike(volume[:-1] if forming else volume, z=volume_z),
+        bollinger_breakout(close, std=bollinger_std),
+    ]
+    return [reason for reason in reasons if reason]
@@ -1,71 +1,176 @@
+import os
 import json
-import re
+import time
+import signal
 import logging
+import argparse
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from agents.day_trader import DayTraderAgent
-from connector.email_bot import send_email
+from agents.financial_analyst import FinancialAnalystAgent
+from agents.utils import deadline
+from agents.utils.llm_cache import get_llm_cache
+from agents.utils.run_cache import run_cache
+from agents.utils.tracing import end_run, span, start_run
+from connector.article_cache import get_article_cache
+from connector.email_bot import proposal_subject
+from connector.outbox import get_outbox
 from datetime import datetime
 import pytz
 
 logging.basicConfig(level=logging.INFO)
 load_dotenv()
 MEZ = pytz.timezone('Europe/Berlin')
+DEFAULT_MAX_TICKER_WORKERS = 4
+# trading windows in MEZ as ((start hour, start minute), (end hour, end minute)), both inclusive
+TRADING_WINDOWS = [((8, 5), (8, 20)), ((15, 15), (15, 45)), ((20, 0), (20, 10))]
+DAEMON_POLL_SECONDS = 30
 
-def extract_json_from_string(string):
-    json_pattern = re.compile(r'```json(.*?)```', re.DOTALL)
-    json_match = json_pattern.search(string)
-    if json_match:
-        json_str = json_match.group(1).strip()
-        json_ = json.loads(json_str)
-
-        formatted_action = f"**Action:** {json_['action']} \n\n Certificate Type: {json_['buy_type']} \n\n **Amount**: {json_['amount']} \n\n **Rechecking process in seconds**: {json_['look_back_in_seconds']} \n\n **Reason of Decision:** {json_['reason_of_decision']}"
-        if json_['buy_type'] == None:
-            return "hold", formatted_action
-        else:
-            return json_['buy_type'], formatted_action
-    return None, string
-
-def perform_ticker_evaluation():
-    """Perform ticker evaluation and send emails."""
-    logging.info("Ticker evaluation job started.")
-    with open('ticker_db.json') as f:
-        ticker_db = json.load(f)
-    tickers = ticker_db.keys()
-    
-    for ticker in tickers:
-        # for some reason we need to create the object in the loop. Weird error occurs even with retry exponential backoff; 
-        day_trader = DayTraderAgent()
-        user_desire = "My goal is to day trade"
-        action, context = day_trader.generate_day_trading_action(ticker, user_message=user_desire)
+def evaluate_ticker(ticker, user_desire="My goal is to day trade", run_id=None):
+    """Evaluate a single ticker and queue the proposal email (or add it to the digest if `EMAIL_DIGEST=1`).
+
+    Args:
+        ticker (str): The stock ticker to evaluate.
+        user_desire (str): The trading goal passed to the Day Trader Agent.
+        run_id (str): The id of the evaluation run, used to send every proposal only once.
+    """
+    # for some reason we need to create the object per ticker. Weird error occurs even with retry exponential backoff; 
+    day_trader = DayTraderAgent()
+    action, context = day_trader.generate_day_trading_action(ticker, user_message=user_desire)
+    try:
         summary = day_trader.generate_summary_of_evaluation(ticker, context)
+    except Exception as e:
+        # the summary is optional, the decision is sent without it rather than not at all
+        if not deadline.is_timeout(e):
+            raise
+        logging.warning(f"Summary of {ticker} did not finish in time ({e}).")
+        summary = "Summary unavailable: it could not be generated in time."
+    try:
+        decision = day_trader.parse_decision(action)
+        proposal = decision.action
+        output_text = f"{decision.format()} \n\n\n Summary of the data I used: {summary} \n\n\n Here is the data I used to support my decision in detail: \n {context}"
+    except Exception:
+        logging.exception(f"The decision of {ticker} could not be parsed.")
+        proposal = "Unknown"
+        output_text = f"{action} \n\n\n Summary of the data I used: {summary} \n\n\n Here is the data I used to support my decision in detail: \n {context}"
+    run_id = run_id or datetime.now(MEZ).isoformat()
+    if os.getenv('EMAIL_DIGEST', '0') == '1':
+        # stored in the outbox and sent as one email by `perform_ticker_evaluation` once all tickers are evaluated
+        get_outbox().add_to_digest(run_id, ticker, proposal, output_text)
+    else:
+        # delivered by the outbox's sender thread, so the evaluation does not wait for the mail server
+        get_outbox().enqueue(run_id, ticker, proposal_subject(ticker, proposal), output_text)
+
+def _timed_evaluation(ticker, run_id=None):
+    """Run `evaluate_ticker` within `TICKER_DEADLINE` seconds and capture its duration and outcome, so one
+    failing or hanging ticker never aborts or holds up the others."""
+    start = time.perf_counter()
+    try:
+        with span("ticker", kind="ticker", ticker=ticker), deadline.within(float(os.getenv('TICKER_DEADLINE', 180))):
+            evaluate_ticker(ticker, run_id=run_id)
+        status, error = "ok", None
+    except Exception as e:
+        logging.exception(f"Evaluation of {ticker} failed.")
+        status, error = "failed", str(e)
+    return {"ticker": ticker, "status": status, "seconds": time.perf_counter() - start, "error": error}
+
+def log_timing_report(results, total_seconds):
+    """Log a per-ticker timing report of the evaluation run.
+
+    Args:
+        results (list[dict]): Results as returned by `_timed_evaluation`.
+        total_seconds (float): Wall time of the whole run.
+    """
+    lines = [f"{'Ticker':<10}{'Status':<10}{'Seconds':>10}"]
+    for result in sorted(results, key=lambda r: r["seconds"], reverse=True):
+        line = f"{result['ticker']:<10}{result['status']:<10}{result['seconds']:>10.1f}"
+        if result["error"]:
+            line += f"  {result['error']}"
+        lines.append(line)
+    lines.append(f"{'Total':<20}{total_seconds:>10.1f}")
+    logging.info("Ticker timing report:\n" + "\n".join(lines))
+
+def perform_ticker_evaluation(max_workers=None, tickers=None):
+    """Perform ticker evaluation and send emails.
+
+    Tickers are evaluated concurrently in a bounded thread pool, as every evaluation is dominated by
+    I/O (scraping, market data and LLM calls).
+
+    Args:
+        max_workers (int): Number of tickers evaluated in parallel. Defaults to the `MAX_TICKER_WORKERS`
+            environment variable (or 4). Use 1 for the sequential behaviour.
+        tickers (list[str]): The tickers to evaluate. Defaults to all tickers of `ticker_db.json`.
+    """
+    run_id = datetime.now(MEZ).strftime('%Y-%m-%dT%H:%M:%S')
+    logging.info(f"Ticker evaluation job {run_id} started.")
+    # spans of this run are written to TRACE_DIR/<run_id>.jsonl and summarized at the end
+    trace_run = start_run(run_id)
+    try:
+        # delivers emails left over from earlier runs while this run evaluates
+        outbox = get_outbox()
+        # digests of earlier runs that did not finish
+        outbox.release_digests()
+        # ticker-independent evaluations (e.g. the general market news) are shared by all tickers of this run
+        run_cache.clear()
+        if tickers is None:
+            with open('ticker_db.json') as f:
+                tickers = list(json.load(f).keys())
+        if max_workers is None:
+            max_workers = int(os.getenv('MAX_TICKER_WORKERS', DEFAULT_MAX_TICKER_WORKERS))
+        max_workers = max(1, min(max_workers, len(tickers) or 1))
+
+        start = time.perf_counter()
         try:
-            proposal, formatted_action = extract_json_from_string(action)
-            output_text = f"{formatted_action} \n\n\n Summary of the data I used: {summary} \n\n\n Here is the data I used to support my decision in detail: \n {context}"
-            send_email(body=output_text, ticker=ticker, proposal=proposal)
-        except:
-            output_text = f"{action} \n\n\n Summary of the data I used: {summary} \n\n\n Here is the data I used to support my decision in detail: \n {context}"
-            send_email(body=output_text, ticker=ticker, proposal="Unknown")
+            # a few grouped downloads for the whole universe instead of several requests per ticker.
+            # Imported here, so runs outside the trading windows do not load pandas and yfinance.
+            from connector.market_data import prefetch_market_data
+            prefetch_market_data(tickers)
+        except Exception:
+            logging.exception("Prefetching market data failed. Tickers fetch their bars individually.")
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="techindicator") as batch_executor, \
+                ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ticker") as executor:
+            if os.getenv('TECH_ANALYSIS_BATCH', '1') == '1':
+                # one request per batch of tickers instead of one per ticker, shared through the run cache. The batches
+                # run next to the ticker evaluations, which only wait for the batch of their own ticker.
+                FinancialAnalystAgent().precompute_technical_indicator_analyses(tickers, executor=batch_executor)
+            # every ticker runs in its own copy of this context, so its spans belong to this run
+            futures = [executor.submit(contextvars.copy_context().run, _timed_evaluation, ticker, run_id) for ticker in tickers]
+            results = [future.result() for future in futures]
+        outbox.release_digests(run_id)
+        log_timing_report(results, time.perf_counter() - start)
+        if not outbox.flush(timeout=float(os.getenv('OUTBOX_FLUSH_TIMEOUT', 60))):
+            logging.warning(f"{outbox.pending()} emails are still pending and will be retried by the next run.")
+        logging.info(f"Article cache: {get_article_cache().stats()}")
+        logging.info(f"LLM cache: {get_llm_cache().stats()}")
+    finally:
+        end_run(trace_run)
     logging.info("Ticker evaluation job completed.")
+    return results
 
 def is_weekday():
     today = datetime.now(MEZ).weekday()  # Monday is 0, Sunday is 6
     return 0 <= today <= 4
 
+def current_trading_window(now=None):
+    """Return the trading window that contains the given time.
+
+    Args:
+        now (datetime): The time to check. Defaults to the current time in MEZ.
+
+    Returns:
+        int: The index of the window in `TRADING_WINDOWS`, or None outside of all windows.
+    """
+    now = now or datetime.now(MEZ)
+    for index, (start, end) in enumerate(TRADING_WINDOWS):
+        if start <= (now.hour, now.minute) <= end:
+            return index
+    return None
+
 def is_time_to_trade():
-    now = datetime.now(MEZ)
-    # between 08:05 and 8:20
-    if now.hour == 8 and 5 <= now.minute <= 20:
-        return True
-    # else between 15:15 and 15:45
-    if now.hour == 15 and 15 <= now.minute <= 45:
-        return True
-    # else between 20:00 and 20:10
-    if now.hour == 20 and 0 <= now.minute <= 10:
-        return True
-    ### TODO DELETE THIS only for testing!
-    else:
-        return True
-    return False
+    # between 08:05 and 8:20, between 15:15 and 15:45 or between 20:00 and 20:10
+    return current_trading_window() is not None
 
 def run_day_trading():
     if is_weekday() and is_time_to_trade():
@@ -73,5 +178,145 @@ def run_day_trading():
     else:
         logging.info("No action required.")
 
+def heartbeat_path():
+    return os.getenv('HEARTBEAT_FILE', os.path.join(os.getenv('CACHE_DIR', '.cache'), 'heartbeat.json'))
+
+def write_heartbeat(state):
+    """Write the daemon state to the heartbeat file, so a process supervisor can check that the daemon is alive.
+
+    Args:
+        state (dict): The daemon state (e.g. the last run and its outcome).
+    """
+    path = heartbeat_path()
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({**state, "pid": os.getpid(), "heartbeat": time.time()}, f)
+    os.replace(tmp_path, path)
+
+def check_heartbeat(max_age=None, max_run=None):
+    """Check that the heartbeat file of a daemon is fresh and that its current run is not hung, e.g. for a
+    container health check.
+
+    The heartbeat thread keeps writing while a run hangs, so a run that is still going on after `max_run`
+    seconds makes the check fail as well.
+
+    Args:
+        max_age (float): Maximum age of the heartbeat in seconds. Defaults to `HEARTBEAT_MAX_AGE` (or 300).
+        max_run (float): Maximum duration of a run in seconds. Defaults to `HEARTBEAT_MAX_RUN` (or 3600).
+
+    Returns:
+        bool: True if the daemon wrote a heartbeat recently and is not stuck in a run.
+    """
+    max_age = max_age or float(os.getenv('HEARTBEAT_MAX_AGE', 300))
+    max_run = max_run or float(os.getenv('HEARTBEAT_MAX_RUN', 3600))
+    try:
+        with open(heartbeat_path()) as f:
+            heartbeat = json.load(f)
+        now = time.time()
+        if heartbeat.get("running") and now - (heartbeat.get("last_run") or 0) > max_run:
+            return False
+        return now - heartbeat["heartbeat"] <= max_age
+    except (OSError, ValueError, KeyError, TypeError):
+        return False
+
+def run_daemon():
+    """Stay resident and evaluate the tickers once per trading window on weekdays.
+
+    Unlike a scheduler invocation per run, the OpenAI client, browser sessions, SMTP connection and caches stay
+    warm between runs. The heartbeat file is refreshed every `DAEMON_POLL_SECONDS`, also while a run is going on;
+    it records when the current run started, so `check_heartbeat` detects a hung run.
+    The daemon stops after the current run on SIGTERM or SIGINT.
+    """
+    import schedule
+    from connector.browser_pool import get_driver_path
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    state = {"started": time.time(), "last_run": None, "last_window": None, "last_status": None, "running": False}
+
+    def run_in_window():
+        window = current_trading_window()
+        key = f"{datetime.now(MEZ):%Y-%m-%d}/{window}"
+        if not is_weekday() or window is None or state["last_window"] == key:
+            return
+        state.update(running=True, last_window=key, last_run=time.time())
+        try:
+            results = perform_ticker_evaluation()
+            failed = sum(result["status"] != "ok" for result in results)
+            state["last_status"] = f"{len(results) - failed} ok, {failed} failed"
+        except Exception as e:
+            logging.exception("Ticker evaluation job failed.")
+            state["last_status"] = f"failed: {e}"
+        finally:
+            state["running"] = False
+
+    def beat():
+        while not stop.is_set():
+            write_heartbeat(state)
+            stop.wait(DAEMON_POLL_SECONDS)
+
+    try:
+        # resolved once up front instead of on the first article of the first run
+        get_driver_path()
+    except Exception:
+        logging.exception("Resolving the ChromeDriver failed. It is retried on first use.")
+    threading.Thread(target=beat, name="heartbeat", daemon=True).start()
+    schedule.every(DAEMON_POLL_SECONDS).seconds.do(run_in_window)
+    logging.info(f"Daemon started. Trading windows (MEZ): {TRADING_WINDOWS}")
+    run_in_window()
+    while not stop.is_set():
+        schedule.run_pending()
+        stop.wait(1)
+    logging.info("Daemon stopped.")
+
+def run_watcher():
+    """Stay resident and evaluate only the tickers whose intraday price or volume triggers fire while the US
+    market is open (see `watcher.MarketWatcher`), instead of all tickers once per trading window.
+
+    The heartbeat file is refreshed like in daemon mode. The watcher stops after the current poll and
+    the evaluations it started on SIGTERM or SIGINT.
+    """
+    from watcher import create_watcher
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    state = {"started": time.time(), "last_run": None, "last_tickers": None, "last_status": None, "running": False}
+
+    def evaluate(tickers):
+        state.update(running=True, last_run=time.time(), last_tickers=tickers)
+        try:
+            results = perform_ticker_evaluation(tickers=tickers)
+            failed = sum(result["status"] != "ok" for result in results)
+            state["last_status"] = f"{len(results) - failed} ok, {failed} failed"
+        finally:
+            state["running"] = False
+
+    def beat():
+        while not stop.is_set():
+            write_heartbeat(state)
+            stop.wait(DAEMON_POLL_SECONDS)
+
+    with open('ticker_db.json') as f:
+        tickers = list(json.load(f).keys())
+    threading.Thread(target=beat, name="heartbeat", daemon=True).start()
+    create_watcher(tickers, evaluate).run(stop)
+    logging.info("Watcher stopped.")
+
 if __name__ == "__main__":
-    run_day_trading()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Evaluate the tickers of ticker_db.json and email the proposals.")
+    parser.add_argument("--daemon", action="store_true", help="stay resident and run once per trading window")
+    parser.add_argument("--watch", action="store_true",
+                        help="stay resident and evaluate tickers when their intraday price or volume triggers fire")
+    parser.add_argument("--healthcheck", action="store_true", help="exit with 1 if the daemon's heartbeat is stale")
+    args = parser.parse_args()
+    if args.healthcheck:
+        raise SystemExit(0 if check_heartbeat() else 1)
+    if args.watch:
+        run_watcher()
+    elif args.daemon:
+        run_daemon()
+    else:
+        run_day_trading()
\ No newline at end of file
@@ -0,0 +1,117 @@
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.day_trader import DayTraderAgent
+from agents.utils import deadline
+from connector.email_bot import proposal_subject
+from connector.outbox import get_outbox
+
+# stages of `DayTraderAgent.generate_day_trading_action` in display order
+STAGES = ["bing_eval", "general_news_eval", "stock_news_eval", "techindicator_analysis_eval", "user_data", "stock_data", "decision"]
+STAGE_LABELS = {
+    "bing_eval": "Web search evaluation",
+    "general_news_eval": "Market news evaluation",
+    "stock_news_eval": "Stock news evaluation",
+    "techindicator_analysis_eval": "Technical indicator analysis",
+    "user_data": "User data",
+    "stock_data": "Stock data",
+    "decision": "Trading decision",
+}
+
+
+class TickerJob:
+    """The progress of one ticker evaluation, written by its worker thread and read by the app."""
+    def __init__(self, ticker, run_id):
+        """
+        Args:
+            ticker (str): The stock ticker to evaluate.
+            run_id (str): The id of the run the job belongs to.
+        """
+        self.ticker = ticker
+        self.run_id = run_id
+        self.completed_stages = []
+        self.decision = ""
+        self.error = None
+        self.done = False
+        self.started = time.time()
+        self.finished = None
+
+    @property
+    def progress(self):
+        """float: The share of completed stages."""
+        return len(self.completed_stages) / len(STAGES)
+
+    @property
+    def status(self):
+        """str: A one-line status of the job."""
+        if self.error:
+            return f"failed: {self.error}"
+        if self.done:
+            return f"done in {self.finished - self.started:.0f}s"
+        if self.decision:
+            return "writing the decision"
+        running = [STAGE_LABELS[stage] for stage in STAGES[:-1] if stage not in self.completed_stages]
+        return "waiting for: " + ", ".join(running) if running else "deciding"
+
+
+class JobRunner:
+    """Runs ticker evaluations of the Streamlit app in background threads, so the script thread only renders
+    their progress and a rerun of the script does not interrupt them."""
+    def __init__(self, client=None, max_workers=4):
+        """
+        Args:
+            client (openai.OpenAI): The OpenAI client shared by all jobs. Defaults to the shared client.
+            max_workers (int): Number of tickers evaluated in parallel.
+        """
+        self.client = client
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="app-ticker")
+
+    def _run(self, job, message):
+        def on_stage(name, _):
+            job.completed_stages.append(name)
+
+        def on_stream(text):
+            job.decision = text
+
+        try:
+            # every job gets its own agent, as the news fetcher of the Financial Analyst Agent keeps per-ticker state
+            day_trader = DayTraderAgent(client=self.client)
+            with deadline.within(float(os.getenv('TICKER_DEADLINE', 180))):
+                action, context = day_trader.generate_day_trading_action(job.ticker, user_message=message,
+                                                                              on_stage=on_stage, on_stream=on_stream)
+            job.completed_stages.append("decision")
+            try:
+                decision = day_trader.parse_decision(action)
+                proposal = decision.action
+                # the streamed JSON is replaced by the readable decision
+                job.decision = decision.format()
+                output_text = f"{job.decision} \n\n\n Here is the data I used to support my decision: \n {context}"
+            except Exception:
+                logging.exception(f"The decision of {job.ticker} could not be parsed.")
+                proposal = "Unknown"
+                output_text = f"{action} \n\n\n Here is the data I used to support my decision: \n{context}"
+            get_outbox().enqueue(job.run_id, job.ticker, proposal_subject(job.ticker, proposal), output_text)
+        except Exception as e:
+            logging.exception(f"Evaluation of {job.ticker} failed.")
+            job.error = str(e)
+        finally:
+            job.finished = time.time()
+            job.done = True
+
+    def submit(self, tickers, message, run_id):
+        """Starts the evaluation of the tickers.
+
+        Args:
+            tickers (list[str]): The stock tickers to evaluate.
+            message (str): The trading goal of the user.
+            run_id (str): The id of the run, used to send every proposal only once.
+
+        Returns:
+            list[TickerJob]: One job per ticker.
+        """
+        jobs = [TickerJob(ticker, run_id) for ticker in tickers]
+        for job in jobs:
+            self._executor.submit(self._run, job, message)
+        return jobs
@@ -0,0 +1,155 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import pytz
+
+from connector.triggers import evaluate_triggers
+
+NEW_YORK = pytz.timezone('America/New_York')
+# minute bars the triggers look at (enough for a 30-bar volume baseline and the 20-bar Bollinger bands)
+LOOKBACK = timedelta(hours=2)
+BAR_LENGTH = timedelta(minutes=1)
+
+
+def is_us_market_open(now=None):
+    """Returns True during the regular NYSE session (9:30 to 16:00 New York time on weekdays)."""
+    now = (now or datetime.now(timezone.utc)).astimezone(NEW_YORK)
+    return now.weekday() < 5 and (9, 30) <= (now.hour, now.minute) < (16, 0)
+
+
+class _TickerState:
+    def __init__(self):
+        self.reference = None
+        self.last_bar = None
+        self.last_evaluated = None
+
+
+class MarketWatcher:
+    """Polls the minute bars of a ticker universe and starts evaluations only for tickers whose cheap NumPy
+    triggers fire: a price move of more than k ATRs since the last evaluation, a volume z-score spike or a
+    Bollinger band breakout.
+
+    Every poll downloads only the new minute bars of the whole universe in one grouped request. Evaluations run
+    one after another in a background thread, so polling goes on meanwhile; tickers waiting for or in an
+    evaluation are not checked. A ticker is re-evaluated at most once per `cooldown` seconds after its last
+    evaluation finished.
+    """
+    def __init__(self, tickers, evaluate, poll_seconds=60, cooldown=30 * 60, k_atr=3.0, volume_z=3.0, bollinger_std=2.5):
+        """
+        Args:
+            tickers (list[str]): The stock tickers to watch.
+            evaluate (callable): Called with the list of tickers whose triggers fired.
+            poll_seconds (float): Seconds between two polls.
+            cooldown (float): Minimum seconds between two evaluations of a ticker.
+            k_atr (float): Threshold of the price move trigger in ATRs of the minute bars.
+            volume_z (float): Threshold of the volume z-score trigger.
+            bollinger_std (float): Width of the Bollinger bands of the breakout trigger in standard deviations.
+        """
+        self.tickers = list(tickers)
+        self.evaluate = evaluate
+        self.poll_seconds = poll_seconds
+        self.cooldown = cooldown
+        self.k_atr = k_atr
+        self.volume_z = volume_z
+        self.bollinger_std = bollinger_std
+        self.states = {ticker: _TickerState() for ticker in self.tickers}
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def poll(self):
+        """Fetches the new minute bars and evaluates the triggers of every ticker.
+
+        Returns:
+            dict: Maps every ticker whose trigger fired (and whose cooldown is over) to the reasons.
+        """
+        from connector.bar_store import get_bar_store
+        from connector.market_data import prefetch_market_data
+        prefetch_market_data(self.tickers, intervals=(("1m", "1d"),))
+        bar_store = get_bar_store()
+        utc_now = datetime.now(timezone.utc)
+        start = utc_now - LOOKBACK
+        now = time.time()
+        with self._lock:
+            pending = set(self._pending)
+        fired = {}
+        for ticker, state in self.states.items():
+            if ticker in pending:
+                continue
+            bars = bar_store.load(ticker, "1m", start=start)
+            if bars.empty or bars.index[-1] == state.last_bar:
+                continue
+            state.last_bar = bars.index[-1]
+            if state.reference is None:
+                # the first poll only sets the reference price
+                state.reference = float(bars['Close'].iloc[-1])
+                continue
+            reasons = evaluate_triggers(bars, state.reference, k_atr=self.k_atr, volume_z=self.volume_z,
+                                        bollinger_std=self.bollinger_std,
+                                        forming=bars.index[-1] + BAR_LENGTH > utc_now)
+            if not reasons:
+                continue
+            if state.last_evaluated is not None and now - state.last_evaluated < self.cooldown:
+                logging.info(f"Trigger of {ticker} ignored during its cooldown: {'; '.join(reasons)}")
+                continue
+            fired[ticker] = reasons
+        return fired
+
+    def _evaluate(self, tickers):
+        try:
+            self.evaluate(tickers)
+        except Exception:
+            logging.exception("Evaluation of the triggered tickers failed.")
+        finally:
+            now = time.time()
+            for ticker in tickers:
+                state = self.states[ticker]
+                state.last_evaluated = now
+                state.reference = None
+            with self._lock:
+                self._pending.difference_update(tickers)
+
+    def run(self, stop):
+        """Polls while the US market is open until `stop` is set.
+
+        Args:
+            stop (threading.Event): Stops the watcher after the current poll and the running or queued evaluations.
+        """
+        logging.info(f"Watching {len(self.tickers)} tickers every {self.poll_seconds:.0f}s.")
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="watch-evaluation") as executor:
+            while not stop.is_set():
+                if is_us_market_open():
+                    try:
+                        fired = self.poll()
+                    except Exception:
+                        logging.exception("Polling the minute bars failed.")
+                        fired = {}
+                    if fired:
+                        for ticker, reasons in fired.items():
+                            logging.info(f"Trigger of {ticker} fired: {'; '.join(reasons)}")
+                        with self._lock:
+                            self._pending.update(fired)
+                        executor.submit(self._evaluate, list(fired))
+                stop.wait(self.poll_seconds)
+
+
+def create_watcher(tickers, evaluate):
+    """Creates a watcher configured by `WATCH_POLL_SECONDS`, `WATCH_COOLDOWN`, `WATCH_K_ATR`, `WATCH_VOLUME_Z`
+    and `WATCH_BOLLINGER_STD`.
+
+    Args:
+        tickers (list[str]): The stock tickers to watch.
+        evaluate (callable): Called with the list of tickers whose triggers fired.
+
+    Returns:
+        MarketWatcher: The watcher.
+    """
+    return MarketWatcher(tickers, evaluate,
+                         poll_seconds=float(os.getenv('WATCH_POLL_SECONDS', 60)),
+                         cooldown=float(os.getenv('WATCH_COOLDOWN', 30 * 60)),
+                         k_atr=float(os.getenv('WATCH_K_ATR', 3.0)),
+                         volume_z=float(os.getenv('WATCH_VOLUME_Z', 3.0)),
+                         bollinger_std=float(os.getenv('WATCH_BOLLINGER_STD', 2.5)))
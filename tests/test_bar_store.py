@@ -0,0 +1,153 @@
+import sys
+import time
+import types
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import contextvars
+
+from connector.bar_store import BarStore, mark_prefetched
+
+
+def make_bars(start, periods, freq="1D", tz="America/New_York"):
+    index = pd.date_range(start, periods=periods, freq=freq, tz=tz)
+    close = np.arange(periods, dtype=float) + 100
+    return pd.DataFrame({"Open": close - 0.5, "High": close + 1, "Low": close - 1, "Close": close,
+                         "Volume": np.full(periods, 1000.0)}, index=index)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BarStore(path=str(tmp_path / "bars.sqlite"))
+
+
+def test_upsert_load_round_trip(store):
+    bars = make_bars("2024-03-04 09:30", 5, freq="1min")
+    store.upsert("AAPL", "5m", bars)
+    loaded = store.load("AAPL", "5m")
+    assert str(loaded.index.tz) == "America/New_York"
+    assert loaded.index.name == "Datetime"
+    pd.testing.assert_frame_equal(loaded, bars, check_freq=False, check_names=False)
+
+
+def test_load_slices_and_sees_new_bars(store):
+    bars = make_bars("2024-03-04 09:30", 10, freq="1min")
+    store.upsert("AAPL", "5m", bars.iloc[:6])
+    sliced = store.load("AAPL", "5m", start=bars.index[2], end=bars.index[5])
+    assert list(sliced.index) == list(bars.index[2:5])
+    # overlapping upserts replace the incomplete last bar and invalidate the in-memory frame
+    revised = bars.iloc[5:].copy()
+    revised.iloc[0, revised.columns.get_loc("Close")] = 42.0
+    store.upsert("AAPL", "5m", revised)
+    loaded = store.load("AAPL", "5m")
+    assert len(loaded) == 10
+    assert loaded["Close"].iloc[5] == 42.0
+    assert store.last_timestamp("AAPL", "5m") == bars.index[-1].to_pydatetime().astimezone(timezone.utc)
+
+
+def test_load_unknown_series_is_empty(store):
+    assert store.load("MSFT", "1d").empty
+
+
+@pytest.fixture
+def fake_yfinance(monkeypatch):
+    calls = []
+
+    class FakeTicker:
+        def __init__(self, ticker):
+            self.ticker = ticker
+
+        def history(self, start, end, interval):
+            calls.append(start)
+            return make_bars(pd.Timestamp(start).tz_convert("America/New_York").normalize().tz_localize(None), 3)
+
+    monkeypatch.setitem(sys.modules, "yfinance", types.SimpleNamespace(Ticker=FakeTicker))
+    return calls
+
+
+def test_refresh_backfills_older_ranges(store, fake_yfinance):
+    calls = fake_yfinance
+    now = datetime.now(timezone.utc)
+    store.upsert("AAPL", "1d", make_bars((now - timedelta(days=5)).replace(tzinfo=None), 3))
+
+    # the stored bars are fresh and cover the range: nothing is downloaded
+    store.refresh("AAPL", "1d", now - timedelta(days=6))
+    assert calls == []
+
+    # an older range than the stored one is downloaded from its start, not from the last stored bar
+    start = now - timedelta(days=30)
+    store.refresh("AAPL", "1d", start)
+    assert calls == [start]
+    assert store.load("AAPL", "1d").index[0] < now - timedelta(days=25)
+
+
+def test_refresh_downloads_unknown_series(store, fake_yfinance):
+    # nothing was prefetched and nothing is stored yet
+    store.refresh("AAPL", "1d", datetime.now(timezone.utc) - timedelta(days=3))
+    assert len(fake_yfinance) == 1
+    assert not store.load("AAPL", "1d").empty
+
+
+def test_prefetched_series_stay_fresh_in_their_context(store, fake_yfinance, monkeypatch):
+    start = datetime.now(timezone.utc) - timedelta(hours=1)
+    store.upsert("AAPL", "1m", make_bars(start.replace(tzinfo=None), 30, freq="1min"))
+    # the download is older than the refresh window of minute bars
+    monkeypatch.setattr(time, "time", lambda now=time.time(): now + 3600)
+
+    def evaluate():
+        store.refresh("AAPL", "1m", start)
+
+    mark_prefetched([("AAPL", "1m")])
+    contextvars.copy_context().run(evaluate)
+    assert fake_yfinance == []
+    mark_prefetched(())
+    evaluate()
+    assert len(fake_yfinance) == 1
+
+
+def test_download_start_resumes_at_the_last_bar(store):
+    now = datetime.now(timezone.utc)
+    needed = now - timedelta(days=1)
+    assert store.download_start("AAPL", "1m", needed) == needed
+
+    bars = make_bars((now - timedelta(hours=2)).replace(tzinfo=None, second=0, microsecond=0), 110, freq="1min", tz="UTC")
+    store.upsert("AAPL", "1m", bars)
+    assert store.download_start("AAPL", "1m", needed) == bars.index[-1].to_pydatetime()
+
+
+def test_download_start_of_a_halted_ticker_follows_the_last_download(store):
+    now = datetime.now(timezone.utc)
+    store.upsert("HALT", "1m", make_bars((now - timedelta(hours=6)).replace(tzinfo=None), 30, freq="1min", tz="UTC"))
+    # no bars arrived since, the series was downloaded again just now
+    store.upsert("HALT", "1m", pd.DataFrame(columns=["Close"]))
+    start = store.download_start("HALT", "1m", now - timedelta(days=1))
+    assert now - timedelta(minutes=16) < start < now - timedelta(minutes=14)
+
+
+def test_prefetch_groups_new_tickers_separately(store, monkeypatch):
+    from connector import market_data
+
+    downloads = []
+
+    def download(tickers, start, end, interval, **kwargs):
+        downloads.append((sorted(tickers), start))
+        index = pd.date_range(pd.Timestamp(start).floor("min"), pd.Timestamp.now(tz="UTC"), freq="1min")
+        bars = make_bars(index[0].tz_localize(None), len(index), freq="1min", tz="UTC")
+        return pd.concat({ticker: bars for ticker in tickers}, axis=1)
+
+    monkeypatch.setitem(sys.modules, "yfinance", types.SimpleNamespace(download=download))
+    monkeypatch.setattr(market_data, "get_bar_store", lambda: store)
+    now = datetime.now(timezone.utc)
+    recent = make_bars((now - timedelta(minutes=30)).replace(tzinfo=None, second=0, microsecond=0), 30, freq="1min", tz="UTC")
+    store.upsert("AAPL", "1m", recent)
+    store.upsert("MSFT", "1m", recent)
+
+    market_data.prefetch_market_data(["AAPL", "MSFT", "NEW"], intervals=(("1m", "1d"),))
+    incremental, full = sorted(downloads, key=lambda download: download[1], reverse=True)
+    # the ticker without bars does not make the others download the whole day again
+    assert incremental == (["AAPL", "MSFT"], recent.index[-1].to_pydatetime())
+    assert full[0] == ["NEW"] and full[1] < now - timedelta(hours=23)
+    assert not store.load("NEW", "1m").empty
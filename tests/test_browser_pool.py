@@ -0,0 +1,79 @@
+import sys
+import time
+import threading
+import types
+
+import pytest
+
+from agents.utils import deadline
+from agents.utils.deadline import DeadlineExceeded
+from connector.browser_pool import BrowserPool, _BrowserSession
+
+
+class FakeDriver:
+    current_url = "about:blank"
+
+    def __init__(self, load_seconds=0.0):
+        self.load_seconds = load_seconds
+        self.page_load_timeout = None
+        self.page_source = "<html><body>article</body></html>"
+
+    def set_page_load_timeout(self, seconds):
+        self.page_load_timeout = seconds
+
+    def get(self, url):
+        time.sleep(self.load_seconds)
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = BrowserPool(size=1, page_load_timeout=20)
+    monkeypatch.setattr(pool, "_create_session", lambda: _BrowserSession(FakeDriver()))
+    return pool
+
+
+def test_waiting_for_a_session_ends_at_the_deadline(pool):
+    with pool.borrow():
+        start = time.monotonic()
+        with deadline.within(0.1), pytest.raises(DeadlineExceeded):
+            with pool.borrow():
+                pass
+        assert time.monotonic() - start < 0.5
+    # the slot of the timed out wait was not taken
+    with pool.borrow():
+        pass
+
+
+def test_page_load_timeout_counts_the_wait_for_a_session(pool, monkeypatch):
+    # a stand-in for selenium, whose wait only has to see the body
+    wait = types.SimpleNamespace(WebDriverWait=lambda driver, seconds: types.SimpleNamespace(until=lambda condition: True))
+    modules = {
+        "selenium": types.ModuleType("selenium"),
+        "selenium.webdriver": types.ModuleType("selenium.webdriver"),
+        "selenium.webdriver.common": types.ModuleType("selenium.webdriver.common"),
+        "selenium.webdriver.common.by": types.SimpleNamespace(By=types.SimpleNamespace(TAG_NAME="tag name")),
+        "selenium.webdriver.support": types.SimpleNamespace(expected_conditions=types.SimpleNamespace(
+            presence_of_element_located=lambda locator: locator)),
+        "selenium.webdriver.support.ui": wait,
+    }
+    for name, module in modules.items():
+        monkeypatch.setitem(sys.modules, name, module)
+    driver = FakeDriver()
+    monkeypatch.setattr(pool, "_create_session", lambda: _BrowserSession(driver))
+    borrowed = threading.Event()
+
+    def busy():
+        with pool.borrow():
+            borrowed.set()
+            time.sleep(0.3)
+
+    other = threading.Thread(target=busy)
+    other.start()
+    borrowed.wait(1)
+    with deadline.within(1.0):
+        assert "article" in pool.get_page_source("https://example.com")
+    other.join()
+    assert driver.page_load_timeout < 0.8
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from agents.decision import Decision, DecisionError
+
+VALID = {"action": "buy", "go_in": "189.50", "go_out": "$192.00", "risk_level": "Medium",
+         "reason_of_decision": "Momentum above VWAP."}
+
+
+def test_structured_output_is_decoded():
+    decision = Decision.parse(json.dumps(VALID))
+    assert (decision.action, decision.go_in, decision.go_out, decision.risk_level) == ("buy", 189.5, 192.0, "medium")
+    assert decision.reason_of_decision == "Momentum above VWAP."
+
+
+def test_fenced_answer_with_comments_and_trailing_commas_is_repaired():
+    answer = '''Here is my decision:
+```json
+{
+    "action": "SELL", // take profits
+    "go_in": null,
+    "go_out": "1,234.5 USD",
+    "risk_level": "low",
+    "reason_of_decision": "Resistance at http://example.com//levels",
+}
+```'''
+    decision = Decision.parse(answer)
+    assert decision.action == "sell"
+    assert decision.go_in is None
+    assert decision.go_out == 1234.5
+    assert decision.reason_of_decision == "Resistance at http://example.com//levels"
+
+
+@pytest.mark.parametrize("value", [None, "null", "N/A", ""])
+def test_missing_prices_are_none(value):
+    assert Decision.from_dict({**VALID, "action": "hold", "go_in": value, "go_out": value}).go_in is None
+
+
+@pytest.mark.parametrize("answer", [
+    "I would hold.",
+    json.dumps({**VALID, "action": "short"}),
+    json.dumps({**VALID, "go_in": "soon"}),
+    json.dumps({**VALID, "reason_of_decision": " "}),
+    json.dumps({key: value for key, value in VALID.items() if key != "risk_level"}),
+    "{not json}",
+])
+def test_invalid_answers_raise(answer):
+    with pytest.raises(DecisionError):
+        Decision.parse(answer)
+
+
+def test_format_and_to_dict():
+    decision = Decision.parse(json.dumps({**VALID, "go_out": None}))
+    assert decision.to_dict()["go_out"] is None
+    assert "**Go in at:** $189.50" in decision.format()
+    assert "**Go out at:** -" in decision.format()
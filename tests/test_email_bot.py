@@ -0,0 +1,58 @@
+import socket
+from email.message import EmailMessage
+
+import pytest
+
+from benchmarks.fake_services import SMTPSink
+from connector.email_bot import Mailer
+
+
+def message(subject="test"):
+    em = EmailMessage()
+    em["From"], em["To"], em["Subject"] = "agent@localhost", "trader@localhost", subject
+    em.set_content("body")
+    return em
+
+
+@pytest.fixture
+def sink():
+    sink = SMTPSink().start()
+    yield sink
+    sink.close()
+
+
+@pytest.fixture
+def mailer(sink):
+    mailer = Mailer(host="127.0.0.1", port=sink.port, security="none", password="")
+    yield mailer
+    mailer.close()
+
+
+def test_emails_of_a_run_share_one_connection(sink, mailer):
+    for ticker in ("AAPL", "MSFT", "NVDA"):
+        assert mailer.send_proposal("**buy**", ticker, "buy")
+    assert sink.messages == 3
+    assert sink.connections == 1
+
+
+def test_dropped_connection_is_reopened(sink, mailer):
+    mailer.send_message(message())
+    # the connection dropped between two emails: noop fails and the mailer reconnects
+    mailer._server.sock.shutdown(socket.SHUT_RDWR)
+    mailer.send_message(message())
+    assert (sink.messages, sink.connections) == (2, 2)
+
+
+def test_send_is_retried_once_on_a_new_connection(sink, mailer, monkeypatch):
+    mailer.send_message(message())
+    # the connection looks alive but drops while sending
+    mailer._server.sock.shutdown(socket.SHUT_RDWR)
+    monkeypatch.setattr(mailer, "_is_connected", lambda: True)
+    mailer.send_message(message())
+    assert (sink.messages, sink.connections) == (2, 2)
+
+
+def test_failed_proposal_is_reported(mailer, monkeypatch):
+    monkeypatch.setattr(mailer, "port", 1)
+    mailer.close()
+    assert mailer.send_proposal("**buy**", "AAPL", "buy") is False
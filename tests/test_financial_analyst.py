@@ -0,0 +1,67 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from agents import financial_analyst
+from agents.financial_analyst import FinancialAnalystAgent, batch_response_format
+from agents.utils.run_cache import run_cache
+
+
+def test_batch_response_format_requires_every_ticker():
+    schema = batch_response_format(["AAPL", "BRK.B"])["json_schema"]
+    assert schema["strict"] is True
+    assert schema["schema"]["required"] == ["AAPL", "BRK.B"]
+    assert schema["schema"]["properties"]["BRK.B"] == {"type": "string"}
+    assert schema["schema"]["additionalProperties"] is False
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    agent = FinancialAnalystAgent.__new__(FinancialAnalystAgent)
+    agent.client = None
+    agent.TICKER_OVERVIEW_DB = {"AAPL": "Apple Inc.", "MSFT": "Microsoft Corporation"}
+    return agent
+
+
+@pytest.mark.parametrize("answer, expected", [
+    (json.dumps({"AAPL": "bullish", "MSFT": "bearish"}), {"AAPL": "bullish", "MSFT": "bearish"}),
+    (json.dumps({"AAPL": "bullish", "MSFT": " ", "NVDA": "extra"}), {"AAPL": "bullish"}),
+    ("not json", {}),
+    (json.dumps(["AAPL"]), {}),
+])
+def test_batch_answer_is_parsed_per_ticker(agent, monkeypatch, answer, expected):
+    requests = []
+
+    def create_chat_completion(client, model, messages, call_type, **params):
+        requests.append(params)
+        return answer
+
+    monkeypatch.setattr(financial_analyst, "create_chat_completion", create_chat_completion)
+    assert agent._generate_technical_indicator_batch({"AAPL": "table", "MSFT": "table"}) == expected
+    assert requests[0]["response_format"] == batch_response_format(["AAPL", "MSFT"])
+
+
+def test_ticker_waits_for_its_batch_and_falls_back_without_it(agent, monkeypatch):
+    monkeypatch.setattr(agent, "_generate_technical_indicator_analysis", lambda ticker: f"individual {ticker}")
+    monkeypatch.setattr(agent, "_precompute_technical_indicator_analyses", lambda futures: None)
+    futures = agent.precompute_technical_indicator_analyses(["AAPL", "MSFT"], executor=ThreadPoolExecutor(1))
+    threading.Timer(0.05, futures["AAPL"].set_result, ["batched AAPL"]).start()
+    futures["MSFT"].set_result(None)
+    try:
+        assert agent.generate_technical_indicator_analysis("AAPL") == "batched AAPL"
+        assert agent.generate_technical_indicator_analysis("MSFT") == "individual MSFT"
+    finally:
+        run_cache.clear()
+
+
+def test_precompute_resolves_every_future_when_it_fails(agent, monkeypatch):
+    from connector import technical_indicators
+    monkeypatch.setattr(technical_indicators, "fetch_technical_indicators_of_ticker", lambda ticker, layout: "table")
+    monkeypatch.setattr(financial_analyst, "pack_batches", lambda *args: 1 / 0)
+    try:
+        futures = agent.precompute_technical_indicator_analyses(["AAPL", "MSFT"])
+        assert all(future.done() and future.result() is None for future in futures.values())
+    finally:
+        run_cache.clear()
@@ -0,0 +1,267 @@
+import time
+import threading
+import types
+
+import pytest
+
+from agents.utils import deadline
+from agents.utils.deadline import DeadlineExceeded
+from agents.utils.governor import (AIMDLimiter, CallGovernor, CircuitBreaker, CircuitOpenError, TokenBucket,
+                                   _duration_seconds, classify_error, retry_after)
+
+
+class APIError(Exception):
+    def __init__(self, message="error", status_code=None, code=None, headers=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code
+        self.response = types.SimpleNamespace(headers=headers or {})
+
+
+class APITimeoutError(Exception):
+    pass
+
+
+@pytest.mark.parametrize("error, expected", [
+    (APIError(status_code=429), "rate_limit"),
+    (APIError(status_code=400, code="context_length_exceeded"), "context_length"),
+    (APIError("This model's maximum context length is 128000 tokens", status_code=400), "context_length"),
+    (APIError(status_code=500), "server"),
+    (APIError(status_code=503), "server"),
+    (APIError(status_code=408), "server"),
+    (APIError(status_code=401), "client"),
+    (APITimeoutError("timed out"), "connection"),
+    (ConnectionError("reset"), "connection"),
+    (ValueError("bad"), "unknown"),
+])
+def test_classify_error(error, expected):
+    assert classify_error(error) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("0.5", 0.5), ("1s", 1.0), ("20ms", 0.02), ("6m0s", 360.0), ("1h2m3s", 3723.0),
+])
+def test_duration_seconds(value, expected):
+    assert _duration_seconds(value) == pytest.approx(expected)
+
+
+def test_duration_seconds_rejects_other_text():
+    assert _duration_seconds("soon") is None
+
+
+def test_retry_after_prefers_milliseconds_then_seconds_then_resets():
+    assert retry_after(APIError(headers={"retry-after-ms": "1500", "retry-after": "9"})) == pytest.approx(1.5)
+    assert retry_after(APIError(headers={"retry-after": "2"})) == 2.0
+    assert retry_after(APIError(headers={"x-ratelimit-reset-requests": "1s", "x-ratelimit-reset-tokens": "6m0s"})) == 360.0
+    assert retry_after(APIError()) is None
+    assert retry_after(ValueError()) is None
+
+
+def test_retry_after_http_date():
+    date = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(time.time() + 30))
+    assert 25 <= retry_after(APIError(headers={"retry-after": date})) <= 31
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(rate_per_minute=600, capacity=1)
+    assert bucket.acquire() == 0.0
+    assert 0.05 <= bucket.acquire() <= 0.2
+
+
+def test_token_bucket_without_rate_never_waits():
+    bucket = TokenBucket(0)
+    assert all(bucket.acquire(10 ** 6) == 0.0 for _ in range(3))
+
+
+def test_token_bucket_times_out():
+    bucket = TokenBucket(rate_per_minute=1, capacity=1)
+    bucket.acquire()
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        bucket.acquire(timeout=0.1)
+    assert time.monotonic() - start < 0.5
+
+
+def test_token_bucket_adjust():
+    bucket = TokenBucket(rate_per_minute=60, capacity=10)
+    bucket.adjust(-15)
+    assert bucket.tokens <= -4.9
+    bucket.adjust(100)
+    assert bucket.tokens == 10
+
+
+def test_circuit_breaker_opens_and_recovers():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.05)
+    assert breaker.allow() == "call"
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.allow() is None
+    time.sleep(0.06)
+    assert breaker.allow() == "trial"
+    # only one trial call at a time
+    assert breaker.allow() is None
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow() == "call"
+
+
+def test_circuit_breaker_failed_trial_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow() == "trial"
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_circuit_breaker_released_trial_lets_the_next_call_try():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow() == "trial"
+    breaker.release_trial()
+    assert breaker.allow() == "trial"
+
+
+def test_aimd_limiter_grows_and_halves():
+    limiter = AIMDLimiter(initial=4, maximum=8)
+    limiter.acquire()
+    limiter.release()
+    assert limiter.limit == pytest.approx(4.25)
+    limiter.acquire()
+    limiter.release(rate_limited=True)
+    assert limiter.limit == pytest.approx(2.125)
+    limiter.acquire()
+    limiter.release(adjust=False)
+    assert limiter.limit == pytest.approx(2.125)
+    assert limiter.in_flight == 0
+
+
+def test_aimd_limiter_waits_for_a_slot_and_times_out():
+    limiter = AIMDLimiter(initial=1)
+    limiter.acquire()
+    with pytest.raises(DeadlineExceeded):
+        limiter.acquire(timeout=0.05)
+    threading.Timer(0.05, limiter.release).start()
+    assert limiter.acquire(timeout=1) >= 0.04
+
+
+def raising(error):
+    def call():
+        raise error
+    return call
+
+
+def governor(**kwargs):
+    kwargs.setdefault("base_delay", 0.001)
+    return CallGovernor("test", **kwargs)
+
+
+def test_governor_retries_transient_errors():
+    errors = [APIError(status_code=429, headers={"retry-after-ms": "1"}), APIError(status_code=502)]
+
+    def call():
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    assert governor(max_retries=2).call(call) == "ok"
+
+
+def test_governor_raises_permanent_errors_at_once():
+    calls = []
+
+    def call():
+        calls.append(1)
+        raise APIError(status_code=400, code="context_length_exceeded")
+
+    with pytest.raises(APIError):
+        governor(max_retries=3).call(call)
+    assert len(calls) == 1
+
+
+def test_governor_opens_the_breaker():
+    g = governor(max_retries=0, failure_threshold=2, reset_seconds=60)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            g.call(raising(ConnectionError("down")))
+    with pytest.raises(CircuitOpenError):
+        g.call(lambda: "ok")
+
+
+def test_governor_trial_cut_off_by_the_deadline_does_not_wedge_the_breaker():
+    g = governor(max_retries=0, failure_threshold=2, reset_seconds=0.05)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            g.call(raising(ConnectionError("down")))
+    time.sleep(0.06)
+    with pytest.raises(DeadlineExceeded):
+        g.call(raising(DeadlineExceeded("cut off")))
+    assert g.call(lambda: "ok") == "ok"
+    assert g.breaker.state == "closed"
+
+
+def test_governor_does_not_count_deadline_clipped_timeouts():
+    g = governor(max_retries=0, failure_threshold=1)
+
+    def call():
+        time.sleep(0.06)
+        raise APITimeoutError("timed out")
+
+    with deadline.within(0.05), pytest.raises(DeadlineExceeded):
+        g.call(call)
+    assert g.breaker.state == "closed"
+    assert g.concurrency.in_flight == 0
+
+
+def test_governor_waits_end_at_the_deadline():
+    g = governor(max_concurrency=1, initial_concurrency=1)
+    g.concurrency.acquire()
+    start = time.monotonic()
+    with deadline.within(0.1), pytest.raises(DeadlineExceeded):
+        g.call(lambda: "ok")
+    assert time.monotonic() - start < 0.5
+
+
+def test_rate_limit_pauses_other_callers_without_rpm_limit():
+    g = governor(max_retries=1)
+    calls = []
+
+    def limited():
+        calls.append(("limited", time.monotonic()))
+        if len(calls) == 1:
+            raise APIError(status_code=429, headers={"retry-after": "0.2"})
+        return "ok"
+
+    assert g.requests.rate == 0
+    thread = threading.Thread(target=g.call, args=(limited,))
+    thread.start()
+    time.sleep(0.05)
+    start = time.monotonic()
+    # another caller waits for the shared backoff instead of hitting the API again
+    assert g.call(lambda: "ok") == "ok"
+    assert time.monotonic() - start > 0.1
+    thread.join()
+
+
+def test_paused_call_ends_at_the_deadline():
+    g = governor()
+    g._block(5)
+    start = time.monotonic()
+    with deadline.within(0.1), pytest.raises(DeadlineExceeded):
+        g.call(lambda: "ok")
+    assert time.monotonic() - start < 0.5
+
+
+def test_tokens_are_charged_once_per_call():
+    g = governor(tpm=6000, max_retries=2)
+    errors = [APIError(status_code=502), APIError(status_code=502)]
+
+    def call():
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    assert g.call(call, tokens=1000) == "ok"
+    # retries with the tokens charged again would leave about 3000
+    assert 4900 < g.tokens.tokens < 5500
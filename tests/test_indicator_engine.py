@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_bars
+from connector.indicator_engine import IndicatorEngine
+
+
+def rma(series, length):
+    return series.ewm(alpha=1.0 / length, min_periods=length).mean()
+
+
+def reference(bars, length=20):
+    """The pandas_ta 0.3.14b definitions of the indicators, written with plain pandas."""
+    close = bars["Close"]
+    change = close.diff()
+    gains, losses = change.clip(lower=0), change.clip(upper=0).abs()
+    average_gain, average_loss = rma(gains, 14), rma(losses, 14)
+    seeded = close.copy()
+    seeded.iloc[:length - 1] = np.nan
+    seeded.iloc[length - 1] = close.iloc[:length].mean()
+    previous_close = close.shift(1)
+    true_range = pd.concat([bars["High"] - bars["Low"], (bars["High"] - previous_close).abs(),
+                            (previous_close - bars["Low"]).abs()], axis=1).max(axis=1)
+    true_range.iloc[0] = np.nan
+    return pd.DataFrame({
+        "RSI": 100 * average_gain / (average_gain + average_loss),
+        "SMA_20": close.rolling(length).mean(),
+        "EMA_20": seeded.ewm(span=length, adjust=False).mean(),
+        "BBU_20_2.0": close.rolling(length).mean() + 2 * close.rolling(length).std(ddof=0),
+        "ATR": rma(true_range, 14),
+    })
+
+
+def assert_matches(actual, bars):
+    expected = reference(bars)
+    for column in expected.columns:
+        np.testing.assert_allclose(actual[column].to_numpy(), expected[column].to_numpy(), rtol=1e-9, atol=1e-9,
+                                   err_msg=column)
+
+
+@pytest.fixture
+def bars():
+    return generate_bars(periods=300, freq="h")
+
+
+def test_same_bars_match_the_reference(bars):
+    assert_matches(IndicatorEngine().update("T", bars), bars)
+
+
+def test_appended_bars_continue_the_state(bars, monkeypatch):
+    engine = IndicatorEngine()
+    engine.update("T", bars.iloc[:200])
+    monkeypatch.setattr(engine, "_new_entry", lambda: pytest.fail("the state was rebuilt"))
+    for end in (200, 201, 250, 300):
+        assert_matches(engine.update("T", bars.iloc[:end]), bars.iloc[:end])
+
+
+def test_revised_last_bar_is_reapplied(bars):
+    engine = IndicatorEngine()
+    engine.update("T", bars.iloc[:200])
+    revised = bars.iloc[:201].copy()
+    revised.iloc[199, revised.columns.get_loc("Close")] += 1.0
+    assert_matches(engine.update("T", revised), revised)
+
+
+@pytest.mark.parametrize("change", ["slide", "gap", "revision"])
+def test_discontinuous_bars_rebuild_the_state(bars, change):
+    engine = IndicatorEngine()
+    engine.update("T", bars.iloc[:200])
+    if change == "slide":
+        window = bars.iloc[10:210]
+    elif change == "gap":
+        window = bars.iloc[:210].drop(bars.index[100])
+    else:
+        window = bars.iloc[:210].copy()
+        window.iloc[100, window.columns.get_loc("Close")] += 5.0
+    actual = engine.update("T", window)
+    assert_matches(actual, window)
+    # the warm-up rows are dropped like on the legacy path
+    assert len(actual.dropna()) == len(reference(window).dropna())
+
+
+def test_compute_technical_indicators_continues_on_the_stored_series(tmp_path, monkeypatch):
+    from datetime import datetime, timedelta
+
+    from connector import technical_indicators
+    from connector.bar_store import BarStore
+
+    start = (datetime.now() - timedelta(hours=1000)).replace(minute=0, second=0, microsecond=0)
+    bars = generate_bars(periods=1000, freq="h", start=start)
+    store, engine = BarStore(path=str(tmp_path / "bars.sqlite")), IndicatorEngine()
+    monkeypatch.setattr(technical_indicators, "get_bar_store", lambda: store)
+    monkeypatch.setattr(technical_indicators, "get_indicator_engine", lambda: engine)
+    store.upsert("T", "1h", bars.iloc[:999])
+    technical_indicators.compute_technical_indicators("T")
+
+    # the one-month window slides forward with the new bar, the engine state still continues
+    store.upsert("T", "1h", bars.iloc[999:])
+    monkeypatch.setattr(engine, "_new_entry", lambda: pytest.fail("the state was rebuilt"))
+    actual = technical_indicators.compute_technical_indicators("T")
+    assert actual.index[-1] == bars.index[-1]
+    assert actual.index[0] >= bars.index[-1] - timedelta(days=31)
+    # the indicators are warmed up on the whole stored series
+    expected = reference(bars).loc[actual.index]
+    for column in expected.columns:
+        np.testing.assert_allclose(actual[column].to_numpy(), expected[column].to_numpy(), rtol=1e-9, err_msg=column)
@@ -0,0 +1,38 @@
+import pytest
+
+from connector.email_bot import Mailer
+from connector.outbox import Outbox
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "outbox.sqlite")
+
+
+def queued(outbox):
+    return outbox._conn.execute("SELECT run_id, ticker, subject, body FROM outbox ORDER BY id").fetchall()
+
+
+def test_digest_of_a_run_is_queued_as_one_email(path):
+    outbox = Outbox(path=path, mailer=Mailer())
+    outbox.add_to_digest("run-1", "AAPL", "buy", "AAPL body")
+    outbox.add_to_digest("run-1", "MSFT", "sell", "MSFT body")
+    outbox.add_to_digest("run-2", "NVDA", "buy", "NVDA body")
+    assert outbox.release_digests("run-1") == 1
+    [(run_id, ticker, subject, body)] = queued(outbox)
+    assert (run_id, ticker) == ("run-1", "digest")
+    assert "2 Proposals (AAPL, MSFT)" in subject
+    assert body.index("AAPL body") < body.index("MSFT body") and "NVDA" not in body
+    assert outbox.release_digests("run-1") == 0
+
+
+def test_digest_survives_a_restart(path):
+    outbox = Outbox(path=path, mailer=Mailer())
+    outbox.add_to_digest("run-1", "AAPL", "buy", "AAPL body")
+    outbox.add_to_digest("run-1", "AAPL", "buy", "AAPL body")
+    # the process died before the end of the run, the next one queues the digest
+    restarted = Outbox(path=path, mailer=Mailer())
+    assert restarted.release_digests() == 1
+    [(run_id, ticker, subject, _)] = queued(restarted)
+    assert (run_id, ticker) == ("run-1", "digest") and "1 Proposals (AAPL)" in subject
+    assert restarted.pending() == 1
@@ -0,0 +1,50 @@
+from agents.utils.token_budget import TokenBudget, pack_batches
+from common.tokens import count_tokens, fit_items, truncate_to_tokens
+
+
+def text(tokens):
+    """A text of roughly `tokens` tokens."""
+    return " ".join(["word"] * tokens)
+
+
+def test_pack_batches_respects_token_and_item_limits():
+    items = {f"T{i}": text(100) for i in range(7)}
+    size = count_tokens(items["T0"])
+    batches = pack_batches(items, max_batch_tokens=3 * size, max_batch_items=2)
+    assert [list(batch) for batch in batches] == [["T0", "T1"], ["T2", "T3"], ["T4", "T5"], ["T6"]]
+    batches = pack_batches(items, max_batch_tokens=3 * size, max_batch_items=10)
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+
+
+def test_pack_batches_keeps_oversized_items_alone():
+    items = {"small": text(10), "huge": text(1000), "other": text(10)}
+    batches = pack_batches(items, max_batch_tokens=100, max_batch_items=8)
+    assert [list(batch) for batch in batches] == [["small"], ["huge"], ["other"]]
+
+
+def test_pack_batches_of_nothing():
+    assert pack_batches({}, 100, 8) == []
+
+
+def test_truncate_to_tokens_keeps_head_or_tail():
+    long_text = " ".join(str(i) for i in range(2000))
+    head = truncate_to_tokens(long_text, 50)
+    tail = truncate_to_tokens(long_text, 50, keep="tail")
+    assert head.startswith("0 1 2") and head.endswith("[... truncated ...]")
+    assert tail.endswith("1999") and tail.startswith("[... truncated ...]")
+    assert count_tokens(head) <= 50 + 2
+    assert truncate_to_tokens("short", 50) == "short"
+
+
+def test_fit_items_stops_at_the_total_budget():
+    items = [text(100)] * 5
+    fitted = fit_items(items, max_item_tokens=1000, max_total_tokens=2 * count_tokens(items[0]) + 1)
+    assert len(fitted) == 2
+
+
+def test_token_budget_shares_the_total_budget():
+    sections = {"small": text(20), "large": text(2000), "medium": text(300)}
+    fitted = TokenBudget(total=600).fit(sections)
+    assert list(fitted) == list(sections)
+    assert fitted["small"] == sections["small"]
+    assert sum(count_tokens(section) for section in fitted.values()) <= 600 + 10
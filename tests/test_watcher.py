@@ -0,0 +1,99 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from connector import bar_store, market_data
+from connector.triggers import evaluate_triggers, volume_spike
+from watcher import MarketWatcher
+
+
+def make_bars(end, periods=60, volume=None):
+    index = pd.date_range(end=end, periods=periods, freq="1min", tz="UTC")
+    close = 100 + np.sin(np.arange(periods))
+    volume = np.full(periods, 1000.0) + np.arange(periods) % 7 if volume is None else volume
+    return pd.DataFrame({"Open": close, "High": close + 0.5, "Low": close - 0.5, "Close": close, "Volume": volume},
+                        index=index)
+
+
+def test_volume_spike_scores_the_last_bar():
+    volume = np.full(40, 1000.0) + np.arange(40) % 5
+    assert volume_spike(volume) is None
+    volume[-1] = 10000
+    assert volume_spike(volume).startswith("volume z-score")
+
+
+def test_forming_bar_volume_is_not_scored():
+    bars = make_bars(pd.Timestamp.now(tz="UTC"))
+    bars.iloc[-1, bars.columns.get_loc("Volume")] = 100000
+    assert any(reason.startswith("volume") for reason in evaluate_triggers(bars, None))
+    assert not any(reason.startswith("volume") for reason in evaluate_triggers(bars, None, forming=True))
+    # once complete, the bar is scored
+    bars.iloc[-2, bars.columns.get_loc("Volume")] = 100000
+    assert any(reason.startswith("volume") for reason in evaluate_triggers(bars, None, forming=True))
+
+
+class FakeStore:
+    def __init__(self, bars):
+        self.bars = bars
+
+    def load(self, ticker, interval, start=None):
+        return self.bars[ticker]
+
+
+@pytest.fixture
+def watch(monkeypatch):
+    bars = {}
+    monkeypatch.setattr(market_data, "prefetch_market_data", lambda *args, **kwargs: None)
+    monkeypatch.setattr(bar_store, "get_bar_store", lambda: FakeStore(bars))
+    return bars
+
+
+def test_poll_skips_tickers_in_evaluation(watch):
+    end = pd.Timestamp.now(tz="UTC").floor("min") - timedelta(minutes=1)
+    watch.update(AAPL=make_bars(end), MSFT=make_bars(end))
+    watcher = MarketWatcher(["AAPL", "MSFT"], evaluate=None, k_atr=1.0)
+    assert watcher.poll() == {}
+    for ticker in ("AAPL", "MSFT"):
+        moved = make_bars(end + timedelta(minutes=1))
+        moved.iloc[-1, :4] = 150
+        watch[ticker] = moved
+    watcher._pending.add("MSFT")
+    assert list(watcher.poll()) == ["AAPL"]
+
+
+def test_run_polls_during_an_evaluation(watch, monkeypatch):
+    import watcher as watcher_module
+
+    monkeypatch.setattr(watcher_module, "is_us_market_open", lambda: True)
+    started, release, stop = threading.Event(), threading.Event(), threading.Event()
+    evaluated = []
+
+    def evaluate(tickers):
+        evaluated.append(tickers)
+        started.set()
+        release.wait(5)
+
+    watcher = MarketWatcher(["AAPL"], evaluate, poll_seconds=0.01)
+    polls = []
+
+    def poll():
+        polls.append(time.time())
+        return {"AAPL": ["test"]} if len(polls) == 1 else {}
+
+    watcher.poll = poll
+    runner = threading.Thread(target=watcher.run, args=(stop,))
+    runner.start()
+    assert started.wait(5)
+    count = len(polls)
+    time.sleep(0.1)
+    # polling goes on while the evaluation runs
+    assert len(polls) > count
+    release.set()
+    stop.set()
+    runner.join(5)
+    assert evaluated == [["AAPL"]]
+    assert watcher.states["AAPL"].last_evaluated is not None and not watcher._pending